@@ -1,150 +1,59 @@
 import os
 import sys
-from supabase import create_client, Client
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Sessões de banco compartilhadas (AUTOMACAO/Old_scripts/legacy/db_session.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'legacy'))
+import db_session
+from catalog_introspection import SchemaCatalog
+from migration_runner import MigrationRunner
+
+# Migrações do pipeline (tabelas e índices), aplicadas em ordem de versão
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
 # Carregar variáveis de ambiente
 load_dotenv('../../.env')
 
-# Configurar Supabase
+# Conexão direta: VCM_DATABASE_URL ou URL/chave do Supabase (db_session.get_database_url)
 url = os.getenv('VCM_SUPABASE_URL')
 key = os.getenv('VCM_SUPABASE_SERVICE_ROLE_KEY')
 
-if not url or not key:
-    print("❌ Erro: Variáveis de ambiente do Supabase não configuradas")
+if not os.getenv('VCM_DATABASE_URL') and (not url or not key):
+    print("❌ Erro: Variáveis de ambiente do banco não configuradas")
     sys.exit(1)
 
-supabase: Client = create_client(url, key)
-
 def criar_tabelas_pipeline():
-    """Cria as tabelas necessárias para o pipeline completo"""
-    
-    tabelas = {
-        'tech_specifications': '''
-            CREATE TABLE IF NOT EXISTS tech_specifications (
-                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
-                empresa_id uuid REFERENCES empresas(id) ON DELETE CASCADE,
-                persona_id uuid REFERENCES personas(id) ON DELETE CASCADE,
-                role text NOT NULL,
-                tools text[] DEFAULT '{}',
-                technologies text[] DEFAULT '{}',
-                methodologies text[] DEFAULT '{}',
-                sales_enablement text[] DEFAULT '{}',
-                created_at timestamp with time zone DEFAULT now(),
-                updated_at timestamp with time zone DEFAULT now()
-            );
-        ''',
-        
-        'rag_knowledge_base': '''
-            CREATE TABLE IF NOT EXISTS rag_knowledge_base (
-                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
-                empresa_id uuid REFERENCES empresas(id) ON DELETE CASCADE,
-                persona_id uuid REFERENCES personas(id) ON DELETE CASCADE,
-                content_type text NOT NULL,
-                title text NOT NULL,
-                content text NOT NULL,
-                metadata jsonb DEFAULT '{}',
-                created_at timestamp with time zone DEFAULT now(),
-                updated_at timestamp with time zone DEFAULT now()
-            );
-        ''',
-        
-        'n8n_workflows': '''
-            CREATE TABLE IF NOT EXISTS n8n_workflows (
-                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
-                empresa_id uuid REFERENCES empresas(id) ON DELETE CASCADE,
-                workflow_name text NOT NULL,
-                workflow_type text NOT NULL,
-                nodes jsonb DEFAULT '[]',
-                connections jsonb DEFAULT '{}',
-                metadata jsonb DEFAULT '{}',
-                created_at timestamp with time zone DEFAULT now(),
-                updated_at timestamp with time zone DEFAULT now()
-            );
-        ''',
-        
-        'objetivos': '''
-            CREATE TABLE IF NOT EXISTS objetivos (
-                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
-                empresa_id uuid REFERENCES empresas(id) ON DELETE CASCADE,
-                persona_id uuid REFERENCES personas(id) ON DELETE CASCADE,
-                objetivo_tipo text NOT NULL,
-                titulo text NOT NULL,
-                descricao text,
-                meta_valor numeric,
-                meta_unidade text,
-                prazo date,
-                status text DEFAULT 'ativo',
-                created_at timestamp with time zone DEFAULT now(),
-                updated_at timestamp with time zone DEFAULT now()
-            );
-        ''',
-        
-        'auditorias': '''
-            CREATE TABLE IF NOT EXISTS auditorias (
-                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
-                empresa_id uuid REFERENCES empresas(id) ON DELETE CASCADE,
-                auditoria_tipo text NOT NULL,
-                titulo text NOT NULL,
-                resultados jsonb DEFAULT '{}',
-                recomendacoes text[],
-                score numeric,
-                status text DEFAULT 'concluida',
-                created_at timestamp with time zone DEFAULT now(),
-                updated_at timestamp with time zone DEFAULT now()
-            );
-        '''
-    }
-    
-    print("🔨 Criando tabelas do pipeline...\n")
-    
-    for nome_tabela, sql in tabelas.items():
-        try:
-            # Tentar executar usando query direta
-            result = supabase.postgrest.rpc('exec', {'sql': sql}).execute()
-            print(f"✅ Tabela {nome_tabela}: OK")
-            
-        except Exception as e:
-            try:
-                # Método alternativo: tentar acessar a tabela para ver se existe
-                result = supabase.table(nome_tabela).select('*').limit(1).execute()
-                print(f"✅ Tabela {nome_tabela}: JÁ EXISTS")
-                
-            except Exception as e2:
-                print(f"❌ Tabela {nome_tabela}: ERRO - {str(e)}")
-                print(f"   SQL: {sql[:100]}...")
-    
-    # Criar índices
-    indices = [
-        "CREATE INDEX IF NOT EXISTS idx_tech_specifications_empresa_id ON tech_specifications(empresa_id);",
-        "CREATE INDEX IF NOT EXISTS idx_rag_knowledge_base_empresa_id ON rag_knowledge_base(empresa_id);",
-        "CREATE INDEX IF NOT EXISTS idx_n8n_workflows_empresa_id ON n8n_workflows(empresa_id);",
-        "CREATE INDEX IF NOT EXISTS idx_objetivos_empresa_id ON objetivos(empresa_id);",
-        "CREATE INDEX IF NOT EXISTS idx_auditorias_empresa_id ON auditorias(empresa_id);"
-    ]
+    """
+    Aplica as migrações pendentes do pipeline (migrations/) por conexão direta:
+    tabelas em uma transação e índices com CONCURRENTLY em paralelo. Migrações
+    já aplicadas (mesmo checksum) são ignoradas.
+    """
     
-    print(f"\n🎯 Tentando criar {len(indices)} índices...")
+    print("🔨 Aplicando migrações do pipeline...\n")
     
-    for indice in indices:
-        try:
-            result = supabase.postgrest.rpc('exec', {'sql': indice}).execute()
-            print(f"✅ Índice criado: {indice[:50]}...")
-        except Exception as e:
-            print(f"⚠️ Índice: {str(e)[:50]}...")
+    aplicadas = MigrationRunner(MIGRATIONS_DIR).migrate()
+    for migracao in aplicadas:
+        print(f"✅ Migração {migracao['version']}_{migracao['name']}: OK ({migracao['duration_ms']} ms)")
+    if not aplicadas:
+        print("✅ Schema do pipeline já atualizado")
 
 def verificar_tabelas():
-    """Verifica se as tabelas foram criadas com sucesso"""
+    """Verifica se as tabelas foram criadas, pelo catálogo do Postgres (sem contar linhas)"""
     
     tabelas = ['tech_specifications', 'rag_knowledge_base', 'n8n_workflows', 'objetivos', 'auditorias']
     
     print(f"\n🔍 Verificando {len(tabelas)} tabelas criadas...\n")
     
+    # refresh: as migrações acabaram de rodar, então a versão do schema é conferida no banco
+    catalogo = SchemaCatalog()
+    catalogo.load(refresh=True)
     for tabela in tabelas:
-        try:
-            result = supabase.table(tabela).select('*', count='exact').limit(1).execute()
-            print(f"✅ {tabela}: EXISTE")
-        except Exception as e:
-            print(f"❌ {tabela}: NÃO EXISTE - {str(e)[:50]}...")
+        if catalogo.table_exists(tabela):
+            print(f"✅ {tabela}: EXISTE ({len(catalogo.columns(tabela))} colunas, "
+                  f"{len(catalogo.indexes(tabela))} índices)")
+        else:
+            print(f"❌ {tabela}: NÃO EXISTE")
     
     print("\n🎉 Verificação concluída!")
 
@@ -161,4 +70,6 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\n❌ Erro geral: {str(e)}")
         print("💡 Tente executar o SQL manualmente no painel do Supabase")
-        print("📄 Arquivo: criar_tabelas_pipeline.sql")
\ No newline at end of file
+        print("📄 Arquivo: criar_tabelas_pipeline.sql")
+    finally:
+        db_session.close_all()
\ No newline at end of file
@@ -1,4 +1,6 @@
 -- SQL para criar tabelas necessárias no banco VCM
+-- As mesmas tabelas e índices são aplicados por criar_tabelas_pipeline.py a partir de migrations/
+-- (migration_runner.py); ao alterar o schema, crie uma nova migração lá.
 -- Execute este script no SQL Editor do Supabase
 
 -- Tabela tech_specifications
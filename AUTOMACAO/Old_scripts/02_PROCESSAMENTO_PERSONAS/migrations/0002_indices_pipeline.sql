@@ -0,0 +1,9 @@
+-- Índices do pipeline, construídos com CONCURRENTLY (sem bloquear escritas)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tech_specifications_empresa_id ON tech_specifications(empresa_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tech_specifications_persona_id ON tech_specifications(persona_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rag_knowledge_base_empresa_id ON rag_knowledge_base(empresa_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rag_knowledge_base_persona_id ON rag_knowledge_base(persona_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_n8n_workflows_empresa_id ON n8n_workflows(empresa_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_objetivos_empresa_id ON objetivos(empresa_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_objetivos_persona_id ON objetivos(persona_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auditorias_empresa_id ON auditorias(empresa_id);
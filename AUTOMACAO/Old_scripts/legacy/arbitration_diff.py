@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Comparação entre Execuções da Arbitragem VCM
+Compara duas execuções do TaskArbitrator (exportações ou o estado atual de
+persona_tasks no banco) por persona_id e identidade de tarefa, reportando
+tarefas adicionadas, removidas e alteradas e a variação de minutos por
+persona e por subsistema.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from task_timestamps import utc_iso
+
+FREQUENCY_KEYS = ("daily_tasks", "weekly_tasks", "monthly_tasks")
+
+# Campos que definem se uma tarefa mudou. status (alterado pela execução das
+# tarefas), created_at e metadata (dados do template) não contam como mudança.
+DIFF_FIELDS = (
+    "title", "description", "task_type", "priority", "estimated_duration", "due_date",
+    "required_subsystems", "inputs_from", "outputs_to", "dependencies", "assigned_to"
+)
+
+# due_date volta como instante UTC, no formato de task_timestamps.utc_iso: o
+# fuso da sessão não altera o texto e as exportações (com ou sem fuso) são
+# comparadas com db:<empresa_id> pela mesma regra usada na carga
+SNAPSHOT_SQL = """
+    SELECT persona_id, task_id, title, description, task_type, priority, estimated_duration,
+           to_char(due_date AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"'), required_subsystems, inputs_from,
+           outputs_to, dependencies, assigned_to, frequency
+    FROM persona_tasks
+    WHERE empresa_id = %(empresa_id)s
+    ORDER BY persona_id, frequency, due_date, task_id
+"""
+
+SNAPSHOT_COLUMNS = ("id", "title", "description", "task_type", "priority", "estimated_duration", "due_date",
+                    "required_subsystems", "inputs_from", "outputs_to", "dependencies", "assigned_to")
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+
+def task_fingerprint(task: Dict[str, Any]) -> int:
+    """
+    Hash dos campos comparados de uma tarefa. Usa hash() do Python, que só é
+    estável dentro do processo, então vale apenas para comparar as duas
+    execuções de uma mesma chamada. due_date entra como instante UTC.
+    """
+    get = task.get
+    try:
+        # Caminho rápido: listas de strings, o formato gravado pelo arbitrador
+        return hash((
+            get('title'), get('description'), get('task_type'), get('priority'),
+            get('estimated_duration'), utc_iso(get('due_date')),
+            tuple(get('required_subsystems') or ()), tuple(get('inputs_from') or ()),
+            tuple(get('outputs_to') or ()), tuple(get('dependencies') or ()), get('assigned_to')
+        ))
+    except TypeError:
+        return hash(tuple(_hashable(utc_iso(get(field)) if field == "due_date" else get(field))
+                          for field in DIFF_FIELDS))
+
+
+def iter_keyed_tasks(persona_results: Iterable[Dict[str, Any]], by_template: bool = False
+                     ) -> Iterator[Tuple[Any, Any, Dict[str, Any]]]:
+    """
+    Gera (chave, persona_id, tarefa) para cada tarefa dos resultados.
+
+    A chave padrão é (persona_id, id da tarefa). Com by_template=True é
+    (persona_id, frequência, título, n-ésima ocorrência), para comparar
+    execuções de datas diferentes, cujos ids não coincidem.
+    """
+    for persona_tasks in persona_results:
+        if 'error' in persona_tasks:
+            continue
+        persona_id = persona_tasks.get('persona_id')
+        occurrences: Dict[Tuple[Any, Any], int] = {}
+        for frequency in FREQUENCY_KEYS:
+            for task in persona_tasks.get(frequency, ()):
+                if by_template:
+                    template = (task.get('task_type'), task.get('title'))
+                    ordinal = occurrences.get(template, 0)
+                    occurrences[template] = ordinal + 1
+                    yield (persona_id, template[0], template[1], ordinal), persona_id, task
+                else:
+                    yield (persona_id, task.get('id')), persona_id, task
+
+
+class ArbitrationDiff:
+    """
+    Diferença entre duas execuções por junção de hash.
+
+    A execução antiga vira uma tabela {chave: (hash, minutos, subsistemas, id,
+    título, vencimento)}; a nova é lida em streaming e cada tarefa é retirada
+    da tabela. O que sobra foi removido. Tempo linear no total de tarefas e
+    memória proporcional apenas à execução antiga.
+    """
+
+    def __init__(self, by_template: bool = False):
+        self.by_template = by_template
+        self._subsystems: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def _subsystem_key(self, task: Dict[str, Any]) -> Tuple[str, ...]:
+        # A mesma tupla de subsistemas é compartilhada por todas as tarefas que a usam
+        key = tuple(task.get('required_subsystems') or ())
+        return self._subsystems.setdefault(key, key)
+
+    def diff(self, old_results: Iterable[Dict[str, Any]], new_results: Iterable[Dict[str, Any]],
+             changes_out: Optional[TextIO] = None) -> Dict[str, Any]:
+        """
+        Compara as execuções. Com changes_out, cada tarefa adicionada, removida
+        ou alterada é gravada como uma linha NDJSON nesse arquivo.
+        """
+        start_time = time.perf_counter()
+        personas: Dict[Any, Dict[str, int]] = {}
+        subsystems: Dict[str, Dict[str, int]] = {}
+        totals = {"old_tasks": 0, "new_tasks": 0, "added": 0, "removed": 0, "modified": 0, "unchanged": 0,
+                  "old_minutes": 0, "new_minutes": 0}
+
+        def persona_stats(persona_id: Any) -> Dict[str, int]:
+            stats = personas.get(persona_id)
+            if stats is None:
+                stats = {"added": 0, "removed": 0, "modified": 0, "old_minutes": 0, "new_minutes": 0}
+                personas[persona_id] = stats
+            return stats
+
+        def add_minutes(persona_id: Any, subsystem_key: Tuple[str, ...], minutes: int, side: str) -> None:
+            persona_stats(persona_id)[side] += minutes
+            totals[side] += minutes
+            for subsystem in subsystem_key:
+                stats = subsystems.get(subsystem)
+                if stats is None:
+                    stats = {"old_minutes": 0, "new_minutes": 0}
+                    subsystems[subsystem] = stats
+                stats[side] += minutes
+
+        def emit(change: str, persona_id: Any, task_id: Any, title: Any, **fields: Any) -> None:
+            if changes_out is not None:
+                record = {"change": change, "persona_id": persona_id, "task_id": task_id, "title": title}
+                record.update(fields)
+                changes_out.write(json.dumps(record, ensure_ascii=False))
+                changes_out.write('\n')
+
+        # Lado antigo: tabela de hash
+        table: Dict[Any, Tuple[int, int, Tuple[str, ...], Any, Any, Any, Any]] = {}
+        for key, persona_id, task in iter_keyed_tasks(old_results, self.by_template):
+            minutes = int(task.get('estimated_duration') or 0)
+            subsystem_key = self._subsystem_key(task)
+            title = task.get('title')
+            table[key] = (task_fingerprint(task), minutes, subsystem_key, persona_id, task.get('id'),
+                          sys.intern(title) if isinstance(title, str) else title, task.get('due_date'))
+            add_minutes(persona_id, subsystem_key, minutes, "old_minutes")
+            totals["old_tasks"] += 1
+
+        # Lado novo: sondagem em streaming
+        for key, persona_id, task in iter_keyed_tasks(new_results, self.by_template):
+            minutes = int(task.get('estimated_duration') or 0)
+            add_minutes(persona_id, self._subsystem_key(task), minutes, "new_minutes")
+            totals["new_tasks"] += 1
+            old = table.pop(key, None)
+            if old is None:
+                totals["added"] += 1
+                persona_stats(persona_id)["added"] += 1
+                emit("added", persona_id, task.get('id'), task.get('title'),
+                     due_date=task.get('due_date'), minutes=minutes)
+            elif old[0] != task_fingerprint(task):
+                totals["modified"] += 1
+                persona_stats(persona_id)["modified"] += 1
+                emit("modified", persona_id, task.get('id'), task.get('title'), old_task_id=old[4],
+                     old_due_date=old[6], due_date=task.get('due_date'),
+                     old_minutes=old[1], minutes=minutes)
+            else:
+                totals["unchanged"] += 1
+
+        for _, minutes, _, persona_id, task_id, title, due_date in table.values():
+            totals["removed"] += 1
+            persona_stats(persona_id)["removed"] += 1
+            emit("removed", persona_id, task_id, title, due_date=due_date, minutes=minutes)
+
+        report = dict(totals)
+        report["minutes_delta"] = totals["new_minutes"] - totals["old_minutes"]
+        report["personas"] = {
+            persona_id: dict(stats, minutes_delta=stats["new_minutes"] - stats["old_minutes"])
+            for persona_id, stats in personas.items()
+            if stats["added"] or stats["removed"] or stats["modified"] or stats["new_minutes"] != stats["old_minutes"]
+        }
+        report["subsystems"] = {
+            subsystem: dict(stats, minutes_delta=stats["new_minutes"] - stats["old_minutes"])
+            for subsystem, stats in sorted(subsystems.items())
+        }
+        report["diff_seconds"] = round(time.perf_counter() - start_time, 4)
+        logging.info("Comparação: %d adicionadas, %d removidas, %d alteradas (%.3fs)",
+                     report["added"], report["removed"], report["modified"], report["diff_seconds"])
+        return report
+
+
+def iter_db_snapshot(empresa_id: str, connection_factory: Optional[Callable[[], Any]] = None,
+                     fetch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """
+    Estado atual de persona_tasks de uma empresa, no formato dos resultados do
+    arbitrador (uma persona por vez, lida por cursor no servidor).
+    """
+    if connection_factory is None:
+        import db_session
+        connection_factory = db_session.connection
+
+    with connection_factory() as connection:
+        with connection.cursor(name="arbitration_diff_snapshot") as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(SNAPSHOT_SQL, {"empresa_id": empresa_id})
+            persona = None
+            for row in cursor:
+                persona_id = str(row[0]) if row[0] is not None else None
+                if persona is None or persona["persona_id"] != persona_id:
+                    if persona is not None:
+                        yield persona
+                    persona = {"persona_id": persona_id, "daily_tasks": [], "weekly_tasks": [], "monthly_tasks": []}
+                task = dict(zip(SNAPSHOT_COLUMNS, row[1:-1]))
+                if task["assigned_to"] is not None:
+                    task["assigned_to"] = str(task["assigned_to"])
+                frequency_key = f"{row[-1]}_tasks"
+                persona[frequency_key if frequency_key in persona else "daily_tasks"].append(task)
+            if persona is not None:
+                yield persona
+
+
+def open_run(source: str) -> Iterator[Dict[str, Any]]:
+    """Abre uma execução: caminho de exportação ou db:<empresa_id> para o estado no banco"""
+    if source.startswith("db:"):
+        return iter_db_snapshot(source[3:])
+    from task_loader import read_arbitration_export
+    return read_arbitration_export(Path(source))[1]
+
+
+def main():
+    """Compara duas execuções e grava o relatório"""
+    parser = argparse.ArgumentParser(description="Comparação entre execuções da arbitragem de tarefas")
+    parser.add_argument('old', help="Execução antiga: exportação (.json/.ndjson/.ndjson.gz) ou db:<empresa_id>")
+    parser.add_argument('new', help="Execução nova: exportação (.json/.ndjson/.ndjson.gz) ou db:<empresa_id>")
+    parser.add_argument('--by-template', action='store_true',
+                        help="Identifica tarefas por frequência, título e ocorrência (execuções de datas diferentes)")
+    parser.add_argument('--changes', type=Path, default=None, help="Arquivo NDJSON com cada tarefa alterada")
+    parser.add_argument('--output', type=Path, default=None, help="Arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    engine = ArbitrationDiff(by_template=args.by_template)
+    if args.changes:
+        with open(args.changes, 'w', encoding='utf-8') as changes_out:
+            report = engine.diff(open_run(args.old), open_run(args.new), changes_out)
+    else:
+        report = engine.diff(open_run(args.old), open_run(args.new))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Comparação concluída em {report['diff_seconds']}s")
+    print(f"➕ Adicionadas: {report['added']}")
+    print(f"➖ Removidas: {report['removed']}")
+    print(f"✏️  Alteradas: {report['modified']}")
+    print(f"⏱️  Variação de minutos: {report['minutes_delta']:+d}")
+    for subsystem, stats in report["subsystems"].items():
+        if stats["minutes_delta"]:
+            print(f"   🔌 {subsystem}: {stats['minutes_delta']:+d} minutos")
+    if args.output:
+        print(f"📄 Relatório: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
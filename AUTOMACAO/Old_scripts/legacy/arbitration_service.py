@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Serviço de Arbitragem VCM
+Processo de longa duração (asyncio) que mantém um TaskArbitrator aquecido e
+atende pedidos de arbitragem por HTTP local (TCP ou socket Unix), com fila
+limitada, coalescência de pedidos idênticos da mesma empresa e cache de
+respostas recentes. Evita pagar a inicialização do Python e o carregamento
+dos templates a cada chamada do app Next.js ou dos scripts do pipeline.
+
+Rotas:
+    GET  /health      estado do serviço, fila e métricas
+    POST /arbitrate   {"empresa_id", "personas"?, "reference_date"?, "horizon_days"?, "start"?}
+    POST /reload      recarrega templates e integrações (troca o arbitrador)
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import http.client
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from task_arbitrator import TaskArbitrator
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Pedidos aguardando arbitragem; acima disso o serviço responde 503
+DEFAULT_QUEUE_SIZE = 64
+
+# Respostas recentes mantidas em memória e por quanto tempo, em segundos
+DEFAULT_CACHE_SIZE = 128
+DEFAULT_CACHE_TTL = 30.0
+
+# Sem reference_date, o instante da arbitragem é truncado ao minuto: pedidos
+# do mesmo minuto reaproveitam os protótipos já carimbados do arbitrador
+DEFAULT_REFERENCE_RESOLUTION = timedelta(minutes=1)
+
+# Limites de leitura do HTTP
+MAX_BODY_BYTES = 32 * 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 30.0
+
+PERSONAS_SQL = """
+    SELECT id::text, nome, cargo, empresa_id::text
+    FROM personas
+    WHERE empresa_id = %s::uuid
+    ORDER BY nome, id
+"""
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServiceError(Exception):
+    """Erro com status HTTP a devolver ao cliente"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ArbitrationJob:
+    """Um pedido na fila; todos os clientes coalescidos aguardam o mesmo future"""
+
+    __slots__ = ("key", "empresa_id", "personas", "reference_date", "horizon", "future", "enqueued_at")
+
+    def __init__(self, key: Tuple[Any, ...], empresa_id: Optional[str], personas: Optional[List[Dict[str, Any]]],
+                 reference_date: Optional[datetime], horizon: Optional[Tuple[date, date]], future: asyncio.Future):
+        self.key = key
+        self.empresa_id = empresa_id
+        self.personas = personas
+        self.reference_date = reference_date
+        self.horizon = horizon
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+def load_empresa_personas(empresa_id: str) -> List[Dict[str, Any]]:
+    """Personas da empresa no formato esperado pelo arbitrador"""
+    import db_session
+
+    with db_session.cursor() as cur:
+        cur.execute(PERSONAS_SQL, (empresa_id,))
+        return [{"id": row[0], "nome": row[1], "cargo": row[2], "empresa_id": row[3]} for row in cur.fetchall()]
+
+
+class ArbitrationService:
+    """
+    Fila limitada de arbitragens servida por um arbitrador aquecido.
+
+    Pedidos com a mesma chave (empresa, personas, data de referência,
+    horizonte e versão dos templates) enquanto um deles está na fila ou em
+    execução recebem a mesma resposta, já serializada. A arbitragem roda em
+    um pool de threads para não bloquear o loop de eventos; cada consumidor
+    da fila usa sua própria cópia do arbitrador (os caches de protótipos não
+    são protegidos por lock) e esses caches permanecem quentes entre os
+    pedidos.
+    """
+
+    def __init__(self, arbitrator_factory: Callable[[], TaskArbitrator] = TaskArbitrator,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, workers: int = 1,
+                 cache_size: int = DEFAULT_CACHE_SIZE, cache_ttl: float = DEFAULT_CACHE_TTL,
+                 personas_loader: Callable[[str], List[Dict[str, Any]]] = load_empresa_personas):
+        self.arbitrator_factory = arbitrator_factory
+        self.queue_size = queue_size
+        self.workers = max(1, workers)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.personas_loader = personas_loader
+        self.arbitrator: Optional[TaskArbitrator] = None
+        # Um arbitrador por consumidor; o primeiro é self.arbitrator
+        self.arbitrators: List[TaskArbitrator] = []
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="arbitration")
+        self._queue: Optional[asyncio.Queue] = None
+        self._inflight: Dict[Tuple[Any, ...], ArbitrationJob] = {}
+        self._cache: 'OrderedDict[Tuple[Any, ...], Tuple[float, bytes]]' = OrderedDict()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self.started_at = time.time()
+        self.metrics = {"requests": 0, "arbitrations": 0, "coalesced": 0, "cache_hits": 0,
+                        "rejected": 0, "errors": 0, "arbitration_seconds": 0.0, "queue_wait_seconds": 0.0}
+
+    async def start(self) -> None:
+        """Carrega o arbitrador (uma única vez) e inicia os consumidores da fila"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.arbitrator = await loop.run_in_executor(self.executor, self.arbitrator_factory)
+        self.arbitrators = await loop.run_in_executor(self.executor, self.replicate, self.arbitrator)
+        logging.info("Arbitrador aquecido em %.2fs (templates %s)",
+                     time.perf_counter() - started, self.arbitrator.templates_version)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._reload_lock = asyncio.Lock()
+        self._worker_tasks = [asyncio.create_task(self._worker(slot)) for slot in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancela os consumidores e libera o pool de threads"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        for job in self._inflight.values():
+            if not job.future.done():
+                job.future.set_exception(ServiceError(503, "Serviço encerrado"))
+        self._inflight.clear()
+        self.executor.shutdown(wait=False)
+
+    def replicate(self, arbitrator: TaskArbitrator) -> List[TaskArbitrator]:
+        """O arbitrador e uma cópia independente para cada consumidor adicional"""
+        return [arbitrator] + [copy.deepcopy(arbitrator) for _ in range(self.workers - 1)]
+
+    @staticmethod
+    def default_reference_date() -> datetime:
+        """Agora, truncado a DEFAULT_REFERENCE_RESOLUTION"""
+        now = datetime.now()
+        return now - (now - datetime.min) % DEFAULT_REFERENCE_RESOLUTION
+
+    def request_key(self, empresa_id: Optional[str], personas: Optional[List[Dict[str, Any]]],
+                    reference_date: Optional[datetime], horizon: Optional[Tuple[date, date]]) -> Tuple[Any, ...]:
+        """Chave de coalescência e de cache de um pedido"""
+        personas_hash = None
+        if personas is not None:
+            content = json.dumps(personas, sort_keys=True, ensure_ascii=False, default=str)
+            personas_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return (empresa_id, personas_hash, reference_date.isoformat() if reference_date else None,
+                tuple(day.isoformat() for day in horizon) if horizon else None, self.arbitrator.templates_version)
+
+    def _cached(self, key: Tuple[Any, ...]) -> Optional[bytes]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, body = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return body
+
+    def _store(self, key: Tuple[Any, ...], body: bytes) -> None:
+        if self.cache_size <= 0 or self.cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic(), body)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def arbitrate(self, empresa_id: Optional[str], personas: Optional[List[Dict[str, Any]]] = None,
+                        reference_date: Optional[datetime] = None,
+                        horizon: Optional[Tuple[date, date]] = None) -> bytes:
+        """JSON da arbitragem (arbitrate_all_personas), via cache, coalescência ou fila"""
+        self.metrics["requests"] += 1
+        if reference_date is None:
+            reference_date = self.default_reference_date()
+        key = self.request_key(empresa_id, personas, reference_date, horizon)
+        body = self._cached(key)
+        if body is not None:
+            self.metrics["cache_hits"] += 1
+            return body
+
+        job = self._inflight.get(key)
+        if job is not None:
+            self.metrics["coalesced"] += 1
+        else:
+            job = ArbitrationJob(key, empresa_id, personas, reference_date, horizon,
+                                 asyncio.get_running_loop().create_future())
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.metrics["rejected"] += 1
+                raise ServiceError(503, "Fila de arbitragem cheia")
+            self._inflight[key] = job
+        # shield: um cliente que desconecta não cancela o pedido dos demais
+        return await asyncio.shield(job.future)
+
+    async def _worker(self, slot: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            self.metrics["queue_wait_seconds"] += time.perf_counter() - job.enqueued_at
+            started = time.perf_counter()
+            try:
+                body = await loop.run_in_executor(self.executor, self._run_job, self.arbitrators[slot], job)
+                self._store(job.key, body)
+                job.future.set_result(body)
+            except ServiceError as e:
+                logging.warning("Pedido da empresa %s recusado: %s", job.empresa_id, e)
+                job.future.set_exception(e)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logging.error("Erro na arbitragem da empresa %s: %s", job.empresa_id, e)
+                job.future.set_exception(ServiceError(500, str(e)))
+            finally:
+                self.metrics["arbitrations"] += 1
+                self.metrics["arbitration_seconds"] += time.perf_counter() - started
+                self._inflight.pop(job.key, None)
+                self._queue.task_done()
+
+    def _run_job(self, arbitrator: TaskArbitrator, job: ArbitrationJob) -> bytes:
+        """Executa um pedido no pool de threads e já devolve o JSON serializado"""
+        personas = job.personas
+        if personas is None:
+            personas = self.personas_loader(job.empresa_id)
+            if not personas:
+                raise ServiceError(404, f"Nenhuma persona para a empresa {job.empresa_id}")
+        result = arbitrator.arbitrate_all_personas(personas, reference_date=job.reference_date, horizon=job.horizon)
+        if job.empresa_id is not None:
+            result["empresa_id"] = job.empresa_id
+        result["templates_version"] = arbitrator.templates_version
+        return json.dumps(result, ensure_ascii=False, default=str).encode('utf-8')
+
+    async def reload(self) -> Dict[str, Any]:
+        """Recria o arbitrador fora do loop e o troca; pedidos em andamento terminam com o anterior"""
+        async with self._reload_lock:
+            previous = self.arbitrator.templates_version
+            loop = asyncio.get_running_loop()
+            arbitrator = await loop.run_in_executor(self.executor, self.arbitrator_factory)
+            arbitrators = await loop.run_in_executor(self.executor, self.replicate, arbitrator)
+            self.arbitrator, self.arbitrators = arbitrator, arbitrators
+            self._cache.clear()
+            logging.info("Arbitrador recarregado: templates %s -> %s", previous, arbitrator.templates_version)
+            return {"previous_version": previous, "templates_version": arbitrator.templates_version}
+
+    def health(self) -> Dict[str, Any]:
+        """Estado do serviço e métricas acumuladas"""
+        arbitrations = self.metrics["arbitrations"]
+        return {
+            "status": "ok" if self.arbitrator is not None else "starting",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "templates_version": self.arbitrator.templates_version if self.arbitrator else None,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "inflight": len(self._inflight),
+            "cached_responses": len(self._cache),
+            "avg_arbitration_ms": round(1000 * self.metrics["arbitration_seconds"] / arbitrations, 2) if arbitrations else None,
+            **{key: value for key, value in self.metrics.items() if not key.endswith("_seconds")}
+        }
+
+    @staticmethod
+    def parse_request(payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]],
+                                                        Optional[datetime], Optional[Tuple[date, date]]]:
+        """Valida o corpo de /arbitrate"""
+        empresa_id = payload.get('empresa_id')
+        personas = payload.get('personas')
+        if personas is None and not empresa_id:
+            raise ServiceError(400, "Informe empresa_id ou personas")
+        if personas is None:
+            # As personas vêm do banco: empresa_id precisa ser um UUID (usa o índice de personas.empresa_id)
+            try:
+                empresa_id = str(uuid.UUID(str(empresa_id)))
+            except ValueError:
+                raise ServiceError(400, f"empresa_id inválido: {empresa_id}")
+        if personas is not None and not isinstance(personas, list):
+            raise ServiceError(400, "personas deve ser uma lista")
+        if personas is not None and not all(isinstance(persona, dict) for persona in personas):
+            raise ServiceError(400, "Cada persona deve ser um objeto JSON")
+        try:
+            reference_date = datetime.fromisoformat(payload['reference_date']) if payload.get('reference_date') else None
+            horizon = None
+            if payload.get('horizon_days'):
+                start_date = date.fromisoformat(payload['start']) if payload.get('start') else date.today()
+                horizon = (start_date, start_date + timedelta(days=int(payload['horizon_days']) - 1))
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, f"Parâmetro inválido: {e}")
+        return empresa_id, personas, reference_date, horizon
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, bytes]:
+        """Roteia um pedido HTTP; devolve (status, corpo JSON)"""
+        path = path.split('?', 1)[0].rstrip('/') or '/'
+        if path == '/health':
+            if method != 'GET':
+                raise ServiceError(405, "Use GET")
+            return 200, json.dumps(self.health()).encode('utf-8')
+        if path == '/arbitrate':
+            if method != 'POST':
+                raise ServiceError(405, "Use POST")
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError as e:
+                raise ServiceError(400, f"JSON inválido: {e}")
+            if not isinstance(payload, dict):
+                raise ServiceError(400, "O corpo deve ser um objeto JSON")
+            return 200, await self.arbitrate(*self.parse_request(payload))
+        if path == '/reload':
+            if method != 'POST':
+                raise ServiceError(405, "Use POST")
+            return 200, json.dumps(await self.reload()).encode('utf-8')
+        raise ServiceError(404, f"Rota desconhecida: {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """HTTP/1.1 mínimo com keep-alive: um pedido por vez em cada conexão"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and parts[-1:] == ['HTTP/1.1']
+                try:
+                    if len(parts) != 3:
+                        raise ServiceError(400, "Linha de pedido inválida")
+                    length = int(headers.get('content-length') or 0)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise ServiceError(413, "Corpo muito grande")
+                    body = await reader.readexactly(length) if length else b''
+                    status, response = await self.dispatch(parts[0].upper(), parts[1], body)
+                except ServiceError as e:
+                    status, response = e.status, json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8')
+                except ValueError:
+                    status, keep_alive = 400, False
+                    response = json.dumps({"error": "Content-Length inválido"}).encode('utf-8')
+
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                        "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(response)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    unix_socket: Optional[Path] = None) -> None:
+        """Inicia o serviço e atende até ser cancelado"""
+        await self.start()
+        if unix_socket is not None:
+            if unix_socket.exists():
+                unix_socket.unlink()
+            server = await asyncio.start_unix_server(self.handle_connection, path=str(unix_socket))
+            address = f"unix:{unix_socket}"
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            address = f"http://{host}:{port}"
+        logging.info("Serviço de arbitragem em %s (fila %d, %d worker(s))", address, self.queue_size, self.workers)
+        print(f"🚀 Serviço de arbitragem em {address}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+            if unix_socket is not None and unix_socket.exists():
+                unix_socket.unlink()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class ArbitrationClient:
+    """Cliente do serviço para os scripts do pipeline (mantém a conexão aberta)"""
+
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 300.0):
+        if url.startswith('unix:'):
+            self._connection = _UnixHTTPConnection(url[len('unix:'):], timeout)
+        else:
+            host_port = url.split('://', 1)[-1].rstrip('/')
+            self._connection = http.client.HTTPConnection(host_port, timeout=timeout)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8') if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self._connection.request(method, path, body=body, headers=headers)
+        response = self._connection.getresponse()
+        data = json.loads(response.read() or b'{}')
+        if response.status != 200:
+            raise RuntimeError(f"Serviço de arbitragem respondeu {response.status}: {data.get('error')}")
+        return data
+
+    def arbitrate(self, empresa_id: Optional[str] = None, personas: Optional[List[Dict[str, Any]]] = None,
+                  reference_date: Optional[datetime] = None, horizon_days: Optional[int] = None,
+                  start: Optional[date] = None) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"empresa_id": empresa_id}
+        if personas is not None:
+            payload["personas"] = personas
+        if reference_date is not None:
+            payload["reference_date"] = reference_date.isoformat()
+        if horizon_days:
+            payload["horizon_days"] = horizon_days
+            if start is not None:
+                payload["start"] = start.isoformat()
+        return self.request('POST', '/arbitrate', payload)
+
+    def health(self) -> Dict[str, Any]:
+        return self.request('GET', '/health')
+
+    def reload(self) -> Dict[str, Any]:
+        return self.request('POST', '/reload')
+
+
+def main():
+    """Inicia o serviço de arbitragem"""
+    parser = argparse.ArgumentParser(description="Serviço de arbitragem VCM (HTTP local)")
+    parser.add_argument('--host', default=os.getenv('VCM_ARBITRATION_HOST', DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=int(os.getenv('VCM_ARBITRATION_PORT', DEFAULT_PORT)))
+    parser.add_argument('--unix-socket', type=Path, default=None, help="Atende em um socket Unix em vez de TCP")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help="Pedidos aguardando na fila")
+    parser.add_argument('--workers', type=int, default=1, help="Arbitragens simultâneas (threads)")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL,
+                        help="Segundos em que uma resposta idêntica é reaproveitada (0 desativa)")
+    parser.add_argument('--templates-db', action='store_true',
+                        help="Usa os templates da tabela task_templates (com cache local)")
+    parser.add_argument('--offline-templates', action='store_true',
+                        help="Com --templates-db, usa somente o cache local de templates")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.templates_db:
+        def arbitrator_factory() -> TaskArbitrator:
+            return TaskArbitrator.from_registry(offline=args.offline_templates)
+    else:
+        arbitrator_factory = TaskArbitrator
+
+    service = ArbitrationService(arbitrator_factory, queue_size=args.queue_size, workers=args.workers,
+                                 cache_ttl=args.cache_ttl)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        print("🛑 Serviço encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Rastreamento da Arbitragem VCM
+Spans estruturados com tempo por etapa (busca de template, geração de
+tarefas, vencimentos, mapeamento de integrações), amostragem por execução de
+persona e exportação não bloqueante: os spans concluídos vão para uma fila e
+uma thread (SpanExporter) os grava em JSON lines ou em OTLP/JSON, o formato
+lido pelo receiver otlpjsonfile do OpenTelemetry Collector.
+
+Com o rastreamento desligado (padrão), cada span custa uma chamada e um teste;
+as etapas sequenciais de um span (Span.stage) custam uma chamada cada. No modo
+paralelo, os processos do pool enviam os spans concluídos por uma fila
+multiprocessing ao exportador do processo principal, como os registros de log.
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACE_FORMATS = ("jsonl", "otlp")
+
+# Spans por linha no formato OTLP (cada linha é um ExportTraceServiceRequest)
+DEFAULT_OTLP_BATCH_SIZE = 512
+
+DEFAULT_SERVICE_NAME = "vcm-task-arbitrator"
+SCOPE_NAME = "vcm.arbitration"
+
+# Handlers e nível do logging em fila do processo (definidos por start_queue_logging)
+_queue_logging: Dict[str, Any] = {}
+
+# Span ativo no contexto atual (pai dos próximos spans)
+_current_span: ContextVar[Optional['Span']] = ContextVar("vcm_arbitration_span", default=None)
+
+
+class _NullSpan:
+    """Span de rastreamento desligado: não registra nada nem altera o contexto"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def stage(self, name: Optional[str]) -> None:
+        pass
+
+
+class _UnsampledSpan(_NullSpan):
+    """Raiz fora da amostra: marca o contexto para que as etapas filhas também sejam descartadas"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self) -> '_UnsampledSpan':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current_span.reset(self._token)
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Intervalo medido de uma etapa; tempos em nanossegundos desde a época"""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "events", "error", "_token", "_started", "_stage")
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.events: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.start_ns = self.end_ns = 0
+        self._stage: Optional['Span'] = None
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        # Duração pelo relógio monotônico; o início fica no relógio de parede
+        if self._stage is not None:
+            self._stage.__exit__(exc_type, exc, traceback)
+            self._stage = None
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        if exc is not None:
+            self.record_error(exc)
+        _current_span.reset(self._token)
+        self.tracer.export(self)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def stage(self, name: Optional[str]) -> None:
+        """
+        Encerra a etapa em andamento e abre a próxima (name) como span filho;
+        None só encerra. Evita um bloco with por etapa no caminho quente.
+        """
+        if self._stage is not None:
+            self._stage.__exit__(None, None, None)
+            self._stage = None
+        if name is not None:
+            self._stage = Span(self.tracer, name, self, {}).__enter__()
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        if self.events is None:
+            self.events = []
+        self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Só o que os writers gravam: o span concluído atravessa a fila dos processos do pool
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start_ns": self.start_ns, "end_ns": self.end_ns, "attributes": self.attributes,
+                "events": self.events, "error": self.error}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.tracer = None
+        self._stage = None
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span no formato JSON lines"""
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 4),
+            "attributes": self.attributes,
+            "status": "ERROR" if self.error else "OK"
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.events:
+            record["events"] = self.events
+        return record
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    """Span no mapeamento JSON do protocolo OTLP"""
+    record = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+    }
+    if span.parent_id:
+        record["parentSpanId"] = span.parent_id
+    if span.events:
+        record["events"] = [{"name": event["name"], "timeUnixNano": str(event["time_unix_nano"]),
+                             "attributes": _otlp_attributes(event["attributes"])} for event in span.events]
+    return record
+
+
+class JsonLinesSpanWriter:
+    """Grava um span por linha (executado na thread do SpanExporter)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stream = open(path, 'a', encoding='utf-8')
+
+    def write(self, span: Span) -> None:
+        self.stream.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+class OtlpJsonSpanWriter:
+    """Agrupa spans em requisições OTLP/JSON, uma por linha, como o receiver otlpjsonfile espera"""
+
+    def __init__(self, path: str, service_name: str = DEFAULT_SERVICE_NAME,
+                 batch_size: int = DEFAULT_OTLP_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})}
+        self.buffer: List[Dict[str, Any]] = []
+        self.stream = open(path, 'a', encoding='utf-8')
+
+    def write(self, span: Span) -> None:
+        self.buffer.append(otlp_span(span))
+        if len(self.buffer) >= self.batch_size:
+            self.flush_batch()
+
+    def flush_batch(self) -> None:
+        if not self.buffer:
+            return
+        request = {"resourceSpans": [{"resource": self.resource,
+                                      "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": self.buffer}]}]}
+        self.stream.write(json.dumps(request, ensure_ascii=False, default=str) + "\n")
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush_batch()
+        self.stream.close()
+
+
+class SpanExporter:
+    """
+    Thread que consome a fila de spans concluídos e os entrega ao writer.
+    Um span que falha ao ser gravado é registrado no log e descartado; a
+    thread continua com os próximos.
+    """
+
+    _STOP = object()
+
+    def __init__(self, writer: Any):
+        import queue
+        import threading
+
+        self.writer = writer
+        self.queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="arbitration-span-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            span = self.queue.get()
+            if span is self._STOP:
+                break
+            try:
+                self.writer.write(span)
+            except Exception:
+                logging.exception("Falha ao exportar o span %s", getattr(span, "name", span))
+
+    def stop(self) -> None:
+        """Grava os spans já enfileirados, encerra a thread e fecha o writer"""
+        self.queue.put_nowait(self._STOP)
+        self._thread.join()
+        self.writer.close()
+
+
+class Tracer:
+    """
+    Cria spans e os entrega à fila de exportação.
+
+    A decisão de amostragem é tomada no span raiz (uma arbitragem de persona)
+    e herdada pelas etapas filhas pelo contexto (contextvars). A thread de
+    exportação só existe no processo que configurou o rastreamento; um
+    processo do pool só exporta depois de configure_worker, pela fila de
+    start_worker_span_listener (sem isso, os spans dele são descartados).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self._queue = None
+        self._exporter: Optional[SpanExporter] = None
+        self._pid = None
+
+    def configure(self, path: str, trace_format: str = "jsonl", sample_rate: float = 1.0,
+                  service_name: str = DEFAULT_SERVICE_NAME) -> None:
+        """Liga o rastreamento gravando em path (jsonl ou otlp)"""
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Formato de rastreamento desconhecido: {trace_format}")
+        self.shutdown()
+        writer = OtlpJsonSpanWriter(path, service_name) if trace_format == "otlp" else JsonLinesSpanWriter(path)
+        self._exporter = SpanExporter(writer)
+        self._queue = self._exporter.queue
+        self._pid = os.getpid()
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.enabled = self.sample_rate > 0
+        logging.info("Rastreamento da arbitragem em %s (%s, amostragem %.0f%%)", path, trace_format,
+                     self.sample_rate * 100)
+
+    def configure_worker(self, span_queue, sample_rate: float) -> None:
+        """No processo filho: envia os spans concluídos para a fila do processo principal"""
+        # O exportador herdado (fork) pertence ao processo principal e não é tocado
+        self._exporter = None
+        self._queue = span_queue
+        self._pid = os.getpid()
+        self.sample_rate = sample_rate
+        self.enabled = sample_rate > 0
+
+    def shutdown(self) -> None:
+        """Esvazia a fila, grava os spans pendentes e fecha o arquivo"""
+        self.enabled = False
+        if self._exporter is not None:
+            self._queue = None
+            self._exporter.stop()
+            self._exporter = None
+
+    def span(self, name: str, **attributes: Any):
+        """Span de uma etapa; vira raiz (com amostragem) quando não há span ativo"""
+        if not self.enabled:
+            return NULL_SPAN
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledSpan()
+            return Span(self, name, None, attributes)
+        if isinstance(parent, _NullSpan):
+            return NULL_SPAN
+        return Span(self, name, parent, attributes)
+
+    def export(self, span: Span) -> None:
+        """Entrega o span concluído à fila (não bloqueia)"""
+        if self._queue is not None and os.getpid() == self._pid:
+            self._queue.put_nowait(span)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Tracer compartilhado do processo (desligado até configure_tracing)"""
+    return _tracer
+
+
+def configure_tracing(path: Optional[str] = None, trace_format: Optional[str] = None,
+                      sample_rate: Optional[float] = None, service_name: str = DEFAULT_SERVICE_NAME) -> Tracer:
+    """
+    Liga o rastreamento do processo. Sem argumentos, usa VCM_TRACE_FILE,
+    VCM_TRACE_FORMAT (jsonl/otlp) e VCM_TRACE_SAMPLE (0 a 1); sem arquivo,
+    o rastreamento continua desligado. Os spans pendentes são gravados na saída.
+    """
+    path = path or os.getenv('VCM_TRACE_FILE')
+    if path:
+        _tracer.configure(
+            path,
+            trace_format or os.getenv('VCM_TRACE_FORMAT', 'jsonl'),
+            sample_rate if sample_rate is not None else float(os.getenv('VCM_TRACE_SAMPLE', '1')),
+            service_name
+        )
+        atexit.register(_tracer.shutdown)
+    return _tracer
+
+
+def start_queue_logging(handlers: List[logging.Handler], level: int = logging.INFO,
+                        fmt: str = '%(asctime)s - %(levelname)s - %(message)s'):
+    """
+    Logging não bloqueante: o logger raiz só enfileira os registros e uma
+    thread (QueueListener) os formata e grava nos handlers. Devolve o listener,
+    que é parado (esvaziando a fila) na saída do processo.
+    """
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+
+    formatter = logging.Formatter(fmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler = QueueHandler(log_queue)
+    # O QueueHandler só resolve os argumentos; a formatação final é feita pelos handlers
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler])
+    listener.start()
+    atexit.register(listener.stop)
+    _queue_logging.update(handlers=list(handlers), level=level)
+    return listener
+
+
+def start_worker_log_listener():
+    """
+    Fila multiprocessing para os processos de um pool: os processos filhos
+    herdam o QueueHandler do logger raiz, mas a fila em memória dele só é lida
+    pela thread do processo principal. Devolve (fila, listener) ligados aos
+    mesmos handlers de start_queue_logging, ou (None, None) sem logging em fila.
+    O listener deve ser parado depois que o pool terminar.
+    """
+    if not _queue_logging:
+        return None, None
+    import multiprocessing
+    from logging.handlers import QueueListener
+
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, *_queue_logging["handlers"], respect_handler_level=True)
+    listener.start()
+    return log_queue, listener
+
+
+def init_worker_logging(log_queue, level: Optional[int] = None) -> None:
+    """No processo filho: envia os registros do logger raiz para a fila do processo principal"""
+    from logging.handlers import QueueHandler
+
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    if level is not None:
+        root.setLevel(level)
+
+
+class WorkerSpanListener:
+    """Thread do processo principal que repassa os spans dos processos do pool ao exportador"""
+
+    _STOP = None
+
+    def __init__(self, exporter: SpanExporter):
+        import multiprocessing
+        import threading
+
+        self.exporter = exporter
+        self.queue = multiprocessing.Queue()
+        self._thread = threading.Thread(target=self._run, name="arbitration-worker-spans", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            span = self.queue.get()
+            if span is self._STOP:
+                break
+            self.exporter.queue.put_nowait(span)
+
+    def stop(self) -> None:
+        """Repassa os spans já recebidos e encerra a thread (depois que o pool terminar)"""
+        self.queue.put(self._STOP)
+        self._thread.join()
+        self.queue.close()
+
+
+def start_worker_span_listener():
+    """
+    Fila multiprocessing para os spans dos processos de um pool, lida por uma
+    thread que os entrega ao exportador deste processo. Devolve (fila,
+    listener), ou (None, None) com o rastreamento desligado. O listener deve
+    ser parado depois que o pool terminar.
+    """
+    if not _tracer.enabled or _tracer._exporter is None:
+        return None, None
+    listener = WorkerSpanListener(_tracer._exporter)
+    return listener.queue, listener
+
+
+def init_worker_tracing(span_queue, sample_rate: float) -> None:
+    """No processo filho: liga o rastreamento enviando os spans para a fila do processo principal"""
+    _tracer.configure_worker(span_queue, sample_rate)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark da Arbitragem por Empresa no Banco
+Compara, em um Postgres local e em um schema descartável, três formas de
+arbitrar empresas inteiras:
+  - arbitrate_daily_tasks: uma chamada da função por persona
+  - arbitrate_empresa_tasks: um único INSERT ... SELECT por calendário
+  - TaskArbitrator em processo + carga com PersonaTaskLoader (COPY)
+e confere que o caminho set-based grava as mesmas tarefas (IDs e
+vencimentos) que o TaskArbitrator.
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import psycopg2
+
+import db_session
+from due_date_engine import BusinessCalendar
+from empresa_arbitration import SCHEMA_FILE, arbitrate_empresas
+from task_arbitrator import TaskArbitrator
+from task_loader import PersonaTaskLoader
+from template_registry import TemplateRegistry
+
+CARGOS = ["CEO", "Marketing Manager", "SDR", "CFO", "Sales Director"]
+
+TASKS_SCHEMA_FILE = Path(__file__).parent / "database-schema-tarefas.sql"
+
+# Tabelas mínimas de que o schema de tarefas depende
+BASE_SCHEMA_SQL = """
+    CREATE TABLE empresas (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        nome TEXT
+    );
+    CREATE TABLE personas (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        empresa_id UUID REFERENCES empresas(id) ON DELETE CASCADE,
+        nome TEXT,
+        cargo TEXT
+    );
+"""
+
+# uuid-ossp nem sempre está disponível em um Postgres local
+UUID_SHIM_SQL = """
+    DO $$
+    BEGIN
+        IF to_regproc('uuid_generate_v4') IS NULL THEN
+            CREATE FUNCTION uuid_generate_v4() RETURNS UUID AS 'SELECT gen_random_uuid()' LANGUAGE sql;
+        END IF;
+    END
+    $$;
+"""
+
+POPULATE_SQL = """
+    INSERT INTO personas (empresa_id, nome, cargo)
+    SELECT e.ids[1 + i %% array_length(e.ids, 1)], 'Persona ' || i, (%s::text[])[1 + i %% %s]
+    FROM generate_series(0, %s - 1) AS i,
+         (SELECT array_agg(id ORDER BY id) AS ids FROM empresas) e
+"""
+
+
+def connect(dsn: str, schema: str):
+    return psycopg2.connect(dsn, options=f"-c search_path={schema},public")
+
+
+def setup_schema(dsn: str, schema: str, empresas: int) -> List[str]:
+    """Cria o schema descartável com tabelas, funções e os templates embutidos do arbitrador"""
+    connection = connect(dsn, schema)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(BASE_SCHEMA_SQL)
+            cursor.execute(UUID_SHIM_SQL)
+            cursor.execute(TASKS_SCHEMA_FILE.read_text(encoding='utf-8'))
+            cursor.execute(SCHEMA_FILE.read_text(encoding='utf-8'))
+            for position, frequencies in TaskArbitrator().load_task_templates().items():
+                for frequency, tasks in frequencies.items():
+                    cursor.execute(
+                        "INSERT INTO task_templates (name, position_type, task_type, template_data) VALUES (%s, %s, %s, %s)",
+                        (f"{position} {frequency}", position, frequency, json.dumps({"tasks": tasks}))
+                    )
+            cursor.execute("INSERT INTO empresas (nome) SELECT 'Empresa ' || i FROM generate_series(1, %s) AS i "
+                           "RETURNING id::text", (empresas,))
+            empresa_ids = [row[0] for row in cursor.fetchall()]
+        connection.commit()
+        return empresa_ids
+    finally:
+        connection.close()
+
+
+def populate(connection, total: int) -> List[Dict[str, Any]]:
+    """Recria as personas sintéticas (cargos em rodízio entre as empresas)"""
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE persona_tasks, personas CASCADE")
+        cursor.execute(POPULATE_SQL, (CARGOS, len(CARGOS), total))
+        cursor.execute("ANALYZE personas")
+        cursor.execute("SELECT id::text, nome, cargo, empresa_id::text FROM personas")
+        personas = [{"id": pid, "nome": nome, "cargo": cargo, "empresa_id": empresa_id}
+                    for pid, nome, cargo, empresa_id in cursor.fetchall()]
+    connection.commit()
+    return personas
+
+
+def reset_tasks(connection) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE persona_tasks CASCADE")
+    connection.commit()
+
+
+def stored_tasks(connection) -> Set[Tuple[str, datetime]]:
+    """(task_id, due_date) de todas as tarefas gravadas"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT task_id, due_date FROM persona_tasks")
+        return set(cursor.fetchall())
+
+
+def task_count(connection) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM persona_tasks")
+        return cursor.fetchone()[0]
+
+
+def timed(function: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def per_task(elapsed: float, tasks: int) -> str:
+    """Custo médio por tarefa gravada"""
+    return f"{elapsed / max(tasks, 1) * 1e6:7.1f} µs/tarefa"
+
+
+def run_per_persona(connection, personas: List[Dict[str, Any]]) -> None:
+    """Uma chamada de arbitrate_daily_tasks por persona, em uma transação"""
+    with connection.cursor() as cursor:
+        for persona in personas:
+            cursor.execute("SELECT arbitrate_daily_tasks(%s::uuid)", (persona['id'],))
+    connection.commit()
+
+
+def run_in_process(connection, dsn: str, schema: str, personas: List[Dict[str, Any]],
+                   reference_date: datetime, timings: Dict[str, float]) -> None:
+    """TaskArbitrator com os templates do banco, seguido da carga por COPY"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.perf_counter()
+        registry = TemplateRegistry(cache_dir=Path(cache_dir), connection_factory=lambda: connect(dsn, schema))
+        arbitrator = TaskArbitrator.from_registry(registry)
+        arbitrator.calendars = {"default": BusinessCalendar()}
+        results = [arbitrator.arbitrate_tasks_for_persona(persona, reference_date) for persona in personas]
+        timings["arbitrate"] = time.perf_counter() - started
+    started = time.perf_counter()
+    PersonaTaskLoader(connection).load(results)
+    timings["load"] = time.perf_counter() - started
+
+
+def benchmark_size(dsn: str, schema: str, empresa_ids: List[str], total: int, reference_date: datetime,
+                   per_persona_limit: int) -> None:
+    """Mede os três caminhos para `total` personas"""
+    connection = connect(dsn, schema)
+    try:
+        personas = populate(connection, total)
+        calendars = {"default": BusinessCalendar()}
+        print(f"\n📊 {total} personas em {len(empresa_ids)} empresas")
+
+        if total <= per_persona_limit:
+            elapsed = timed(lambda: run_per_persona(connection, personas))
+            tasks = task_count(connection)
+            print(f"   arbitrate_daily_tasks (por persona): {elapsed:8.2f}s  {tasks:>8} tarefas  "
+                  f"{per_task(elapsed, tasks)}  (só o template diário)")
+        else:
+            print(f"   arbitrate_daily_tasks (por persona): ignorado acima de {per_persona_limit} personas")
+        reset_tasks(connection)
+
+        elapsed = timed(lambda: arbitrate_empresas(connection, empresa_ids, reference_date, calendars))
+        set_based = stored_tasks(connection)
+        print(f"   arbitrate_empresa_tasks (set-based): {elapsed:8.2f}s  {len(set_based):>8} tarefas  "
+              f"{per_task(elapsed, len(set_based))}")
+        elapsed = timed(lambda: arbitrate_empresas(connection, empresa_ids, reference_date, calendars))
+        print(f"   arbitrate_empresa_tasks (reexecução): {elapsed:7.2f}s  (upsert das mesmas tarefas)")
+        reset_tasks(connection)
+
+        timings: Dict[str, float] = {}
+        run_in_process(connection, dsn, schema, personas, reference_date, timings)
+        in_process = stored_tasks(connection)
+        elapsed = timings['arbitrate'] + timings['load']
+        print(f"   TaskArbitrator + COPY (em processo): {elapsed:8.2f}s  {len(in_process):>8} tarefas  "
+              f"{per_task(elapsed, len(in_process))}  (arbitragem {timings['arbitrate']:.2f}s, carga {timings['load']:.2f}s)")
+
+        if set_based != in_process:
+            raise SystemExit(f"❌ Tarefas divergentes: {len(set_based - in_process)} só no banco, "
+                             f"{len(in_process - set_based)} só no TaskArbitrator")
+        print("   ✅ IDs e vencimentos idênticos entre o banco e o TaskArbitrator")
+    finally:
+        connection.close()
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark da arbitragem por empresa no banco")
+    parser.add_argument('--dsn', default=None, help="Postgres local (padrão: VCM_DATABASE_URL)")
+    parser.add_argument('--schema', default="vcm_bench", help="Schema descartável usado no benchmark")
+    parser.add_argument('--sizes', default="1000,10000,100000", help="Quantidades de personas, separadas por vírgula")
+    parser.add_argument('--empresas', type=int, default=10, help="Empresas entre as quais as personas são divididas")
+    parser.add_argument('--per-persona-limit', type=int, default=100000,
+                        help="Maior quantidade de personas medida com arbitrate_daily_tasks")
+    parser.add_argument('--keep', action='store_true', help="Mantém o schema ao final")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    dsn = args.dsn or db_session.get_database_url()
+    reference_date = datetime(2025, 1, 15, 9, 30)
+    empresa_ids = setup_schema(dsn, args.schema, args.empresas)
+    try:
+        for total in (int(size) for size in args.sizes.split(',')):
+            benchmark_size(dsn, args.schema, empresa_ids, total, reference_date, args.per_persona_limit)
+    finally:
+        if not args.keep:
+            connection = psycopg2.connect(dsn)
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+            connection.commit()
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
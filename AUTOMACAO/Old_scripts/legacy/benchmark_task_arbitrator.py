@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Arbitrador de Tarefas VCM
+Mede o custo por persona da arbitragem compilada contra a implementação
+original, que reconstruía cada tarefa a partir dos templates brutos.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from arbitration_diff import ArbitrationDiff
+from arbitration_service import ArbitrationService, ServiceError
+from arbitration_tracing import configure_tracing, start_queue_logging
+from capacity_planner import CapacityPlanner
+from due_date_engine import BusinessCalendar, DueDateEngine
+from task_arbitrator import TaskArbitrator
+from task_dependency_graph import TaskDependencyGraph, analyze_dependencies
+
+CARGOS = ["CEO", "Marketing Manager", "SDR", "CFO", "Sales Director"]
+
+# Cargos livres e a posição de template esperada (None: nenhum template corresponde)
+CARGO_MATCH_CASES = [
+    ("Gerente de Marketing Sr", "Marketing Manager"),
+    ("Markting Manager", "Marketing Manager"),
+    ("Chief Marketing Officer", "Marketing Manager"),
+    ("Gerente de Vendas", "Sales Director"),
+    ("Sales Manager", "Sales Director"),
+    ("Diretor de Vendas Latam", "Sales Director"),
+    ("Gerente Financeiro", "CFO"),
+    ("Vendedor", "SDR"),
+    # Só tokens de nível em comum com os templates
+    ("Chief Technology Officer", None),
+    ("Diretor", None),
+    ("Manager", None),
+    ("HR Director", None),
+]
+
+# Inicialização medida: importar o arbitrador e criá-lo, como faz a linha de comando
+STARTUP_SNIPPET = "import task_arbitrator; task_arbitrator.TaskArbitrator()"
+
+# Módulos que só devem ser carregados quando usados (não na inicialização)
+LAZY_MODULES = ("numpy", "pyarrow", "psycopg2", "concurrent.futures.process", "due_date_engine",
+                "capacity_planner", "columnar_export", "task_dependency_graph", "template_registry")
+
+
+def legacy_calculate_due_date(frequency: str, base_date: datetime) -> str:
+    """Cálculo de vencimento original, uma tarefa por vez (ignora day_of_week/week_of_month)"""
+    if frequency == 'daily':
+        due_date = base_date.replace(hour=18, minute=0, second=0, microsecond=0)
+    elif frequency == 'weekly':
+        days_until_friday = (4 - base_date.weekday()) % 7
+        due_date = base_date + timedelta(days=days_until_friday)
+        due_date = due_date.replace(hour=17, minute=0, second=0, microsecond=0)
+    elif frequency == 'monthly':
+        if base_date.month == 12:
+            due_date = base_date.replace(year=base_date.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            due_date = base_date.replace(month=base_date.month + 1, day=1) - timedelta(days=1)
+        due_date = due_date.replace(hour=17, minute=0, second=0, microsecond=0)
+    else:
+        due_date = base_date + timedelta(days=1)
+
+    return due_date.isoformat()
+
+
+def legacy_generate_tasks(arbitrator: TaskArbitrator, persona_data: Dict[str, Any], frequency: str, current_date: datetime) -> List[Dict[str, Any]]:
+    """Geração de tarefas original: percorre os templates brutos a cada chamada"""
+    position = persona_data.get('cargo', 'Unknown')
+    tasks = []
+
+    position_templates = arbitrator.task_templates.get(position, {})
+    frequency_templates = position_templates.get(frequency, [])
+
+    for template in frequency_templates:
+        task = {
+            "id": f"{frequency}_{position.lower().replace(' ', '_')}_{current_date.strftime('%Y%m%d')}_{len(tasks) + 1}",
+            "title": template.get('title'),
+            "description": template.get('description'),
+            "task_type": frequency,
+            "priority": template.get('priority', 'MEDIUM'),
+            "status": "pending",
+            "estimated_duration": template.get('estimated_duration', 60),
+            "required_subsystems": template.get('required_subsystems', []),
+            "inputs_from": template.get('inputs_from', []),
+            "outputs_to": template.get('outputs_to', []),
+            "dependencies": template.get('dependencies', []),
+            "due_date": legacy_calculate_due_date(frequency, current_date),
+            "created_at": current_date.isoformat(),
+            "metadata": {
+                "arbitrated_by": "TaskArbitrator",
+                "template_based": True,
+                "frequency": frequency,
+                "position": position
+            }
+        }
+
+        if frequency == 'weekly':
+            task['day_of_week'] = template.get('day_of_week')
+        elif frequency == 'monthly':
+            task['week_of_month'] = template.get('week_of_month')
+
+        tasks.append(task)
+
+    return tasks
+
+
+def legacy_arbitrate_persona(arbitrator: TaskArbitrator, persona_data: Dict[str, Any], reference_date: datetime) -> Dict[str, Any]:
+    """Arbitragem original de uma persona (sem índice compilado)"""
+    persona_name = persona_data.get('nome', 'Unknown')
+    logging.info(f"Arbitrando tarefas para {persona_name} ({persona_data.get('cargo', 'Unknown')})")
+    daily_tasks = legacy_generate_tasks(arbitrator, persona_data, 'daily', reference_date)
+    weekly_tasks = legacy_generate_tasks(arbitrator, persona_data, 'weekly', reference_date)
+    monthly_tasks = legacy_generate_tasks(arbitrator, persona_data, 'monthly', reference_date)
+    integrations = arbitrator.load_subsystem_integrations().get(persona_data.get('cargo', 'Unknown'), {})
+    logging.info(f"Tarefas arbitradas com sucesso para {persona_name}: {len(daily_tasks)} diárias, {len(weekly_tasks)} semanais, {len(monthly_tasks)} mensais")
+
+    return {
+        "persona_id": persona_data.get('id'),
+        "persona_name": persona_name,
+        "position": persona_data.get('cargo', 'Unknown'),
+        "arbitration_timestamp": reference_date.isoformat(),
+        "daily_tasks": daily_tasks,
+        "weekly_tasks": weekly_tasks,
+        "monthly_tasks": monthly_tasks,
+        "subsystem_integrations": integrations,
+        "total_estimated_time": {
+            "daily_minutes": sum(task.get('estimated_duration', 0) for task in daily_tasks),
+            "weekly_minutes": sum(task.get('estimated_duration', 0) for task in weekly_tasks),
+            "monthly_minutes": sum(task.get('estimated_duration', 0) for task in monthly_tasks)
+        }
+    }
+
+
+def build_personas(total: int) -> List[Dict[str, Any]]:
+    """Gera personas sintéticas distribuídas entre os cargos com template"""
+    return [
+        {"id": f"persona_{i:06d}", "nome": f"Persona {i}", "cargo": CARGOS[i % len(CARGOS)], "empresa_id": "empresa_bench"}
+        for i in range(total)
+    ]
+
+
+def time_per_persona(fn: Callable[[Dict[str, Any]], Any], personas: List[Dict[str, Any]], repeat: int) -> float:
+    """Menor tempo médio por persona (em microssegundos) entre as repetições"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for persona in personas:
+            fn(persona)
+        best = min(best, time.perf_counter() - start)
+    return best / len(personas) * 1e6
+
+
+def benchmark_arbitration(total: int, repeat: int) -> None:
+    """Compara a arbitragem compilada com a implementação original"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    reference_date = datetime(2025, 1, 15, 9, 30)
+
+    # Garantir que as duas implementações produzem a mesma saída (exceto due_date,
+    # que agora segue o calendário e os campos do template, e id, agora derivado do conteúdo)
+    for persona in personas[:len(CARGOS)]:
+        expected = legacy_arbitrate_persona(arbitrator, persona, reference_date)
+        actual = arbitrator.arbitrate_tasks_for_persona(persona, reference_date)
+        for result in (expected, actual):
+            for key in ('daily_tasks', 'weekly_tasks', 'monthly_tasks'):
+                for task in result[key]:
+                    task.pop('due_date')
+                    task.pop('id')
+        if json.dumps(expected) != json.dumps(actual):
+            raise SystemExit(f"❌ Saída divergente para {persona['cargo']}")
+
+    legacy_us = time_per_persona(lambda p: legacy_arbitrate_persona(arbitrator, p, reference_date), personas, repeat)
+    compiled_us = time_per_persona(lambda p: arbitrator.arbitrate_tasks_for_persona(p, reference_date), personas, repeat)
+
+    print(f"📊 Arbitragem por persona ({total} personas, melhor de {repeat})")
+    print(f"   Original:  {legacy_us:8.2f} µs")
+    print(f"   Compilada: {compiled_us:8.2f} µs")
+    print(f"   Ganho:     {legacy_us / compiled_us:8.2f}x")
+
+
+def benchmark_due_dates(total: int, repeat: int) -> None:
+    """Compara o vencimento tarefa a tarefa com o cálculo em lote do DueDateEngine"""
+    arbitrator = TaskArbitrator()
+    templates = [
+        (frequency, template)
+        for frequencies in arbitrator.task_templates.values()
+        for frequency, frequency_templates in frequencies.items()
+        for template in frequency_templates
+    ]
+    batch = [templates[i % len(templates)] for i in range(total)]
+    frequencies = [frequency for frequency, _ in batch]
+    days_of_week = [template.get('day_of_week') for _, template in batch]
+    weeks_of_month = [template.get('week_of_month') for _, template in batch]
+    base_date = datetime(2025, 1, 15, 9, 30)
+    engine = DueDateEngine()
+
+    def best_of(fn: Callable[[], Any]) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best / total * 1e6
+
+    legacy_us = best_of(lambda: [legacy_calculate_due_date(frequency, base_date) for frequency in frequencies])
+    engine_us = best_of(lambda: engine.compute(frequencies, base_date, days_of_week, weeks_of_month))
+
+    print(f"📅 Vencimento por tarefa ({total} tarefas, melhor de {repeat})")
+    print(f"   Original (por tarefa): {legacy_us:8.3f} µs")
+    print(f"   DueDateEngine (lote):  {engine_us:8.3f} µs")
+    print(f"   Ganho:                 {legacy_us / engine_us:8.2f}x")
+
+
+def benchmark_horizon(total: int, days: int) -> None:
+    """Compara o horizonte em uma passada com uma arbitragem por dia do intervalo"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    start = datetime(2025, 3, 1, 9, 30)
+    horizon = (start.date(), start.date() + timedelta(days=days - 1))
+
+    begin = time.perf_counter()
+    for offset in range(days):
+        arbitrator.arbitrate_all_personas(personas, reference_date=start + timedelta(days=offset))
+    per_day_s = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    arbitrator.arbitrate_all_personas(personas, reference_date=start, horizon=horizon)
+    horizon_s = time.perf_counter() - begin
+
+    print(f"🗓️  Horizonte de {days} dias ({total} personas)")
+    print(f"   Uma execução por dia: {per_day_s:8.3f} s")
+    print(f"   Horizonte (1 passada): {horizon_s:8.3f} s")
+    print(f"   Ganho:                {per_day_s / horizon_s:8.2f}x")
+
+
+def benchmark_capacity(total: int, days: int) -> None:
+    """Mede o planejamento de capacidade sobre um horizonte de tarefas"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    start = datetime(2025, 3, 3, 9, 30)
+    horizon = (start.date(), start.date() + timedelta(days=days - 1))
+    persona_results = arbitrator.arbitrate_all_personas(personas, reference_date=start, horizon=horizon)["personas_tasks"]
+
+    begin = time.perf_counter()
+    report = CapacityPlanner().plan(persona_results)
+    elapsed = time.perf_counter() - begin
+
+    print(f"🧮 Planejamento de capacidade ({total} personas, {report['total_tasks']} tarefas)")
+    print(f"   Tempo:           {elapsed:8.3f} s")
+    print(f"   Redirecionadas:  {report['rerouted_tasks']:8d}")
+    print(f"   Com estouro:     {report['overflow_tasks']:8d}")
+
+
+def benchmark_dependencies(total: int, days: int) -> None:
+    """Mede a montagem do grafo de dependências e o cálculo do caminho crítico"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    start = datetime(2025, 3, 3, 9, 30)
+    horizon = (start.date(), start.date() + timedelta(days=days - 1))
+    persona_results = arbitrator.arbitrate_all_personas(personas, reference_date=start, horizon=horizon)["personas_tasks"]
+
+    report = analyze_dependencies(persona_results)
+
+    print(f"🔗 Grafo de dependências ({total} personas, {report['stats']['tasks']} tarefas, {report['stats']['edges']} arestas)")
+    print(f"   Montagem:        {report['build_seconds']:8.3f} s")
+    print(f"   Caminho crítico: {report['solve_seconds']:8.3f} s")
+
+
+def benchmark_memory(total: int, days: int) -> None:
+    """Compara a memória por tarefa dos resultados em dicts e do modelo compacto (TaskBatch)"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    start = datetime(2025, 3, 3, 9, 30)
+    horizon = (start.date(), start.date() + timedelta(days=days - 1))
+    # Os protótipos carimbados ficam em cache no arbitrador e não entram na medição
+    arbitrator.get_horizon_prototypes(*horizon, arbitrator.calendars["default"])
+
+    def measure(build: Callable[[], Any]) -> Any:
+        tracemalloc.start()
+        try:
+            result = build()
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, current
+
+    dict_results, dict_bytes = measure(
+        lambda: arbitrator.arbitrate_all_personas(personas, reference_date=start, horizon=horizon)["personas_tasks"])
+    batch, compact_bytes = measure(
+        lambda: arbitrator.arbitrate_compact(personas, reference_date=start, horizon=horizon))
+
+    assert json.dumps(batch.to_persona_results()) == json.dumps(dict_results), "modelo compacto divergente"
+
+    tasks = len(batch)
+    print(f"🗜️  Memória por tarefa ({total} personas, {tasks} tarefas)")
+    print(f"   Dicts:           {dict_bytes / tasks:8.1f} bytes")
+    print(f"   TaskBatch:       {compact_bytes / tasks:8.1f} bytes")
+    print(f"   Redução:         {dict_bytes / compact_bytes:8.2f}x")
+
+def benchmark_diff(total: int, days: int) -> None:
+    """Mede a comparação de duas execuções lidas em streaming (sem materializar os resultados)"""
+    start = datetime(2025, 3, 3, 9, 30)
+    horizon = (start.date(), start.date() + timedelta(days=days - 1))
+    personas = build_personas(total)
+
+    old_arbitrator = TaskArbitrator()
+    new_arbitrator = TaskArbitrator()
+    # Execução nova: um template mais longo, 1% das personas saiu e outras tantas entraram
+    new_arbitrator.task_templates["SDR"]["daily"][0]["estimated_duration"] += 15
+    new_arbitrator = TaskArbitrator(new_arbitrator.task_templates)
+    new_personas = personas[total // 100:] + build_personas(total + total // 100)[total:]
+
+    def stream(arbitrator: TaskArbitrator, empresa_personas: List[Dict[str, Any]]):
+        for shard_results, _ in arbitrator.iter_persona_results(empresa_personas, start, horizon=horizon):
+            yield from shard_results
+
+    report = ArbitrationDiff().diff(stream(old_arbitrator, personas), stream(new_arbitrator, new_personas))
+
+    print(f"🔍 Comparação de execuções ({report['old_tasks']} x {report['new_tasks']} tarefas)")
+    print(f"   Tempo total:     {report['diff_seconds']:8.3f} s (inclui a arbitragem em streaming)")
+    print(f"   Adicionadas:     {report['added']:8d}")
+    print(f"   Removidas:       {report['removed']:8d}")
+    print(f"   Alteradas:       {report['modified']:8d}")
+
+class CollectingHandler(logging.Handler):
+    """Guarda os registros recebidos (para conferir o que chegou ao log)"""
+
+    def __init__(self):
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def check_parallel_logging(total: int = 40, workers: int = 2) -> None:
+    """Erros de personas arbitradas nos processos do pool chegam ao log do processo principal"""
+    collector = CollectingHandler()
+    start_queue_logging([collector], logging.INFO)
+    personas = build_personas(total)
+    failing = personas[::10]
+    for persona in failing:
+        persona['cargo'] = ['cargo', 'inválido']  # não hasheável: a arbitragem da persona falha
+    results = TaskArbitrator().arbitrate_all_personas(personas, parallel=True, max_workers=workers, chunk_size=5,
+                                                      reference_date=datetime(2025, 1, 15, 9, 30))
+    errors = [record for record in collector.records if record.levelno == logging.ERROR]
+    if sum('error' in result for result in results["personas_tasks"]) != len(failing):
+        raise SystemExit("❌ Personas com erro não retornaram o erro no modo paralelo")
+    if len(errors) != len(failing):
+        raise SystemExit(f"❌ {len(errors)} de {len(failing)} erros dos processos do pool chegaram ao log")
+    print(f"📝 Log do modo paralelo: {len(errors)} de {len(failing)} erros dos processos do pool registrados")
+
+
+def check_cargo_matching() -> None:
+    """Cargos livres caem na posição esperada e não casam por um token genérico"""
+    matcher = TaskArbitrator().cargo_matcher
+    for cargo, expected in CARGO_MATCH_CASES:
+        position, confidence = matcher.match(cargo)
+        if position != expected:
+            raise SystemExit(f"❌ {cargo}: {position} (confiança {confidence:.2f}), esperado {expected}")
+    print(f"🔤 Correspondência de cargos: {len(CARGO_MATCH_CASES)} casos conferidos")
+
+
+def check_dependency_roles() -> None:
+    """Cargos aproximados entram no papel do template; entradas do próprio cargo não são externas"""
+    arbitrator = TaskArbitrator()
+    reference_date = datetime(2025, 1, 15, 9, 30)
+    personas = [{"id": "ceo", "cargo": "CEO"}, {"id": "vendas", "cargo": "Diretor de Vendas Latam"}]
+    results = [arbitrator.arbitrate_tasks_for_persona(persona, reference_date) for persona in personas]
+    graph = TaskDependencyGraph.build(results)
+    if ("sales director", "ceo", reference_date.date().isoformat()) not in graph.hubs:
+        raise SystemExit("❌ Cargo aproximado não assumiu o papel da posição de template no grafo")
+
+    task = dict(results[0]["daily_tasks"][0], inputs_from=["CEO"], outputs_to=[], dependencies=[])
+    own_input = {"persona_id": "ceo", "position": "CEO", "daily_tasks": [task]}
+    if TaskDependencyGraph.build([own_input]).stats["external_inputs"]:
+        raise SystemExit("❌ Entrada do próprio cargo contada como externa")
+    print(f"🔗 Papéis do grafo de dependências: {len(graph.hubs)} passagens entre cargos")
+
+
+def check_columnar_timezones(total: int = 10) -> None:
+    """Exportação colunar: horários com e sem offset de cada linha viram os mesmos instantes UTC"""
+    try:
+        from columnar_export import read_columns, task_schema, write_columnar_export
+        task_schema()
+    except RuntimeError:
+        print("⏭️  Exportação colunar com fuso: pyarrow não instalado")
+        return
+    arbitrator = TaskArbitrator()
+    arbitrator.calendars["empresa_tz"] = BusinessCalendar("America/Sao_Paulo")
+    columns = ["due_date", "created_at", "arbitration_timestamp"]
+    exported_rows = 0
+    # Com fuso: due_date e created_at com offset; padrão: todos sem offset (hora local do servidor)
+    for empresa_id in ("empresa_tz", "empresa_padrao"):
+        personas = [dict(persona, empresa_id=empresa_id) for persona in build_personas(total)]
+        results = [arbitrator.arbitrate_tasks_for_persona(persona, datetime(2025, 1, 15, 9, 30)) for persona in personas]
+        if empresa_id == "empresa_tz" and not all(datetime.fromisoformat(task['due_date']).tzinfo
+                                                  for task in results[0]['daily_tasks']):
+            raise SystemExit("❌ Calendário com fuso não gerou due_date com offset")
+        expected = sorted(
+            tuple(datetime.fromisoformat(value).timestamp()
+                  for value in (task['due_date'], task['created_at'], result['arbitration_timestamp']))
+            for result in results for key in ('daily_tasks', 'weekly_tasks', 'monthly_tasks') for task in result[key]
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+            write_columnar_export(results, Path(output_dir), empresa_id=empresa_id)
+            table = read_columns(Path(output_dir), columns, empresa_id=empresa_id)
+        exported = sorted(zip(*(tuple(moment.timestamp() for moment in table.column(column).to_pylist())
+                                for column in columns)))
+        if exported != expected:
+            raise SystemExit(f"❌ Exportação colunar ({empresa_id}) alterou os instantes das colunas de horário")
+        exported_rows += len(exported)
+    print(f"🌎 Exportação colunar: {exported_rows} linhas com vencimento, criação e arbitragem no mesmo relógio (UTC)")
+
+
+def check_calendar_reference() -> None:
+    """Hora do servidor sem fuso é convertida para o fuso da empresa antes de escolher o dia de vencimento"""
+    arbitrator = TaskArbitrator()
+    arbitrator.calendars["empresa_tz"] = BusinessCalendar("America/Sao_Paulo")
+    # 2025-02-01 01:00 UTC (sábado) é sexta, 31/01, 22:00 em São Paulo; datetime.now() vem sem fuso
+    reference_date = datetime(2025, 2, 1, 1, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    result = arbitrator.arbitrate_tasks_for_persona({"id": "fuso", "cargo": "CEO", "empresa_id": "empresa_tz"},
+                                                    reference_date)
+    task = result["daily_tasks"][0]
+    if not task["due_date"].startswith("2025-01-31T"):
+        raise SystemExit(f"❌ Vencimento diário {task['due_date']} ignorou o fuso da empresa (esperado 2025-01-31)")
+    if task["created_at"] != "2025-01-31T22:00:00-03:00":
+        raise SystemExit(f"❌ created_at {task['created_at']} não está no fuso da empresa, como due_date")
+    print(f"🕰️  Fuso da empresa: referência do servidor vira {task['created_at']}, vencimento {task['due_date']}")
+
+
+def check_incremental_rollover(total: int = 50) -> None:
+    """Execução incremental do dia seguinte não reprocessa personas nem reporta as tarefas como trocadas"""
+    personas = build_personas(total)
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_path = Path(state_dir) / "state.json"
+        arbitrator = TaskArbitrator()
+        arbitrator.arbitrate_incremental(personas, state_path, reference_date=datetime(2025, 1, 15, 9, 30))
+        nightly = arbitrator.arbitrate_incremental(personas, state_path, reference_date=datetime(2025, 1, 16, 9, 30))
+        if nightly["changed_personas"] or any(nightly["summary"].values()):
+            raise SystemExit(f"❌ Execução do dia seguinte: {nightly['changed_personas']} personas alteradas, "
+                             f"{nightly['summary']}")
+
+        # Template mais longo: só as tarefas desse template mudam, nenhuma é adicionada ou removida
+        templates = json.loads(json.dumps(arbitrator.task_templates))
+        templates["SDR"]["daily"][0]["estimated_duration"] += 15
+        changed = TaskArbitrator(templates).arbitrate_incremental(personas, state_path,
+                                                                  reference_date=datetime(2025, 1, 17, 9, 30))
+        sdrs = sum(persona["cargo"] == "SDR" for persona in personas)
+        if changed["summary"] != {"added_tasks": 0, "removed_tasks": 0, "changed_tasks": sdrs}:
+            raise SystemExit(f"❌ Template alterado: {changed['summary']}, esperado {sdrs} tarefas alteradas")
+        # Sem id, a persona não tem como ser reencontrada: fica de fora em vez de ganhar um id novo a cada execução
+        anonymous = [{"nome": "Sem id", "cargo": "CEO"}]
+        for day in (18, 19):
+            skipped = arbitrator.arbitrate_incremental(personas + anonymous, state_path,
+                                                       reference_date=datetime(2025, 1, day, 9, 30))
+            if skipped["skipped_personas"] != 1 or skipped["removed_personas"] or skipped["summary"]["added_tasks"]:
+                raise SystemExit("❌ Persona sem id gerou tarefas ou remoções na arbitragem incremental")
+    print(f"🌙 Incremental: dia seguinte sem reprocessar personas; template alterado em {sdrs} tarefas")
+
+
+def check_diff_timezones(total: int = 10) -> None:
+    """Exportações com e sem fuso, carregadas em uma sessão com outro TimeZone, não diferem do banco"""
+    from task_loader import TASK_COLUMNS, iter_task_rows
+
+    arbitrator = TaskArbitrator()
+    arbitrator.calendars["empresa_tz"] = BusinessCalendar("America/Sao_Paulo")
+    personas = [dict(persona, empresa_id="empresa_tz" if index % 2 else "empresa_padrao")
+                for index, persona in enumerate(build_personas(total))]
+    results = [arbitrator.arbitrate_tasks_for_persona(persona, datetime(2025, 1, 15, 9, 30)) for persona in personas]
+    keys = ('daily_tasks', 'weekly_tasks', 'monthly_tasks')
+
+    # Como o Postgres grava o due_date da carga (sem offset: TimeZone da sessão) e iter_db_snapshot o devolve
+    session_timezone = ZoneInfo("Pacific/Auckland")
+
+    def stored(value: str) -> str:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=session_timezone)
+        return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+    loaded = iter(stored(row[TASK_COLUMNS.index("due_date")]) for row in iter_task_rows(results))
+    snapshot = [dict(result, **{key: [dict(task, due_date=next(loaded)) for task in result[key]] for key in keys})
+                for result in results]
+    report = ArbitrationDiff().diff(results, snapshot)
+    if report["modified"] or report["added"] or report["removed"]:
+        raise SystemExit(f"❌ Exportação contra o banco: {report['modified']} tarefas marcadas como alteradas")
+    print(f"🕒 Comparação com o banco: {report['unchanged']} tarefas (com e sem fuso) iguais após a carga")
+
+
+def check_span_export_errors(total: int = 5) -> None:
+    """Um span que não pode ser gravado é descartado e a exportação continua com os seguintes"""
+    arbitrator = TaskArbitrator()
+    personas = build_personas(total)
+    collector = CollectingHandler()
+    logging.getLogger().addHandler(collector)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for trace_format in ("jsonl", "otlp"):
+            path = Path(output_dir) / f"spans.{trace_format}"
+            tracer = configure_tracing(str(path), trace_format)
+            circular: Dict[str, Any] = {}
+            circular["self"] = circular
+            with tracer.span("unserializable", payload=circular):
+                pass
+            for persona in personas:
+                arbitrator.arbitrate_tasks_for_persona(persona, datetime(2025, 1, 15, 9, 30))
+            tracer.shutdown()
+            lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+            if trace_format == "otlp":
+                names = [span["name"] for request in lines for resource in request["resourceSpans"]
+                         for scope in resource["scopeSpans"] for span in scope["spans"]]
+            else:
+                names = [span["name"] for span in lines]
+            if names.count("arbitrate_persona") != total:
+                raise SystemExit(f"❌ Rastreamento {trace_format}: {names.count('arbitrate_persona')} de {total} "
+                                 "spans gravados após um span com erro")
+    logging.getLogger().removeHandler(collector)
+    if not any(record.levelno == logging.ERROR and "unserializable" in record.getMessage()
+               for record in collector.records):
+        raise SystemExit("❌ Falha ao gravar um span não foi registrada no log")
+    print("🧵 Exportação de spans: erros de gravação não interrompem a thread (jsonl e otlp)")
+
+
+def check_parallel_tracing(total: int = 40, workers: int = 2) -> None:
+    """Spans por persona e por etapa criados nos processos do pool chegam ao arquivo do processo principal"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        path = Path(output_dir) / "spans.jsonl"
+        tracer = configure_tracing(str(path), "jsonl")
+        TaskArbitrator().arbitrate_all_personas(build_personas(total), parallel=True, max_workers=workers,
+                                                chunk_size=5, reference_date=datetime(2025, 1, 15, 9, 30))
+        tracer.shutdown()
+        spans = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    roots = [span for span in spans if span["name"] == "arbitrate_persona"]
+    root_ids = {span["span_id"] for span in roots}
+    stages = [span for span in spans if span["parent_span_id"] in root_ids]
+    if len(roots) != total or not stages:
+        raise SystemExit(f"❌ Rastreamento paralelo: {len(roots)} de {total} spans de persona, "
+                         f"{len(stages)} spans de etapa gravados")
+    print(f"🧵 Rastreamento paralelo: {len(roots)} spans de persona e {len(stages)} de etapa dos processos do pool")
+
+
+def check_batch_record_lookup(total: int = 2000) -> None:
+    """Acesso por índice ao TaskBatch devolve as mesmas tarefas da iteração, sem custo por persona"""
+    batch = TaskArbitrator().arbitrate_compact(build_personas(total), reference_date=datetime(2025, 1, 15, 9, 30))
+    start = time.perf_counter()
+    records = [batch.record(index) for index in range(len(batch))]
+    elapsed = time.perf_counter() - start
+
+    def fields(record) -> Tuple[Any, ...]:
+        return record.id, record.due_date, record.created_at, record.prototype
+
+    if list(map(fields, records)) != list(map(fields, batch)):
+        raise SystemExit("❌ TaskBatch.record diverge da iteração do lote")
+    print(f"📇 TaskBatch.record: {len(records)} tarefas de {total} personas em {elapsed * 1000:.1f} ms")
+
+
+def check_template_watermark() -> None:
+    """Template confirmado depois da leitura, com updated_at na marca d'água, entra no cache na atualização seguinte"""
+    from template_registry import TemplateRegistry
+
+    start = datetime(2025, 1, 15, 9, 30, tzinfo=timezone.utc)
+    table = {
+        "t1": ("t1", "SDR", "daily", "Prospecção", {"tasks": [{"title": "Ligar"}]}, True, start),
+        "t2": ("t2", "CEO", "weekly", "Reunião", {"tasks": [{"title": "Revisar"}]}, True, start + timedelta(seconds=1)),
+    }
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params):
+            rows = list(table.values())
+            if sql.lstrip().startswith("SELECT max(updated_at)"):
+                self.result = [(max(row[6] for row in rows), sum(row[5] for row in rows))]
+            elif "updated_at >=" in sql:
+                self.result = [row for row in rows if row[6] >= params["since"]]
+            elif "updated_at >" in sql:
+                self.result = [row for row in rows if row[6] > params["since"]]
+            else:
+                self.result = rows
+
+        def fetchone(self):
+            return self.result[0]
+
+        def fetchall(self):
+            return self.result
+
+    class Connection(Cursor):
+        def cursor(self):
+            return Cursor()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        registry = TemplateRegistry(cache_dir=Path(cache_dir), connection_factory=Connection)
+        registry.load(refresh=True)
+        # Transação concorrente iniciada antes da leitura: updated_at igual à marca d'água já gravada
+        table["t1"] = table["t1"][:4] + ({"tasks": [{"title": "Ligar e registrar"}]}, True, start + timedelta(seconds=1))
+        templates = registry.load(refresh=True)
+    titles = [task["title"] for task in templates["SDR"]["daily"]]
+    if titles != ["Ligar e registrar"]:
+        raise SystemExit(f"❌ Template alterado na marca d'água ficou fora do cache: {titles}")
+    print("🗂️  Registro de templates: alteração confirmada com updated_at na marca d'água foi lida")
+
+
+def check_arbitration_service(requests: int = 6, workers: int = 2) -> None:
+    """Serviço: personas ou empresa_id inválidos dão 400, pedidos sem data reaproveitam protótipos, um arbitrador por consumidor"""
+    for payload in ({"personas": [1, 2]}, {"empresa_id": "empresa_001"}):
+        try:
+            ArbitrationService.parse_request(payload)
+        except ServiceError as e:
+            if e.status != 400:
+                raise SystemExit(f"❌ Pedido inválido {payload} respondeu {e.status}, esperado 400")
+        else:
+            raise SystemExit(f"❌ Pedido inválido {payload} foi aceito")
+
+    async def run() -> ArbitrationService:
+        service = ArbitrationService(workers=workers, cache_ttl=0)
+        await service.start()
+        try:
+            # Personas diferentes a cada pedido: nada é coalescido nem vem do cache de respostas
+            await asyncio.gather(*(service.arbitrate(None, [dict(persona, id=f"servico_{index}_{persona['id']}")
+                                                           for persona in build_personas(5)])
+                                   for index in range(requests)))
+        finally:
+            await service.stop()
+        return service
+
+    service = asyncio.run(run())
+    if len({id(arbitrator) for arbitrator in service.arbitrators}) != workers:
+        raise SystemExit("❌ Consumidores da fila compartilham o mesmo arbitrador")
+    runs = sum(len(arbitrator._run_prototypes_cache) for arbitrator in service.arbitrators)
+    if runs > workers:
+        raise SystemExit(f"❌ {requests} pedidos sem reference_date montaram {runs} execuções de protótipos")
+    print(f"🛰️  Serviço de arbitragem: {requests} pedidos sem data em {runs} execução(ões) de protótipos, "
+          f"{workers} arbitradores")
+
+
+def run_python(code: str, importtime: bool = False) -> Tuple[float, str]:
+    """Executa código em um interpretador novo; devolve (segundos, stderr)"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=Path(__file__).parent, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, process.stderr
+
+
+def parse_importtime(report: str) -> List[Tuple[int, int, int, str]]:
+    """Linhas de -X importtime como (self µs, cumulativo µs, profundidade, módulo)"""
+    entries = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return entries
+
+
+def benchmark_startup(repeat: int, top: int = 8) -> None:
+    """Tempo de inicialização da linha de comando e relatório no estilo de -X importtime"""
+    run_python(STARTUP_SNIPPET)  # aquece o cache de bytecode
+    baseline = min(run_python("pass")[0] for _ in range(repeat))
+    startup = min(run_python(STARTUP_SNIPPET)[0] for _ in range(repeat))
+
+    # Subárvore de task_arbitrator: as linhas anteriores a ele até o módulo de nível 0 anterior
+    entries = parse_importtime(run_python(STARTUP_SNIPPET, importtime=True)[1])
+    position = max(i for i, entry in enumerate(entries) if entry[3] == 'task_arbitrator' and entry[2] == 0)
+    first = position
+    while first > 0 and entries[first - 1][2] > 0:
+        first -= 1
+    subtree = entries[first:position + 1]
+    children = sorted((entry for entry in subtree if entry[2] == 1), key=lambda entry: -entry[1])
+    loaded = {entry[3] for entry in subtree}
+
+    print(f"🚀 Inicialização (import + TaskArbitrator(), melhor de {repeat})")
+    print(f"   Python vazio:    {baseline * 1000:8.1f} ms")
+    print(f"   Arbitrador:      {startup * 1000:8.1f} ms (+{(startup - baseline) * 1000:.1f} ms)")
+    print(f"   import task_arbitrator: {entries[position][1] / 1000:.1f} ms cumulativos")
+    for self_us, cumulative_us, _, name in children[:top]:
+        print(f"      {cumulative_us / 1000:7.1f} ms  {name}")
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"   ⚠️  Carregados na inicialização: {', '.join(eager)}")
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark do TaskArbitrator")
+    parser.add_argument('--personas', type=int, default=20000, help="Quantidade de personas sintéticas")
+    parser.add_argument('--repeat', type=int, default=5, help="Repetições por medição")
+    parser.add_argument('--tasks', type=int, default=100000, help="Tarefas no benchmark de vencimentos")
+    parser.add_argument('--horizon-days', type=int, default=30, help="Dias no benchmark de horizonte")
+    parser.add_argument('--startup-only', action='store_true', help="Mede somente a inicialização")
+    args = parser.parse_args()
+
+    benchmark_startup(args.repeat)
+    if args.startup_only:
+        return
+
+    check_parallel_logging()
+    check_cargo_matching()
+    check_dependency_roles()
+    check_calendar_reference()
+    check_incremental_rollover()
+    check_columnar_timezones()
+    check_diff_timezones()
+    check_span_export_errors()
+    check_parallel_tracing()
+    check_batch_record_lookup()
+    check_template_watermark()
+    check_arbitration_service()
+
+    # O custo de logging não faz parte da medição
+    logging.disable(logging.CRITICAL)
+
+    benchmark_arbitration(args.personas, args.repeat)
+    benchmark_due_dates(args.tasks, args.repeat)
+    benchmark_horizon(min(args.personas, 2000), args.horizon_days)
+    benchmark_capacity(10000, 7)
+    benchmark_dependencies(10000, 7)
+    benchmark_memory(5000, 7)
+    benchmark_diff(40000, 14)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Planejador de Capacidade de Tarefas VCM
+Distribui as tarefas arbitradas respeitando a jornada de cada persona:
+cada tarefa é encaixada nos dias úteis da sua janela (criação → vencimento)
+e, se o responsável não tiver capacidade, é redirecionada a um colega do
+mesmo cargo. O que não couber em ninguém é registrado como estouro.
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from due_date_engine import BusinessCalendar
+
+# Jornada padrão por persona e dia útil, em minutos
+DEFAULT_CAPACITY_MINUTES = 480
+
+# Quantos colegas do mesmo cargo são testados antes de registrar estouro
+DEFAULT_MAX_PEER_ATTEMPTS = 4
+
+PRIORITY_RANK = {"URGENT": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
+
+FREQUENCY_KEYS = ("daily_tasks", "weekly_tasks", "monthly_tasks")
+
+
+class CapacityPlanner:
+    """
+    Alocação gulosa por prazo (EDF) com capacidade diária por persona.
+
+    As tarefas são processadas por vencimento e prioridade; cada uma é
+    dividida entre os dias livres da janela do responsável. Os dias lotados
+    são pulados com uma estrutura union-find ("próximo dia com capacidade"),
+    e os colegas candidatos saem de um heap por capacidade livre, de modo que
+    o custo por tarefa é praticamente constante.
+    """
+
+    def __init__(self, capacity_minutes: int = DEFAULT_CAPACITY_MINUTES,
+                 calendar: Optional[BusinessCalendar] = None,
+                 capacities: Optional[Dict[str, int]] = None,
+                 reroute: bool = True,
+                 max_peer_attempts: int = DEFAULT_MAX_PEER_ATTEMPTS):
+        self.capacity_minutes = capacity_minutes
+        self.calendar = calendar or BusinessCalendar()
+        self.capacities = capacities or {}
+        self.reroute = reroute
+        self.max_peer_attempts = max_peer_attempts
+
+    def plan(self, persona_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Planeja as tarefas dos resultados do arbitrador (alterados no lugar).
+
+        Cada tarefa recebe assigned_to e metadata["capacity_plan"] com os
+        minutos agendados por dia. Retorna o relatório de utilização e estouros.
+        """
+        start_time = time.perf_counter()
+        personas = [p for p in persona_results if 'error' not in p]
+        day_cache: Dict[str, int] = {}
+
+        def day_of(value: Optional[str]) -> int:
+            key = (value or '')[:10]
+            ordinal = day_cache.get(key)
+            if ordinal is None:
+                ordinal = date.fromisoformat(key).toordinal()
+                day_cache[key] = ordinal
+            return ordinal
+
+        # Coletar as tarefas com sua janela em dias
+        entries = []
+        for index, persona in enumerate(personas):
+            for key in FREQUENCY_KEYS:
+                for task in persona.get(key, ()):
+                    due = day_of(task['due_date'])
+                    start = min(day_of(task.get('created_at') or task['due_date']), due)
+                    entries.append((due, PRIORITY_RANK.get(task.get('priority'), 2), len(entries), start, index, task))
+
+        report = {
+            "total_tasks": len(entries),
+            "scheduled_tasks": 0,
+            "rerouted_tasks": 0,
+            "overflow_tasks": 0,
+            "overflow_minutes": 0,
+            "overflows": [],
+            "personas": {}
+        }
+        if not entries:
+            return report
+
+        first_day = min(entry[3] for entry in entries)
+        total_days = max(entry[0] for entry in entries) - first_day + 1
+        stride = total_days + 1  # um dia sentinela por persona
+
+        # Capacidade por (persona, dia): zero nos dias não úteis do calendário
+        days = np.arange(total_days) + np.datetime64(date.fromordinal(first_day), 'D')
+        business = np.is_busday(days, busdaycal=self.calendar.busdaycal).tolist()
+        remaining: List[int] = []
+        capacity_total = []
+        for persona in personas:
+            capacity = int(self.capacities.get(persona.get('persona_id'), self.capacity_minutes))
+            remaining.extend(capacity if is_business else 0 for is_business in business)
+            remaining.append(0)
+            capacity_total.append(capacity * sum(business))
+        free_total = list(capacity_total)
+
+        # next_free[x] aponta para um dia igual ou posterior a x que ainda pode ter capacidade
+        next_free = list(range(len(remaining)))
+        for x, minutes in enumerate(remaining):
+            if minutes <= 0 and (x + 1) % stride:
+                next_free[x] = x + 1
+
+        def find(x: int) -> int:
+            root = x
+            while next_free[root] != root:
+                root = next_free[root]
+            while next_free[x] != root:
+                next_free[x], x = root, next_free[x]
+            return root
+
+        def fits(index: int, start: int, end: int, minutes: int) -> bool:
+            base = index * stride
+            last = base + end
+            free = 0
+            x = find(base + start)
+            while x <= last and free < minutes:
+                free += remaining[x]
+                x = find(x + 1)
+            return free >= minutes
+
+        def allocate(index: int, start: int, end: int, minutes: int) -> Dict[int, int]:
+            """Consome até `minutes` da janela, do primeiro dia livre em diante"""
+            base = index * stride
+            last = base + end
+            scheduled = {}
+            x = find(base + start)
+            while x <= last and minutes > 0:
+                used = min(remaining[x], minutes)
+                remaining[x] -= used
+                minutes -= used
+                scheduled[x - base] = used
+                if remaining[x] <= 0:
+                    next_free[x] = x + 1
+                x = find(x + 1)
+            free_total[index] -= sum(scheduled.values())
+            return scheduled
+
+        # Heap de colegas por cargo, ordenado pela capacidade livre (entradas antigas são ignoradas)
+        peers: Dict[str, List[Tuple[int, int]]] = {}
+        if self.reroute:
+            for index, persona in enumerate(personas):
+                peers.setdefault(persona.get('position'), []).append((-free_total[index], index))
+            for heap in peers.values():
+                heapq.heapify(heap)
+
+        def find_peer(owner: int, start: int, end: int, minutes: int) -> Optional[int]:
+            heap = peers.get(personas[owner].get('position'))
+            if not heap:
+                return None
+            tried = []
+            chosen = None
+            while heap and len(tried) < self.max_peer_attempts:
+                neg_free, index = heapq.heappop(heap)
+                if -neg_free != free_total[index]:
+                    continue
+                tried.append(index)
+                if -neg_free < minutes:
+                    break
+                if index != owner and fits(index, start, end, minutes):
+                    chosen = index
+                    break
+            for index in tried:
+                if index != chosen:
+                    heapq.heappush(heap, (-free_total[index], index))
+            return chosen
+
+        # A sequência (3º campo) é única, então a ordenação nunca compara as tarefas
+        entries.sort()
+        day_labels = [date.fromordinal(first_day + day).isoformat() for day in range(total_days)]
+        for due, _, _, start, owner, task in entries:
+            minutes = int(task.get('estimated_duration') or 0)
+            start_offset = start - first_day
+            due_offset = due - first_day
+            assignee = owner
+            overflow = 0
+
+            if fits(owner, start_offset, due_offset, minutes):
+                scheduled = allocate(owner, start_offset, due_offset, minutes)
+            else:
+                peer = find_peer(owner, start_offset, due_offset, minutes) if self.reroute else None
+                if peer is not None:
+                    assignee = peer
+                    scheduled = allocate(peer, start_offset, due_offset, minutes)
+                    report["rerouted_tasks"] += 1
+                else:
+                    # Ninguém comporta a tarefa: o responsável fica com o excedente no vencimento
+                    scheduled = allocate(owner, start_offset, due_offset, minutes)
+                    overflow = minutes - sum(scheduled.values())
+                    scheduled[due_offset] = scheduled.get(due_offset, 0) + overflow
+                    report["overflow_tasks"] += 1
+                    report["overflow_minutes"] += overflow
+                    report["overflows"].append({
+                        "task_id": task['id'],
+                        "persona_id": personas[owner].get('persona_id'),
+                        "due_date": task['due_date'],
+                        "overflow_minutes": overflow
+                    })
+
+            if self.reroute:
+                heapq.heappush(peers[personas[assignee].get('position')], (-free_total[assignee], assignee))
+
+            task['assigned_to'] = personas[assignee].get('persona_id')
+            plan = {
+                "scheduled_minutes": {day_labels[day]: scheduled[day] for day in sorted(scheduled)},
+                "overflow_minutes": overflow
+            }
+            if assignee != owner:
+                plan['rerouted_from'] = personas[owner].get('persona_id')
+            task.setdefault('metadata', {})['capacity_plan'] = plan
+            if not overflow:
+                report["scheduled_tasks"] += 1
+
+        for index, persona in enumerate(personas):
+            used = capacity_total[index] - free_total[index]
+            report["personas"][persona.get('persona_id')] = {
+                "position": persona.get('position'),
+                "capacity_minutes": capacity_total[index],
+                "scheduled_minutes": used,
+                "utilization": round(used / capacity_total[index], 4) if capacity_total[index] else None
+            }
+
+        report["horizon_start"] = date.fromordinal(first_day).isoformat()
+        report["horizon_end"] = date.fromordinal(first_day + total_days - 1).isoformat()
+        report["solve_seconds"] = round(time.perf_counter() - start_time, 4)
+        logging.info("Plano de capacidade: %d tarefas, %d redirecionadas, %d com estouro (%.3fs)",
+                     report["total_tasks"], report["rerouted_tasks"], report["overflow_tasks"], report["solve_seconds"])
+        return report
+
+
+def main():
+    """Planeja a capacidade de uma exportação do arbitrador"""
+    from task_loader import read_arbitration_export
+
+    parser = argparse.ArgumentParser(description="Planejamento de capacidade das tarefas arbitradas")
+    parser.add_argument('export_file', type=Path, help="Exportação do arbitrador (.json, .ndjson ou .ndjson.gz)")
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY_MINUTES, help="Minutos por persona e dia útil")
+    parser.add_argument('--no-reroute', action='store_true', help="Não redireciona tarefas para colegas do mesmo cargo")
+    parser.add_argument('--output', type=Path, default=None, help="Arquivo JSON com as tarefas planejadas e o relatório")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    empresa_id, persona_results = read_arbitration_export(args.export_file)
+    persona_results = list(persona_results)
+    planner = CapacityPlanner(capacity_minutes=args.capacity, reroute=not args.no_reroute)
+    report = planner.plan(persona_results)
+
+    output_path = args.output or args.export_file.with_name(args.export_file.name.split('.')[0] + '_capacity.json')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({"empresa_id": empresa_id, "personas_tasks": persona_results, "capacity_plan": report},
+                  f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Planejamento concluído em {report['solve_seconds']}s")
+    print(f"📋 Tarefas: {report['total_tasks']}")
+    print(f"🔀 Redirecionadas: {report['rerouted_tasks']}")
+    print(f"⚠️  Com estouro de capacidade: {report['overflow_tasks']} ({report['overflow_minutes']} minutos)")
+    print(f"📄 Arquivo exportado: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Correspondência de Cargos VCM
+Mapeia cargos livres das personas ("Diretor de Vendas", "Senior SDR") para a
+posição de template mais próxima, usando um índice pré-calculado de tokens
+e trigramas sobre os nomes das posições e seus apelidos.
+"""
+
+import argparse
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Confiança mínima para aceitar uma correspondência aproximada
+DEFAULT_MIN_CONFIDENCE = 0.5
+
+# Tokens de nível hierárquico: sozinhos não identificam a função do cargo
+GENERIC_TOKENS = {"director", "manager", "chief", "officer", "head", "vp"}
+
+# Peso de um token genérico na sobreposição de tokens (os demais pesam 1)
+GENERIC_TOKEN_WEIGHT = 0.25
+
+# Fator aplicado quando cargo e rótulo não compartilham nenhum token discriminativo
+GENERIC_ONLY_PENALTY = 0.5
+
+# Similaridade mínima (Dice de trigramas) para tratar dois tokens como a mesma palavra com grafia diferente
+TOKEN_SIMILARITY = 0.6
+
+# Senioridade e nível não mudam a função do cargo
+SENIORITY_TOKENS = {
+    "senior", "sr", "junior", "jr", "pleno", "pl", "trainee", "estagiario", "intern",
+    "i", "ii", "iii", "iv"
+}
+
+STOPWORDS = {"de", "da", "do", "das", "dos", "e", "em", "of", "the", "and", "&", "-", "/"}
+
+# Traduções de tokens comuns em cargos (português -> vocabulário dos templates)
+TOKEN_TRANSLATIONS = {
+    "diretor": "director", "diretora": "director",
+    "gerente": "manager", "gestor": "manager", "gestora": "manager",
+    "vendas": "sales", "comercial": "sales", "vendedor": "salesperson", "vendedora": "salesperson",
+    "financeiro": "financial", "financeira": "financial", "financas": "financial",
+    "executivo": "executive", "executiva": "executive",
+    "marketing": "marketing", "mkt": "marketing",
+    "operacoes": "operations", "tecnologia": "technology",
+    "recursos": "resources", "humanos": "human", "rh": "hr",
+}
+
+# Apelidos conhecidos por posição de template
+DEFAULT_ALIASES = {
+    "CEO": ["Chief Executive Officer", "Diretor Executivo", "Diretora Executiva", "Presidente", "Founder", "Fundador"],
+    "CFO": ["Chief Financial Officer", "Diretor Financeiro", "Diretora Financeira", "Head de Finanças"],
+    "Sales Director": ["Diretor de Vendas", "Diretora de Vendas", "Diretor Comercial", "Diretora Comercial",
+                       "Head de Vendas", "VP de Vendas", "VP of Sales"],
+    "Marketing Manager": ["Gerente de Marketing", "Head de Marketing", "Coordenador de Marketing"],
+    "SDR": ["Sales Development Representative", "BDR", "Business Development Representative",
+            "Pré-vendas", "Pré-vendedor", "Pre-vendas"],
+}
+
+
+def normalize_label(value: Any) -> str:
+    """Normaliza cargos e títulos para comparação (sem acentos, minúsculas, espaços simples)"""
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def cargo_tokens(value: Any) -> Tuple[str, ...]:
+    """Tokens significativos de um cargo: sem senioridade, stopwords e já traduzidos"""
+    # Pontos de abreviação são removidos ("C.E.O." -> "ceo", "Sr." -> "sr")
+    text = normalize_label(value).replace(".", "")
+    for separator in "-/,()":
+        text = text.replace(separator, " ")
+    tokens = []
+    for token in text.split():
+        if token in STOPWORDS or token in SENIORITY_TOKENS:
+            continue
+        tokens.append(TOKEN_TRANSLATIONS.get(token, token))
+    return tuple(tokens)
+
+
+def trigrams(tokens: Iterable[str]) -> Set[str]:
+    """Trigramas de caracteres de cada token (com bordas), para tolerar grafias diferentes"""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def token_weight(token: str) -> float:
+    """Peso do token na sobreposição: tokens de nível pesam menos que os de função"""
+    return GENERIC_TOKEN_WEIGHT if token in GENERIC_TOKENS else 1.0
+
+
+class CargoMatcher:
+    """
+    Índice invertido de tokens e trigramas sobre as posições de template.
+
+    Correspondências exatas (após normalização, remoção de senioridade e
+    tradução) têm confiança 1.0. As demais são pontuadas pela sobreposição
+    de tokens (Jaccard ponderado, com tokens de grafia parecida contando
+    pela similaridade) e de trigramas (Dice) contra os candidatos que
+    compartilham ao menos um token ou trigrama. Tokens de nível (director,
+    manager, chief...) pesam pouco, e a pontuação cai pela metade quando
+    cargo e rótulo só têm tokens de nível em comum: "Diretor" ou "Chief
+    Technology Officer" não viram Sales Director ou CEO por um token genérico.
+
+    O resultado é memorizado por cargo distinto, então o custo por persona é
+    uma consulta em dicionário.
+    """
+
+    def __init__(self, positions: Iterable[str], aliases: Optional[Dict[str, List[str]]] = None,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.positions = list(positions)
+        self.min_confidence = min_confidence
+        aliases = DEFAULT_ALIASES if aliases is None else aliases
+
+        # Cada rótulo (posição ou apelido) aponta para a posição de template
+        self.labels: List[Tuple[str, Tuple[str, ...], Set[str]]] = []
+        self.exact: Dict[Tuple[str, ...], str] = {}
+        self.token_index: Dict[str, Set[int]] = {}
+        self.trigram_index: Dict[str, Set[int]] = {}
+        for position in self.positions:
+            for label in [position] + list(aliases.get(position, ())):
+                tokens = cargo_tokens(label)
+                if not tokens:
+                    continue
+                label_id = len(self.labels)
+                grams = trigrams(tokens)
+                self.labels.append((position, tokens, grams))
+                self.exact.setdefault(tokens, position)
+                self.exact.setdefault(tuple(sorted(tokens)), position)
+                for token in tokens:
+                    self.token_index.setdefault(token, set()).add(label_id)
+                for gram in grams:
+                    self.trigram_index.setdefault(gram, set()).add(label_id)
+
+        self._cache: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def match(self, cargo: Any) -> Tuple[Optional[str], float]:
+        """Retorna (posição de template, confiança) ou (None, melhor confiança) abaixo do mínimo"""
+        key = str(cargo)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._match(key)
+            self._cache[key] = cached
+        return cached
+
+    def _match(self, cargo: str) -> Tuple[Optional[str], float]:
+        tokens = cargo_tokens(cargo)
+        if not tokens:
+            return None, 0.0
+        position = self.exact.get(tokens) or self.exact.get(tuple(sorted(tokens)))
+        if position is not None:
+            return position, 1.0
+
+        token_set = set(tokens)
+        grams = trigrams(tokens)
+        candidates: Set[int] = set()
+        for token in token_set:
+            candidates |= self.token_index.get(token, set())
+        for gram in grams:
+            candidates |= self.trigram_index.get(gram, set())
+
+        token_grams = {token: trigrams((token,)) for token in token_set}
+        cargo_weight = sum(token_weight(token) for token in token_set)
+
+        best_position, best_score = None, 0.0
+        for label_id in sorted(candidates):
+            position, label_tokens, label_grams = self.labels[label_id]
+            label_set = set(label_tokens)
+            shared, discriminative = self._shared_weight(token_set, token_grams, label_set)
+            union = cargo_weight + sum(token_weight(token) for token in label_set) - shared
+            token_score = shared / union
+            gram_score = 2 * len(grams & label_grams) / (len(grams) + len(label_grams))
+            score = 0.6 * token_score + 0.4 * gram_score
+            if not discriminative:
+                score *= GENERIC_ONLY_PENALTY
+            if score > best_score:
+                best_position, best_score = position, score
+
+        best_score = round(best_score, 4)
+        if best_score < self.min_confidence:
+            return None, best_score
+        return best_position, best_score
+
+    @staticmethod
+    def _shared_weight(token_set: Set[str], token_grams: Dict[str, Set[str]], label_set: Set[str]) -> Tuple[float, bool]:
+        """
+        Peso dos tokens do cargo presentes no rótulo (iguais ou com grafia
+        parecida, pela similaridade) e se algum deles é discriminativo.
+        """
+        shared, discriminative = 0.0, False
+        for token in token_set:
+            if token in label_set:
+                similarity = 1.0
+            else:
+                similarity = 0.0
+                grams = token_grams[token]
+                for label_token in label_set:
+                    if (token in GENERIC_TOKENS) != (label_token in GENERIC_TOKENS):
+                        continue
+                    other = trigrams((label_token,))
+                    dice = 2 * len(grams & other) / (len(grams) + len(other))
+                    if dice >= TOKEN_SIMILARITY and dice > similarity:
+                        similarity = dice
+            if similarity:
+                shared += token_weight(token) * similarity
+                discriminative = discriminative or token not in GENERIC_TOKENS
+        return shared, discriminative
+
+    def cache_info(self) -> Dict[str, int]:
+        """Tamanho do índice e do cache de cargos"""
+        return {"labels": len(self.labels), "tokens": len(self.token_index),
+                "trigrams": len(self.trigram_index), "cached_cargos": len(self._cache)}
+
+
+def main():
+    """Mostra a posição de template escolhida para cada cargo informado"""
+    from task_arbitrator import TaskArbitrator
+
+    parser = argparse.ArgumentParser(description="Correspondência de cargos com posições de template")
+    parser.add_argument('cargos', nargs='+', help="Cargos a consultar")
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE, help="Confiança mínima")
+    args = parser.parse_args()
+
+    matcher = CargoMatcher(TaskArbitrator().task_templates, min_confidence=args.min_confidence)
+    for cargo in args.cargos:
+        position, confidence = matcher.match(cargo)
+        if position:
+            print(f"✅ {cargo} → {position} (confiança {confidence:.2f})")
+        else:
+            print(f"❌ {cargo}: sem template correspondente (melhor confiança {confidence:.2f})")
+
+
+if __name__ == "__main__":
+    main()
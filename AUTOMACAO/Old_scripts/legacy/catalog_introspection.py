@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Catálogo do Schema VCM
+Carrega tabelas, colunas (tipo, tamanho, nulidade, default), constraints e
+índices de um schema do Postgres em uma única consulta ao pg_catalog e mantém
+um cache local em pickle, versionado pelo estado do catálogo. Perguntas de
+existência e formato (a tabela existe? tem a coluna? tem índice por essas
+colunas?) são respondidas em memória, sem contar linhas nem tocar no banco.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# Versão do formato do arquivo de cache (mudar invalida os caches existentes)
+CACHE_FORMAT_VERSION = 1
+
+# Por quanto tempo o cache é usado sem consultar o banco, em segundos
+DEFAULT_TTL_SECONDS = 300
+
+# Versão do schema: hash do xmin das linhas de catálogo do schema. Qualquer DDL
+# (tabela, coluna, constraint ou índice) reescreve alguma dessas linhas;
+# VACUUM/ANALYZE atualizam pg_class no lugar e não mudam a versão.
+VERSION_SQL = """
+    SELECT md5(coalesce(string_agg(entry, ',' ORDER BY entry), ''))
+    FROM (
+        SELECT c.oid::text || ':' || c.xmin::text
+        FROM pg_class c
+        WHERE c.relnamespace = %(schema)s::regnamespace
+        UNION ALL
+        SELECT a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        WHERE c.relnamespace = %(schema)s::regnamespace AND a.attnum > 0
+        UNION ALL
+        SELECT 'c' || con.oid::text || ':' || con.xmin::text
+        FROM pg_constraint con
+        WHERE con.connamespace = %(schema)s::regnamespace
+    ) AS catalog(entry)
+"""
+
+CATALOG_SQL = """
+    SELECT
+        c.relname,
+        c.relkind::text,
+        c.reltuples::bigint,
+        (SELECT json_agg(json_build_object(
+                    'name', a.attname,
+                    'type', format_type(a.atttypid, a.atttypmod),
+                    'data_type', format_type(a.atttypid, NULL),
+                    'length', CASE WHEN a.atttypid IN ('varchar'::regtype, 'bpchar'::regtype) AND a.atttypmod > 0
+                                   THEN a.atttypmod - 4 END,
+                    'nullable', NOT a.attnotnull,
+                    'default', pg_get_expr(d.adbin, d.adrelid)
+                ) ORDER BY a.attnum)
+         FROM pg_attribute a
+         LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+         WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped),
+        (SELECT json_agg(json_build_object(
+                    'name', con.conname,
+                    'type', con.contype,
+                    'columns', (SELECT array_agg(a.attname ORDER BY k.ord)
+                                FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum),
+                    'definition', pg_get_constraintdef(con.oid)
+                ) ORDER BY con.conname)
+         FROM pg_constraint con
+         WHERE con.conrelid = c.oid),
+        (SELECT json_agg(json_build_object(
+                    'name', i.relname,
+                    'columns', (SELECT array_agg(coalesce(a.attname, '?') ORDER BY k.ord)
+                                FROM unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+                                LEFT JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum),
+                    'unique', x.indisunique,
+                    'primary', x.indisprimary,
+                    'valid', x.indisvalid,
+                    'predicate', pg_get_expr(x.indpred, x.indrelid),
+                    'definition', pg_get_indexdef(x.indexrelid)
+                ) ORDER BY i.relname)
+         FROM pg_index x
+         JOIN pg_class i ON i.oid = x.indexrelid
+         WHERE x.indrelid = c.oid)
+    FROM pg_class c
+    WHERE c.relnamespace = %(schema)s::regnamespace AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+"""
+
+RELKINDS = {"r": "table", "p": "table", "v": "view", "m": "materialized view", "f": "foreign table"}
+
+CONSTRAINT_TYPES = {"p": "primary key", "f": "foreign key", "u": "unique", "c": "check", "x": "exclusion"}
+
+
+class SchemaCatalog:
+    """
+    Tabelas, colunas, constraints e índices de um schema, lidos do pg_catalog.
+
+    Dentro do TTL o cache é usado sem tocar no banco; depois disso, uma
+    consulta leve compara a versão do schema e o catálogo só é recarregado se
+    houve DDL. Se o banco estiver indisponível, um cache antigo é usado.
+    """
+
+    def __init__(self, schema: str = "public", cache_dir: Optional[Path] = None,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, connection_factory: Optional[Callable[[], Any]] = None,
+                 database: Optional[str] = None):
+        self.schema = schema
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(__file__).parent / ".cache"
+        self.ttl_seconds = ttl_seconds
+        self.connection_factory = connection_factory
+        self.database = database
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_key: Optional[str] = None
+
+    @property
+    def cache_key(self) -> str:
+        """Hash do formato do cache, da consulta, do banco e do schema"""
+        if self._cache_key is None:
+            database = self.database
+            if database is None and self.connection_factory is None:
+                import db_session
+                database = db_session.get_database_url()
+            content = "\x1f".join((str(CACHE_FORMAT_VERSION), CATALOG_SQL, str(database), self.schema))
+            self._cache_key = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        return self._cache_key
+
+    @property
+    def cache_path(self) -> Path:
+        return self.cache_dir / f"schema_catalog_{self.cache_key}.pickle"
+
+    def _connection(self):
+        if self.connection_factory is not None:
+            return self.connection_factory()
+        import db_session
+        return db_session.connection()
+
+    def read_cache(self) -> Optional[Dict[str, Any]]:
+        """Lê o cache local (None se ausente, corrompido ou de outra versão)"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("Cache do catálogo ignorado (%s): %s", self.cache_path, e)
+            return None
+        if cache.get("format") != CACHE_FORMAT_VERSION or cache.get("cache_key") != self.cache_key:
+            return None
+        return cache
+
+    def write_cache(self, cache: Dict[str, Any]) -> None:
+        """Grava o cache de forma atômica (arquivo temporário + rename)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def parse_row(row: Sequence[Any]) -> Dict[str, Any]:
+        """Converte uma linha do CATALOG_SQL no formato do cache (colunas e índices por nome)"""
+        name, relkind, reltuples, columns, constraints, indexes = row
+        return {
+            "name": name,
+            "kind": RELKINDS.get(relkind, relkind),
+            # -1: tabela nunca analisada
+            "estimated_rows": reltuples if reltuples is not None and reltuples >= 0 else None,
+            "columns": {column["name"]: column for column in columns or []},
+            "constraints": [dict(constraint, type=CONSTRAINT_TYPES.get(constraint["type"], constraint["type"]),
+                                 columns=constraint["columns"] or [])
+                            for constraint in constraints or []],
+            "indexes": {index["name"]: index for index in indexes or []}
+        }
+
+    def fetch(self, known_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Consulta a versão do schema e, se mudou (ou não há cache), o catálogo
+        completo. Retorna {"version", "tables"}; tables é None se a versão não mudou.
+        """
+        params = {"schema": self.schema}
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(VERSION_SQL, params)
+                version = cursor.fetchone()[0]
+                if version == known_version:
+                    return {"version": version, "tables": None}
+                cursor.execute(CATALOG_SQL, params)
+                tables = {}
+                for row in cursor.fetchall():
+                    parsed = self.parse_row(row)
+                    tables[parsed["name"]] = parsed
+        logging.info("Catálogo do schema %s carregado: %d tabelas (versão %s)", self.schema, len(tables), version[:12])
+        return {"version": version, "tables": tables}
+
+    def new_cache(self, version: str, tables: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Monta o conteúdo do arquivo de cache"""
+        return {
+            "format": CACHE_FORMAT_VERSION,
+            "cache_key": self.cache_key,
+            "version": version,
+            "checked_at": time.time(),
+            "tables": tables
+        }
+
+    def load(self, refresh: bool = False, offline: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Tabelas do schema por nome.
+
+        offline=True usa somente o cache; refresh=True confere a versão no banco
+        mesmo dentro do TTL (por exemplo, logo depois de aplicar migrações).
+        """
+        cache = self._cache or self.read_cache()
+        if offline:
+            if cache is None:
+                raise FileNotFoundError(f"Cache do catálogo não encontrado: {self.cache_path}")
+            self._cache = cache
+            return cache["tables"]
+
+        if cache is not None and not refresh and time.time() - cache["checked_at"] < self.ttl_seconds:
+            self._cache = cache
+            return cache["tables"]
+
+        try:
+            result = self.fetch(cache["version"] if cache is not None else None)
+        except Exception as e:
+            if cache is None:
+                raise
+            logging.warning("Banco indisponível, usando catálogo em cache de %s: %s",
+                            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cache["checked_at"])), e)
+            self._cache = cache
+            return cache["tables"]
+
+        cache = self.new_cache(result["version"], result["tables"] if result["tables"] is not None else cache["tables"])
+        self.write_cache(cache)
+        self._cache = cache
+        return cache["tables"]
+
+    @property
+    def tables(self) -> Dict[str, Dict[str, Any]]:
+        if self._cache is None:
+            self.load()
+        return self._cache["tables"]
+
+    @property
+    def version(self) -> str:
+        if self._cache is None:
+            self.load()
+        return self._cache["version"]
+
+    def table(self, table: str) -> Optional[Dict[str, Any]]:
+        return self.tables.get(table)
+
+    def table_exists(self, table: str) -> bool:
+        return table in self.tables
+
+    def missing_tables(self, tables: Iterable[str]) -> List[str]:
+        """Tabelas da lista que não existem no schema"""
+        return [table for table in tables if table not in self.tables]
+
+    def columns(self, table: str) -> Dict[str, Dict[str, Any]]:
+        """Colunas da tabela por nome, na ordem da tabela ({} se a tabela não existe)"""
+        return self.tables.get(table, {}).get("columns", {})
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self.columns(table)
+
+    def missing_columns(self, table: str, columns: Iterable[str]) -> List[str]:
+        """Colunas da lista que a tabela não tem"""
+        existing = self.columns(table)
+        return [column for column in columns if column not in existing]
+
+    def constraints(self, table: str, constraint_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Constraints da tabela, opcionalmente de um tipo ('primary key', 'foreign key', 'unique', 'check')"""
+        constraints = self.tables.get(table, {}).get("constraints", [])
+        if constraint_type is None:
+            return constraints
+        return [constraint for constraint in constraints if constraint["type"] == constraint_type]
+
+    def indexes(self, table: str) -> Dict[str, Dict[str, Any]]:
+        """Índices da tabela por nome"""
+        return self.tables.get(table, {}).get("indexes", {})
+
+    def has_index(self, table: str, columns: Sequence[str]) -> bool:
+        """Existe índice válido e não parcial cujas primeiras colunas são `columns`, nessa ordem"""
+        columns = list(columns)
+        return any(index["valid"] and not index["predicate"] and index["columns"][:len(columns)] == columns
+                   for index in self.indexes(table).values())
+
+
+def main():
+    """Atualiza o cache local do catálogo e mostra as tabelas pedidas"""
+    parser = argparse.ArgumentParser(description="Catálogo do schema (tabelas, colunas, constraints e índices)")
+    parser.add_argument('tables', nargs='*', help="Tabelas a verificar (padrão: todas)")
+    parser.add_argument('--schema', default="public", help="Schema do Postgres")
+    parser.add_argument('--cache-dir', type=Path, default=None, help="Diretório do cache local")
+    parser.add_argument('--offline', action='store_true', help="Usa somente o cache local")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    catalog = SchemaCatalog(schema=args.schema, cache_dir=args.cache_dir)
+    try:
+        tables = catalog.load(refresh=not args.offline, offline=args.offline)
+    finally:
+        import db_session
+        db_session.close_all()
+
+    print(f"✅ {len(tables)} tabelas no schema {args.schema} (versão {catalog.version[:12]})")
+    missing = 0
+    for name in args.tables or sorted(tables):
+        table = catalog.table(name)
+        if table is None:
+            missing += 1
+            print(f"   ❌ {name}: NÃO EXISTE")
+            continue
+        rows = table['estimated_rows']
+        print(f"   📋 {name} ({table['kind']}): {len(table['columns'])} colunas, {len(table['indexes'])} índices, "
+              f"{len(table['constraints'])} constraints, ~{rows if rows is not None else '?'} linhas")
+    print(f"💾 Cache: {catalog.cache_path}")
+    if missing:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Exportação Colunar da Arbitragem VCM
+Grava as tarefas arbitradas em Parquet (ou Arrow IPC) particionado por
+empresa_id e frequência, com priority, position e required_subsystems
+codificados em dicionário, para consultas analíticas por coluna.
+"""
+
+import argparse
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from task_timestamps import utc_iso
+
+FREQUENCY_KEYS = {"daily_tasks": "daily", "weekly_tasks": "weekly", "monthly_tasks": "monthly"}
+
+# Linhas por RecordBatch (a memória da exportação é limitada a um lote)
+DEFAULT_BATCH_ROWS = 65536
+
+PARTITION_COLUMNS = ["empresa_id", "frequency"]
+
+FORMATS = ("parquet", "arrow")
+
+# Datas gravadas como instantes UTC (regra de task_timestamps.utc_iso)
+TIMESTAMP_TIMEZONE = "UTC"
+
+
+def _pyarrow():
+    """Importa o pyarrow sob demanda (dependência opcional, só para esta exportação)"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Exportação colunar requer o pacote pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def task_schema():
+    """Schema Arrow das tarefas exportadas"""
+    pa = _pyarrow()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("empresa_id", dictionary),
+        ("frequency", dictionary),
+        ("persona_id", pa.string()),
+        ("position", dictionary),
+        ("assigned_to", pa.string()),
+        ("task_id", pa.string()),
+        ("title", dictionary),
+        ("task_type", dictionary),
+        ("priority", dictionary),
+        ("status", dictionary),
+        ("estimated_duration", pa.int32()),
+        ("due_date", pa.timestamp('us', tz=TIMESTAMP_TIMEZONE)),
+        ("created_at", pa.timestamp('us', tz=TIMESTAMP_TIMEZONE)),
+        ("arbitration_timestamp", pa.timestamp('us', tz=TIMESTAMP_TIMEZONE)),
+        ("required_subsystems", pa.list_(dictionary)),
+        ("inputs_from", pa.list_(pa.string())),
+        ("outputs_to", pa.list_(pa.string())),
+        ("dependencies", pa.list_(pa.string())),
+        ("day_of_week", dictionary),
+        ("week_of_month", pa.int8()),
+        ("metadata", pa.string()),
+    ])
+
+
+def iso_to_timestamps(values: List[Optional[str]], timestamp_type: Any) -> Any:
+    """
+    Converte datas ISO 8601 em timestamps UTC.
+
+    Todas as colunas de horário seguem task_timestamps.utc_iso: com offset
+    (calendários com fuso) é o próprio instante; sem offset (calendário
+    padrão, datetime.now()) é a hora local do servidor. Só os valores
+    distintos do lote são convertidos.
+    """
+    pa = _pyarrow()
+
+    encoded = pa.array(values, type=pa.string()).dictionary_encode()
+    instants = pa.array([utc_iso(value) for value in encoded.dictionary.to_pylist()], type=pa.string())
+    return instants.cast(timestamp_type).take(encoded.indices)
+
+
+def iter_record_batches(persona_results: Iterable[Dict[str, Any]], empresa_id: Optional[str] = None,
+                        batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[Any]:
+    """Converte resultados por persona em RecordBatches de até batch_rows tarefas"""
+    pa = _pyarrow()
+    schema = task_schema()
+    names = schema.names
+    columns: Dict[str, List[Any]] = {name: [] for name in names}
+
+    def flush():
+        arrays = []
+        for field in schema:
+            values = columns[field.name]
+            if pa.types.is_timestamp(field.type):
+                arrays.append(iso_to_timestamps(values, field.type))
+            elif pa.types.is_list(field.type) and pa.types.is_dictionary(field.type.value_type):
+                flat = pa.array(values, type=pa.list_(pa.string()))
+                arrays.append(pa.ListArray.from_arrays(flat.offsets, flat.values.dictionary_encode(), mask=flat.is_null()))
+            elif pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        for values in columns.values():
+            values.clear()
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    for persona_tasks in persona_results:
+        if 'error' in persona_tasks:
+            continue
+        persona_id = persona_tasks.get('persona_id')
+        position = persona_tasks.get('position')
+        arbitration_timestamp = persona_tasks.get('arbitration_timestamp')
+        for key, frequency in FREQUENCY_KEYS.items():
+            for task in persona_tasks.get(key, ()):
+                columns["empresa_id"].append(empresa_id)
+                columns["frequency"].append(frequency)
+                columns["persona_id"].append(persona_id)
+                columns["position"].append(position)
+                columns["assigned_to"].append(task.get('assigned_to'))
+                columns["task_id"].append(task['id'])
+                columns["title"].append(task.get('title'))
+                columns["task_type"].append(task.get('task_type'))
+                columns["priority"].append(task.get('priority', 'MEDIUM'))
+                columns["status"].append(task.get('status', 'pending'))
+                columns["estimated_duration"].append(task.get('estimated_duration'))
+                columns["due_date"].append(task.get('due_date'))
+                columns["created_at"].append(task.get('created_at'))
+                columns["arbitration_timestamp"].append(arbitration_timestamp)
+                columns["required_subsystems"].append(task.get('required_subsystems') or [])
+                columns["inputs_from"].append(task.get('inputs_from') or [])
+                columns["outputs_to"].append(task.get('outputs_to') or [])
+                columns["dependencies"].append(task.get('dependencies') or [])
+                columns["day_of_week"].append(task.get('day_of_week'))
+                columns["week_of_month"].append(task.get('week_of_month'))
+                columns["metadata"].append(json.dumps(task.get('metadata') or {}, ensure_ascii=False))
+                if len(columns["task_id"]) >= batch_rows:
+                    yield flush()
+
+    if columns["task_id"]:
+        yield flush()
+
+
+def write_columnar_export(persona_results: Iterable[Dict[str, Any]], output_dir: Path,
+                          empresa_id: Optional[str] = None, file_format: str = "parquet",
+                          batch_rows: int = DEFAULT_BATCH_ROWS) -> Dict[str, Any]:
+    """
+    Grava as tarefas em um dataset particionado (empresa_id=.../frequency=...).
+
+    Cada execução grava arquivos com nome próprio, então várias execuções
+    podem conviver no mesmo diretório. Retorna o número de tarefas e os
+    arquivos gravados.
+    """
+    pa = _pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"Formato colunar desconhecido: {file_format}")
+    output_dir = Path(output_dir)
+    schema = task_schema()
+    rows = 0
+    written: List[str] = []
+
+    def counted(batches: Iterator[Any]) -> Iterator[Any]:
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    if file_format == "parquet":
+        file_options = pa.dataset.ParquetFileFormat().make_write_options(
+            compression='zstd', use_dictionary=True, write_statistics=True)
+    else:
+        file_options = pa.dataset.IpcFileFormat().make_write_options(compression='zstd')
+
+    pa.dataset.write_dataset(
+        counted(iter_record_batches(persona_results, empresa_id, batch_rows)),
+        output_dir,
+        schema=schema,
+        format="ipc" if file_format == "arrow" else "parquet",
+        file_options=file_options,
+        partitioning=pa.dataset.partitioning(
+            pa.schema([schema.field(name) for name in PARTITION_COLUMNS]), flavor="hive"),
+        basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.{file_format}",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda written_file: written.append(written_file.path),
+        max_rows_per_group=batch_rows
+    )
+    logging.info("Exportação colunar: %d tarefas em %d arquivos (%s)", rows, len(written), output_dir)
+    return {"rows": rows, "files": written}
+
+
+def read_columns(dataset_dir: Path, columns: List[str], empresa_id: Optional[str] = None,
+                 frequency: Optional[str] = None, file_format: str = "parquet") -> Any:
+    """Lê apenas as colunas pedidas, podando as partições de empresa e frequência"""
+    pa = _pyarrow()
+    dataset = pa.dataset.dataset(
+        Path(dataset_dir), format="ipc" if file_format == "arrow" else "parquet",
+        partitioning=pa.dataset.HivePartitioning.discover(infer_dictionary=True))
+    expression = None
+    for name, value in (("empresa_id", empresa_id), ("frequency", frequency)):
+        if value is not None:
+            condition = pa.dataset.field(name) == value
+            expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def main():
+    """Converte uma exportação do arbitrador (JSON/NDJSON) em dataset colunar"""
+    from task_loader import read_arbitration_export
+
+    parser = argparse.ArgumentParser(description="Exportação colunar (Parquet/Arrow) das tarefas arbitradas")
+    parser.add_argument('export_file', type=Path, help="Exportação do arbitrador (.json, .ndjson ou .ndjson.gz)")
+    parser.add_argument('output_dir', type=Path, help="Diretório do dataset particionado")
+    parser.add_argument('--empresa-id', default=None, help="empresa_id (obrigatório para NDJSON sem sumário)")
+    parser.add_argument('--format', choices=FORMATS, default="parquet", help="Formato dos arquivos")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help="Tarefas por lote/row group")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    empresa_id, persona_results = read_arbitration_export(args.export_file)
+    result = write_columnar_export(persona_results, args.output_dir, empresa_id=args.empresa_id or empresa_id,
+                                   file_format=args.format, batch_rows=args.batch_rows)
+
+    print(f"✅ Exportação colunar concluída")
+    print(f"📋 Tarefas: {result['rows']}")
+    print(f"📁 Arquivos: {len(result['files'])}")
+    print(f"📄 Dataset: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Modelo Compacto de Resultados da Arbitragem VCM
+Representação opcional e econômica em memória das tarefas arbitradas:
+registros com __slots__, strings internadas, campos de template
+compartilhados em tuplas imutáveis e um lote colunar que ainda produz o
+mesmo JSON da arbitragem tradicional.
+"""
+
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+# Campos da tarefa na ordem em que o arbitrador os produz
+TASK_FIELDS = (
+    "id", "title", "description", "task_type", "priority", "status", "estimated_duration",
+    "required_subsystems", "inputs_from", "outputs_to", "dependencies", "due_date", "created_at", "metadata"
+)
+
+
+def _freeze(value: Any) -> Any:
+    """Converte listas em tuplas (recursivamente) e interna strings"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class TaskPrototype:
+    """Campos de template de uma tarefa, imutáveis e compartilhados por todas as suas ocorrências"""
+
+    __slots__ = ("title", "description", "task_type", "priority", "status", "estimated_duration",
+                 "required_subsystems", "inputs_from", "outputs_to", "dependencies", "metadata", "extra")
+
+    def __init__(self, task: Dict[str, Any]):
+        for field in self.__slots__[:-2]:
+            setattr(self, field, _freeze(task.get(field)))
+        self.metadata = tuple((sys.intern(key), _freeze(value)) for key, value in (task.get('metadata') or {}).items())
+        # Campos específicos da frequência (day_of_week / week_of_month), na ordem original
+        self.extra = tuple((sys.intern(key), _freeze(value)) for key, value in task.items() if key not in TASK_FIELDS)
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        """Identidade do protótipo (para deduplicação)"""
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def to_dict(self, task_id: str, due_date: str, created_at: str) -> Dict[str, Any]:
+        """Tarefa no formato do arbitrador (listas e metadados novos a cada chamada)"""
+        task = {
+            "id": task_id,
+            "title": self.title,
+            "description": self.description,
+            "task_type": self.task_type,
+            "priority": self.priority,
+            "status": self.status,
+            "estimated_duration": self.estimated_duration,
+            "required_subsystems": list(self.required_subsystems or ()),
+            "inputs_from": list(self.inputs_from or ()),
+            "outputs_to": list(self.outputs_to or ()),
+            "dependencies": list(self.dependencies or ()),
+            "due_date": due_date,
+            "created_at": created_at,
+            "metadata": dict(self.metadata)
+        }
+        task.update(self.extra)
+        return task
+
+
+class TaskRecord:
+    """Uma tarefa do lote: três strings internadas e a referência ao protótipo"""
+
+    __slots__ = ("id", "due_date", "created_at", "prototype")
+
+    def __init__(self, task_id: str, due_date: str, created_at: str, prototype: TaskPrototype):
+        self.id = task_id
+        self.due_date = due_date
+        self.created_at = created_at
+        self.prototype = prototype
+
+    def __getattr__(self, name: str) -> Any:
+        # Campos de template são lidos do protótipo compartilhado
+        if name == "prototype":
+            raise AttributeError(name)
+        return getattr(self.prototype, name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.prototype.to_dict(self.id, self.due_date, self.created_at)
+
+
+class PersonaHeader:
+    """Dados de uma persona no lote e o intervalo das suas tarefas nas colunas"""
+
+    __slots__ = ("persona_id", "persona_name", "position", "arbitration_timestamp", "horizon",
+                 "subsystem_integrations", "total_estimated_time", "template_match", "bounds", "error")
+
+    def __init__(self, persona_id: Any = None, persona_name: Optional[str] = None, position: Optional[str] = None,
+                 arbitration_timestamp: Optional[str] = None, horizon: Optional[Tuple[str, str]] = None,
+                 subsystem_integrations: Optional[Dict[str, Any]] = None,
+                 total_estimated_time: Optional[Dict[str, int]] = None,
+                 template_match: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.persona_id = persona_id
+        self.persona_name = persona_name
+        self.position = position
+        self.arbitration_timestamp = arbitration_timestamp
+        self.horizon = horizon
+        self.subsystem_integrations = subsystem_integrations
+        self.total_estimated_time = total_estimated_time
+        self.template_match = template_match
+        self.bounds = (0, 0, 0, 0)
+        self.error = error
+
+
+class TaskBatch:
+    """
+    Lote colunar de tarefas arbitradas.
+
+    Cada tarefa ocupa quatro inteiros: índice do protótipo e índices do id,
+    do vencimento e da criação na tabela de strings. As tarefas de uma
+    persona são contíguas; o cabeçalho guarda os limites de cada frequência.
+
+    Com id_factory(persona_id) -> (id carimbado -> ID), o id guardado é o
+    carimbo da ocorrência, compartilhado entre as personas, e o ID final da
+    tarefa é derivado na leitura.
+
+    persona_starts guarda o início de cada persona (crescente), para que
+    record(index) ache a persona por busca binária sem percorrer o cabeçalho.
+    """
+
+    __slots__ = ("strings", "_string_index", "prototypes", "_prototype_index", "_stamp_memo", "id_factory",
+                 "personas", "persona_starts", "task_prototype", "task_id", "task_due_date", "task_created_at")
+
+    def __init__(self, id_factory: Optional[Callable[[Any], Callable[[str], str]]] = None):
+        self.id_factory = id_factory
+        self.strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+        self.prototypes: List[TaskPrototype] = []
+        self._prototype_index: Dict[Tuple[Any, ...], int] = {}
+        self._stamp_memo: Dict[int, Tuple[Dict[str, Any], Tuple[int, int, int, int]]] = {}
+        self.personas: List[PersonaHeader] = []
+        self.persona_starts = array('I')
+        self.task_prototype = array('I')
+        self.task_id = array('I')
+        self.task_due_date = array('I')
+        self.task_created_at = array('I')
+
+    def __len__(self) -> int:
+        return len(self.task_id)
+
+    def _string(self, value: str) -> int:
+        index = self._string_index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(sys.intern(value))
+            self._string_index[value] = index
+        return index
+
+    def _encode(self, task: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        """Índices de uma tarefa; tarefas carimbadas reaproveitadas são codificadas uma única vez"""
+        memo = self._stamp_memo.get(id(task))
+        if memo is not None and memo[0] is task:
+            return memo[1]
+        prototype = TaskPrototype(task)
+        prototype_index = self._prototype_index.get(prototype.key)
+        if prototype_index is None:
+            prototype_index = len(self.prototypes)
+            self.prototypes.append(prototype)
+            self._prototype_index[prototype.key] = prototype_index
+        encoded = (prototype_index, self._string(task['id']), self._string(task['due_date']),
+                   self._string(task['created_at']))
+        # Guarda a própria tarefa para que o id() não seja reutilizado por outro objeto
+        self._stamp_memo[id(task)] = (task, encoded)
+        return encoded
+
+    def add_persona(self, header: PersonaHeader, tasks_by_frequency: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Acrescenta uma persona; as tarefas podem ser os protótipos carimbados compartilhados"""
+        bounds = [len(self.task_id)]
+        for frequency in FREQUENCIES:
+            for task in tasks_by_frequency.get(frequency, ()):
+                prototype_index, id_index, due_index, created_index = self._encode(task)
+                self.task_prototype.append(prototype_index)
+                self.task_id.append(id_index)
+                self.task_due_date.append(due_index)
+                self.task_created_at.append(created_index)
+            bounds.append(len(self.task_id))
+        header.bounds = tuple(bounds)
+        self.personas.append(header)
+        self.persona_starts.append(bounds[0])
+
+    def add_error(self, header: PersonaHeader) -> None:
+        """Acrescenta uma persona cuja arbitragem falhou"""
+        header.bounds = (len(self.task_id),) * 4
+        self.personas.append(header)
+        self.persona_starts.append(header.bounds[0])
+
+    def seal(self) -> None:
+        """Libera as estruturas usadas só durante a montagem"""
+        self._stamp_memo.clear()
+        self._string_index.clear()
+        self._prototype_index.clear()
+
+    def _task_ids(self, persona_id: Any) -> Callable[[str], str]:
+        """Conversão de id carimbado em ID final para uma persona"""
+        if self.id_factory is None:
+            return str
+        return self.id_factory(persona_id)
+
+    def _record(self, index: int, task_id: Callable[[str], str]) -> TaskRecord:
+        return TaskRecord(task_id(self.strings[self.task_id[index]]), self.strings[self.task_due_date[index]],
+                          self.strings[self.task_created_at[index]], self.prototypes[self.task_prototype[index]])
+
+    def record(self, index: int) -> TaskRecord:
+        """Tarefa `index` como TaskRecord"""
+        header = self.personas[bisect_right(self.persona_starts, index) - 1]
+        return self._record(index, self._task_ids(header.persona_id))
+
+    def __iter__(self) -> Iterator[TaskRecord]:
+        for header in self.personas:
+            task_id = self._task_ids(header.persona_id)
+            for index in range(header.bounds[0], header.bounds[3]):
+                yield self._record(index, task_id)
+
+    def task_dicts(self, start: int, end: int, persona_id: Any = None) -> List[Dict[str, Any]]:
+        """Tarefas [start, end) de uma persona no formato do arbitrador"""
+        strings, prototypes = self.strings, self.prototypes
+        task_id = self._task_ids(persona_id)
+        return [
+            prototypes[self.task_prototype[i]].to_dict(
+                task_id(strings[self.task_id[i]]), strings[self.task_due_date[i]], strings[self.task_created_at[i]])
+            for i in range(start, end)
+        ]
+
+    def persona_dict(self, header: PersonaHeader) -> Dict[str, Any]:
+        """Resultado de uma persona no mesmo formato de arbitrate_tasks_for_persona"""
+        if header.error is not None:
+            return {"error": header.error}
+        start, daily_end, weekly_end, monthly_end = header.bounds
+        result = {
+            "persona_id": header.persona_id,
+            "persona_name": header.persona_name,
+            "position": header.position,
+            "arbitration_timestamp": header.arbitration_timestamp
+        }
+        if header.horizon is not None:
+            result["horizon_start"], result["horizon_end"] = header.horizon
+        result["daily_tasks"] = self.task_dicts(start, daily_end, header.persona_id)
+        result["weekly_tasks"] = self.task_dicts(daily_end, weekly_end, header.persona_id)
+        result["monthly_tasks"] = self.task_dicts(weekly_end, monthly_end, header.persona_id)
+        result["subsystem_integrations"] = dict(header.subsystem_integrations or {})
+        result["total_estimated_time"] = dict(header.total_estimated_time or {})
+        if header.template_match is not None:
+            result["template_match"] = dict(header.template_match)
+        return result
+
+    def iter_persona_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Resultados por persona, um de cada vez (para exportação em streaming)"""
+        for header in self.personas:
+            yield self.persona_dict(header)
+
+    def to_persona_results(self) -> List[Dict[str, Any]]:
+        """Todos os resultados por persona no formato tradicional"""
+        return list(self.iter_persona_dicts())
@@ -0,0 +1,261 @@
+-- =====================================================
+-- ARBITRAGEM DE TAREFAS POR EMPRESA (SET-BASED)
+-- =====================================================
+-- Gera as tarefas de todas as personas de uma ou mais empresas com um único
+-- INSERT ... SELECT sobre task_templates, em vez de uma chamada de
+-- arbitrate_daily_tasks por persona. Segue as regras do TaskArbitrator:
+--   - vencimentos em dias úteis (due_date_engine.py): daily no próprio dia ou
+--     no próximo dia útil, weekly no day_of_week (padrão sexta), monthly no fim
+--     da semana week_of_month (padrão fim do mês), às 18h (daily) / 17h
+--   - task_id derivado do conteúdo (task_identity.py), idêntico ao do Python
+--   - upsert por task_id preservando status e created_at (como task_loader.py)
+-- Somente cargos com template exato (personas.cargo = task_templates.position_type)
+-- são arbitrados; o resultado informa quantas personas ficaram sem template.
+-- Requer database-schema-tarefas.sql.
+
+-- Dia da semana de um template (segunda = 0); -1 se ausente ou desconhecido
+CREATE OR REPLACE FUNCTION vcm_parse_weekday(p_value JSONB)
+RETURNS INTEGER AS $$
+    SELECT CASE jsonb_typeof(p_value)
+        WHEN 'number' THEN (((p_value #>> '{}')::NUMERIC::INTEGER % 7) + 7) % 7
+        WHEN 'string' THEN CASE lower(trim(p_value #>> '{}'))
+            WHEN 'monday' THEN 0 WHEN 'segunda' THEN 0 WHEN 'segunda-feira' THEN 0
+            WHEN 'tuesday' THEN 1 WHEN 'terca' THEN 1 WHEN 'terça' THEN 1 WHEN 'terça-feira' THEN 1
+            WHEN 'wednesday' THEN 2 WHEN 'quarta' THEN 2 WHEN 'quarta-feira' THEN 2
+            WHEN 'thursday' THEN 3 WHEN 'quinta' THEN 3 WHEN 'quinta-feira' THEN 3
+            WHEN 'friday' THEN 4 WHEN 'sexta' THEN 4 WHEN 'sexta-feira' THEN 4
+            WHEN 'saturday' THEN 5 WHEN 'sabado' THEN 5 WHEN 'sábado' THEN 5
+            WHEN 'sunday' THEN 6 WHEN 'domingo' THEN 6
+            ELSE -1 END
+        ELSE -1
+    END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Texto de um campo na identidade do template: str(valor or '') do Python
+CREATE OR REPLACE FUNCTION vcm_identity_text(p_value JSONB)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN p_value IS NULL OR p_value IN ('null', 'false', '0', '""', '[]', '{}') THEN ''
+        WHEN jsonb_typeof(p_value) = 'string' THEN p_value #>> '{}'
+        ELSE p_value::TEXT
+    END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Dia útil mais próximo (para frente ou para trás) pela weekmask (segunda primeiro) e feriados
+CREATE OR REPLACE FUNCTION vcm_roll_business_day(p_day DATE, p_forward BOOLEAN,
+                                                 p_weekmask TEXT DEFAULT '1111100',
+                                                 p_holidays DATE[] DEFAULT '{}')
+RETURNS DATE AS $$
+DECLARE
+    candidate DATE := p_day;
+BEGIN
+    FOR step IN 0..366 LOOP
+        IF substr(p_weekmask, extract(isodow FROM candidate)::INTEGER, 1) = '1'
+           AND candidate <> ALL (p_holidays) THEN
+            RETURN candidate;
+        END IF;
+        candidate := CASE WHEN p_forward THEN candidate + 1 ELSE candidate - 1 END;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Vencimento mensal de um mês: fim da semana week_of_month (ou do mês), recuado para dia útil
+CREATE OR REPLACE FUNCTION vcm_monthly_due_day(p_month_start DATE, p_weeks INTEGER,
+                                               p_weekmask TEXT DEFAULT '1111100',
+                                               p_holidays DATE[] DEFAULT '{}')
+RETURNS DATE AS $$
+    SELECT CASE WHEN rolled < p_month_start
+                THEN vcm_roll_business_day(p_month_start, true, p_weekmask, p_holidays)
+                ELSE rolled END
+    FROM (
+        SELECT vcm_roll_business_day(
+            CASE WHEN p_weeks > 0 THEN least(p_month_start + p_weeks * 7 - 1, month_end) ELSE month_end END,
+            false, p_weekmask, p_holidays) AS rolled
+        FROM (SELECT (p_month_start + interval '1 month')::DATE - 1 AS month_end) e
+    ) r
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Dia de vencimento de uma tarefa para o dia base (mesmas regras de DueDateEngine.due_days)
+CREATE OR REPLACE FUNCTION vcm_due_day(p_frequency TEXT, p_base DATE, p_day_of_week JSONB, p_week_of_month JSONB,
+                                       p_weekmask TEXT DEFAULT '1111100', p_holidays DATE[] DEFAULT '{}')
+RETURNS DATE AS $$
+DECLARE
+    target INTEGER;
+    weeks INTEGER;
+    month_start DATE;
+    current_due DATE;
+BEGIN
+    IF p_frequency = 'daily' THEN
+        RETURN vcm_roll_business_day(p_base, true, p_weekmask, p_holidays);
+    ELSIF p_frequency = 'weekly' THEN
+        target := vcm_parse_weekday(p_day_of_week);
+        IF target < 0 THEN
+            target := 4;
+        END IF;
+        RETURN vcm_roll_business_day(
+            p_base + (((target - (extract(isodow FROM p_base)::INTEGER - 1)) % 7) + 7) % 7,
+            true, p_weekmask, p_holidays);
+    ELSIF p_frequency = 'monthly' THEN
+        weeks := CASE WHEN vcm_identity_text(p_week_of_month) = '' THEN 0
+                      ELSE (p_week_of_month #>> '{}')::NUMERIC::INTEGER END;
+        month_start := date_trunc('month', p_base)::DATE;
+        current_due := vcm_monthly_due_day(month_start, weeks, p_weekmask, p_holidays);
+        IF current_due < p_base THEN
+            RETURN vcm_monthly_due_day((month_start + interval '1 month')::DATE, weeks, p_weekmask, p_holidays);
+        END IF;
+        RETURN current_due;
+    END IF;
+    RETURN p_base + 1;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Arbitra todas as personas das empresas informadas em um único INSERT ... SELECT.
+-- Os vencimentos são calculados uma vez por regra de recorrência (não por persona); o
+-- calendário (fuso, weekmask, feriados) vale para todas as empresas da chamada.
+CREATE OR REPLACE FUNCTION arbitrate_empresa_tasks(
+    p_empresa_ids UUID[],
+    p_reference TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    p_timezone TEXT DEFAULT NULL,
+    p_weekmask TEXT DEFAULT '1111100',
+    p_holidays DATE[] DEFAULT '{}'
+)
+RETURNS TABLE (
+    empresa_id UUID,
+    personas BIGINT,
+    personas_without_template BIGINT,
+    tasks_inserted BIGINT,
+    tasks_updated BIGINT
+) AS $$
+    WITH base AS (
+        SELECT (p_reference AT TIME ZONE coalesce(p_timezone, current_setting('TimeZone')))::DATE AS base_day
+    ),
+    targets AS (
+        SELECT p.id AS persona_id, p.empresa_id, p.cargo
+        FROM personas p
+        WHERE p.empresa_id = ANY (p_empresa_ids)
+    ),
+    -- Templates visíveis para cada empresa (globais e próprios), um por tarefa do template_data
+    visible AS (
+        SELECT e.empresa_id, t.id AS template_id, t.position_type, t.task_type, task.value AS task,
+               t.name, task.ordinality
+        FROM (SELECT DISTINCT targets.empresa_id FROM targets) e
+        JOIN task_templates t
+          ON t.is_active
+         AND t.task_type IN ('daily', 'weekly', 'monthly')
+         AND (t.empresa_id IS NULL OR t.empresa_id = e.empresa_id)
+        CROSS JOIN LATERAL jsonb_array_elements(t.template_data -> 'tasks') WITH ORDINALITY AS task(value, ordinality)
+    ),
+    -- Vencimento calculado uma vez por regra de recorrência distinta
+    schedules AS (
+        SELECT s.task_type, s.day_of_week, s.week_of_month,
+               vcm_due_day(s.task_type, base.base_day,
+                           CASE WHEN s.task_type = 'weekly' THEN s.day_of_week END,
+                           CASE WHEN s.task_type = 'monthly' THEN s.week_of_month END,
+                           p_weekmask, p_holidays) AS due_day
+        FROM (SELECT DISTINCT task_type, task -> 'day_of_week' AS day_of_week, task -> 'week_of_month' AS week_of_month
+              FROM visible) s
+        CROSS JOIN base
+    ),
+    identified AS (
+        SELECT v.*,
+               concat_ws(chr(31), v.position_type, v.task_type,
+                         vcm_identity_text(v.task -> 'title'), vcm_identity_text(v.task -> 'description'),
+                         vcm_identity_text(v.task -> 'day_of_week'), vcm_identity_text(v.task -> 'week_of_month')
+               ) AS identity
+        FROM visible v
+    ),
+    -- Um protótipo por (empresa, template): prefixo e identidade do id prontos antes do cruzamento com as personas
+    prototypes AS (
+        SELECT i.empresa_id, i.template_id, i.position_type, i.task_type, i.task, due.due_day,
+               i.task_type || '_' || replace(lower(i.position_type), ' ', '_') || '_'
+                   || to_char(due.due_day, 'YYYYMMDD') || '_' AS id_prefix,
+               left(encode(sha256(convert_to(
+                   i.identity || CASE WHEN i.duplicate > 0 THEN chr(31) || i.duplicate ELSE '' END,
+                   'UTF8')), 'hex'), 16) AS template_key
+        FROM (
+            SELECT identified.*,
+                   row_number() OVER (PARTITION BY empresa_id, identity
+                                      ORDER BY name COLLATE "C", template_id::TEXT, ordinality) - 1 AS duplicate
+            FROM identified
+        ) i
+        JOIN schedules due
+          ON due.task_type = i.task_type
+         AND due.day_of_week IS NOT DISTINCT FROM i.task -> 'day_of_week'
+         AND due.week_of_month IS NOT DISTINCT FROM i.task -> 'week_of_month'
+    ),
+    upserted AS (
+        INSERT INTO persona_tasks (
+            empresa_id, persona_id, assigned_to, task_id, title, description, task_type, priority, status,
+            estimated_duration, due_date, required_subsystems, inputs_from, outputs_to, dependencies,
+            frequency, recurrence_rule, metadata, created_at
+        )
+        SELECT
+            t.empresa_id,
+            t.persona_id,
+            NULL,
+            pr.id_prefix || left(encode(sha256(convert_to(
+                t.persona_id::TEXT || chr(31) || pr.id_prefix || chr(31) || pr.template_key, 'UTF8')), 'hex'), 16),
+            pr.task ->> 'title',
+            pr.task ->> 'description',
+            pr.task_type,
+            upper(coalesce(pr.task ->> 'priority', 'MEDIUM')),
+            'pending',
+            coalesce((pr.task ->> 'estimated_duration')::NUMERIC::INTEGER, 60),
+            CASE WHEN p_timezone IS NULL
+                 THEN (pr.due_day + make_interval(hours => CASE WHEN pr.task_type = 'daily' THEN 18 ELSE 17 END))::TIMESTAMPTZ
+                 ELSE (pr.due_day + make_interval(hours => CASE WHEN pr.task_type = 'daily' THEN 18 ELSE 17 END))
+                      AT TIME ZONE p_timezone END,
+            coalesce(pr.task -> 'required_subsystems', '[]'::jsonb),
+            coalesce(pr.task -> 'inputs_from', '[]'::jsonb),
+            coalesce(pr.task -> 'outputs_to', '[]'::jsonb),
+            coalesce(pr.task -> 'dependencies', '[]'::jsonb),
+            pr.task_type,
+            jsonb_strip_nulls(jsonb_build_object(
+                'day_of_week', CASE WHEN pr.task_type = 'weekly' THEN pr.task -> 'day_of_week' END,
+                'week_of_month', CASE WHEN pr.task_type = 'monthly' THEN pr.task -> 'week_of_month' END)),
+            jsonb_build_object('arbitrated_by', 'arbitrate_empresa_tasks', 'template_based', true,
+                               'frequency', pr.task_type, 'position', pr.position_type,
+                               'template_id', pr.template_id),
+            p_reference
+        FROM targets t
+        JOIN prototypes pr ON pr.empresa_id = t.empresa_id AND pr.position_type = t.cargo
+        ON CONFLICT (task_id) DO UPDATE SET
+            empresa_id = EXCLUDED.empresa_id,
+            persona_id = EXCLUDED.persona_id,
+            assigned_to = EXCLUDED.assigned_to,
+            title = EXCLUDED.title,
+            description = EXCLUDED.description,
+            task_type = EXCLUDED.task_type,
+            priority = EXCLUDED.priority,
+            estimated_duration = EXCLUDED.estimated_duration,
+            due_date = EXCLUDED.due_date,
+            required_subsystems = EXCLUDED.required_subsystems,
+            inputs_from = EXCLUDED.inputs_from,
+            outputs_to = EXCLUDED.outputs_to,
+            dependencies = EXCLUDED.dependencies,
+            frequency = EXCLUDED.frequency,
+            recurrence_rule = EXCLUDED.recurrence_rule,
+            metadata = EXCLUDED.metadata,
+            updated_at = now()
+        RETURNING persona_tasks.persona_id, (xmax = 0) AS inserted
+    ),
+    per_persona AS (
+        SELECT u.persona_id,
+               count(*) FILTER (WHERE u.inserted) AS inserted,
+               count(*) FILTER (WHERE NOT u.inserted) AS updated
+        FROM upserted u
+        GROUP BY u.persona_id
+    )
+    SELECT t.empresa_id,
+           count(*),
+           count(*) FILTER (WHERE NOT EXISTS (
+               SELECT 1 FROM prototypes pr WHERE pr.empresa_id = t.empresa_id AND pr.position_type = t.cargo)),
+           coalesce(sum(pp.inserted), 0)::BIGINT,
+           coalesce(sum(pp.updated), 0)::BIGINT
+    FROM targets t
+    LEFT JOIN per_persona pp ON pp.persona_id = t.persona_id
+    GROUP BY t.empresa_id
+$$ LANGUAGE sql;
+
+SELECT 'Arbitragem por empresa (set-based) criada com sucesso!' as status;
@@ -0,0 +1,233 @@
+-- =====================================================
+-- DASHBOARD DE TAREFAS MANTIDO INCREMENTALMENTE
+-- =====================================================
+-- A view persona_tasks_dashboard passa a ler a tabela
+-- persona_tasks_dashboard_cache, mantida por triggers de instrução sobre
+-- persona_tasks (tabelas de transição: um ajuste por INSERT/UPDATE/DELETE,
+-- não por linha). A ordenação por prioridade usa a coluna priority_rank
+-- indexada, então "SELECT ... LIMIT n" não ordena a tabela inteira e a
+-- latência de leitura não cresce com persona_tasks. urgency_status depende de
+-- now() e continua calculado na leitura.
+--
+-- Modo adiado: com SET vcm.dashboard_deferred = 'on' na sessão (cargas em
+-- lote), os triggers só enfileiram os ids em persona_tasks_dashboard_delta e
+-- refresh_persona_tasks_dashboard() aplica a fila inteira de uma vez.
+-- Requer database-schema-tarefas.sql.
+
+-- Ordem de prioridade do dashboard (NULL para prioridades desconhecidas, no fim)
+CREATE OR REPLACE FUNCTION vcm_priority_rank(p_priority TEXT)
+RETURNS SMALLINT AS $$
+    SELECT CASE p_priority
+        WHEN 'URGENT' THEN 1
+        WHEN 'HIGH' THEN 2
+        WHEN 'MEDIUM' THEN 3
+        WHEN 'LOW' THEN 4
+    END::SMALLINT
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Linhas do dashboard calculadas a partir de persona_tasks (mesma ordem de colunas do cache)
+CREATE OR REPLACE VIEW persona_tasks_dashboard_source AS
+SELECT
+    pt.id,
+    pt.task_id,
+    pt.title,
+    pt.description,
+    pt.task_type,
+    pt.priority,
+    vcm_priority_rank(pt.priority) AS priority_rank,
+    pt.status,
+    pt.due_date,
+    pt.estimated_duration,
+    pt.actual_duration,
+    pt.completed_at,
+    pt.persona_id,
+    pt.empresa_id,
+    pt.required_subsystems,
+    pt.inputs_from,
+    pt.outputs_to
+FROM persona_tasks pt;
+
+CREATE TABLE IF NOT EXISTS persona_tasks_dashboard_cache (
+    id UUID PRIMARY KEY,
+    task_id VARCHAR(255) NOT NULL,
+    title VARCHAR(500),
+    description TEXT,
+    task_type VARCHAR(50),
+    priority VARCHAR(50),
+    priority_rank SMALLINT,
+    status VARCHAR(50),
+    due_date TIMESTAMP WITH TIME ZONE,
+    estimated_duration INTEGER,
+    actual_duration INTEGER,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    persona_id UUID,
+    empresa_id UUID,
+    required_subsystems JSONB,
+    inputs_from JSONB,
+    outputs_to JSONB
+);
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_cache_order ON persona_tasks_dashboard_cache (priority_rank, due_date);
+CREATE INDEX IF NOT EXISTS idx_dashboard_cache_persona ON persona_tasks_dashboard_cache (persona_id, priority_rank, due_date);
+CREATE INDEX IF NOT EXISTS idx_dashboard_cache_empresa ON persona_tasks_dashboard_cache (empresa_id, priority_rank, due_date);
+
+-- Fila de ids alterados no modo adiado
+CREATE TABLE IF NOT EXISTS persona_tasks_dashboard_delta (
+    id UUID NOT NULL,
+    queued_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Reaplica as linhas do dashboard para os ids informados (removidas se a tarefa não existe mais).
+-- Plano sempre específico: um plano genérico estima unnest(p_ids) em 10 linhas e
+-- pode escolher um nested loop quadrático para lotes grandes.
+CREATE OR REPLACE FUNCTION sync_persona_tasks_dashboard(p_ids UUID[])
+RETURNS VOID
+SET plan_cache_mode = force_custom_plan
+AS $$
+BEGIN
+    DELETE FROM persona_tasks_dashboard_cache c
+    USING unnest(p_ids) AS changed(id)
+    WHERE c.id = changed.id;
+
+    INSERT INTO persona_tasks_dashboard_cache
+    SELECT s.*
+    FROM persona_tasks_dashboard_source s
+    JOIN (SELECT DISTINCT id FROM unnest(p_ids) AS changed(id)) changed ON changed.id = s.id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger de instrução: sincroniza (ou enfileira) os ids tocados pela instrução
+CREATE OR REPLACE FUNCTION persona_tasks_dashboard_trigger()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed UUID[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id) INTO changed FROM old_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(id) INTO changed FROM (SELECT id FROM new_rows UNION SELECT id FROM old_rows) ids;
+    ELSE
+        SELECT array_agg(id) INTO changed FROM new_rows;
+    END IF;
+
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF current_setting('vcm.dashboard_deferred', true) = 'on' THEN
+        INSERT INTO persona_tasks_dashboard_delta (id) SELECT unnest(changed);
+    ELSE
+        PERFORM sync_persona_tasks_dashboard(changed);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION persona_tasks_dashboard_truncate()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE persona_tasks_dashboard_cache, persona_tasks_dashboard_delta;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tabelas de transição só podem ser usadas com um evento por trigger
+DROP TRIGGER IF EXISTS persona_tasks_dashboard_insert ON persona_tasks;
+CREATE TRIGGER persona_tasks_dashboard_insert AFTER INSERT ON persona_tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION persona_tasks_dashboard_trigger();
+
+DROP TRIGGER IF EXISTS persona_tasks_dashboard_update ON persona_tasks;
+CREATE TRIGGER persona_tasks_dashboard_update AFTER UPDATE ON persona_tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION persona_tasks_dashboard_trigger();
+
+DROP TRIGGER IF EXISTS persona_tasks_dashboard_delete ON persona_tasks;
+CREATE TRIGGER persona_tasks_dashboard_delete AFTER DELETE ON persona_tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION persona_tasks_dashboard_trigger();
+
+DROP TRIGGER IF EXISTS persona_tasks_dashboard_truncate ON persona_tasks;
+CREATE TRIGGER persona_tasks_dashboard_truncate AFTER TRUNCATE ON persona_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION persona_tasks_dashboard_truncate();
+
+-- Aplica a fila do modo adiado; retorna quantas tarefas foram reaplicadas
+CREATE OR REPLACE FUNCTION refresh_persona_tasks_dashboard()
+RETURNS BIGINT AS $$
+DECLARE
+    changed UUID[];
+BEGIN
+    WITH pending AS (
+        DELETE FROM persona_tasks_dashboard_delta RETURNING id
+    )
+    SELECT array_agg(DISTINCT id) INTO changed FROM pending;
+
+    IF changed IS NULL THEN
+        RETURN 0;
+    END IF;
+    PERFORM sync_persona_tasks_dashboard(changed);
+    RETURN cardinality(changed);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recria o cache a partir de persona_tasks (bloqueia escritas em persona_tasks durante a carga)
+CREATE OR REPLACE FUNCTION rebuild_persona_tasks_dashboard()
+RETURNS BIGINT AS $$
+DECLARE
+    total BIGINT;
+BEGIN
+    LOCK TABLE persona_tasks IN SHARE MODE;
+    TRUNCATE persona_tasks_dashboard_cache, persona_tasks_dashboard_delta;
+    INSERT INTO persona_tasks_dashboard_cache SELECT * FROM persona_tasks_dashboard_source;
+    GET DIAGNOSTICS total = ROW_COUNT;
+    ANALYZE persona_tasks_dashboard_cache;
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Divergências entre o cache e persona_tasks (pending: ids ainda na fila do modo adiado)
+CREATE OR REPLACE FUNCTION verify_persona_tasks_dashboard()
+RETURNS TABLE (tasks BIGINT, cached BIGINT, missing BIGINT, extra BIGINT, stale BIGINT, pending BIGINT) AS $$
+    SELECT
+        (SELECT count(*) FROM persona_tasks),
+        (SELECT count(*) FROM persona_tasks_dashboard_cache),
+        (SELECT count(*) FROM persona_tasks_dashboard_source s
+         WHERE NOT EXISTS (SELECT 1 FROM persona_tasks_dashboard_cache c WHERE c.id = s.id)),
+        (SELECT count(*) FROM persona_tasks_dashboard_cache c
+         WHERE NOT EXISTS (SELECT 1 FROM persona_tasks pt WHERE pt.id = c.id)),
+        (SELECT count(*) FROM persona_tasks_dashboard_source s
+         JOIN persona_tasks_dashboard_cache c ON c.id = s.id
+         WHERE ROW(s.*) IS DISTINCT FROM ROW(c.*)),
+        (SELECT count(DISTINCT id) FROM persona_tasks_dashboard_delta)
+$$ LANGUAGE sql STABLE;
+
+-- View do dashboard (mesmas colunas e ordem da versão anterior), agora sobre o cache
+CREATE OR REPLACE VIEW persona_tasks_dashboard AS
+SELECT
+    c.id,
+    c.task_id,
+    c.title,
+    c.description,
+    c.task_type,
+    c.priority,
+    c.status,
+    c.due_date,
+    c.estimated_duration,
+    c.actual_duration,
+    c.completed_at,
+    c.persona_id,
+    c.empresa_id,
+    c.required_subsystems,
+    c.inputs_from,
+    c.outputs_to,
+    CASE
+        WHEN c.due_date < now() AND c.status != 'completed' THEN 'overdue'
+        WHEN c.due_date <= now() + interval '2 hours' AND c.status != 'completed' THEN 'due_soon'
+        ELSE 'normal'
+    END as urgency_status
+FROM persona_tasks_dashboard_cache c
+ORDER BY c.priority_rank, c.due_date;
+
+SELECT rebuild_persona_tasks_dashboard() as dashboard_tasks;
+
+SELECT 'Dashboard de tarefas incremental criado com sucesso!' as status;
@@ -174,7 +174,8 @@ RETURNS JSON AS $$
 DECLARE
     persona_exists BOOLEAN;
     template_record RECORD;
-    task_data JSON;
+    task_data JSONB;
+    task_number BIGINT;
     result JSON;
     tasks_created INTEGER := 0;
 BEGIN
@@ -195,7 +196,9 @@ BEGIN
     
     IF FOUND THEN
         -- Gerar tarefas baseadas no template
-        FOR task_data IN SELECT json_array_elements(template_record.template_data->'tasks')
+        -- O ordinal distingue as tarefas do template (task_id é UNIQUE)
+        FOR task_data, task_number IN
+            SELECT value, ordinality FROM jsonb_array_elements(template_record.template_data->'tasks') WITH ORDINALITY
         LOOP
             INSERT INTO persona_tasks (
                 persona_id,
@@ -212,7 +215,7 @@ BEGIN
                 parent_template_id
             ) VALUES (
                 p_persona_id,
-                'daily_' || p_persona_id::text || '_' || to_char(now(), 'YYYYMMDD') || '_' || extract(epoch from now()),
+                'daily_' || p_persona_id::text || '_' || to_char(now(), 'YYYYMMDD') || '_' || extract(epoch from now()) || '_' || task_number,
                 task_data->>'title',
                 task_data->>'description',
                 'daily',
@@ -297,6 +300,7 @@ CREATE TRIGGER update_persona_tasks_updated_at BEFORE UPDATE ON persona_tasks FO
 CREATE TRIGGER update_task_templates_updated_at BEFORE UPDATE ON task_templates FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 -- View para dashboard de tarefas (versão simplificada)
+-- Com muitas tarefas, database-schema-dashboard-tarefas.sql a redefine sobre um cache incremental
 CREATE OR REPLACE VIEW persona_tasks_dashboard AS
 SELECT 
     pt.id,
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Sessões de Banco Compartilhadas VCM
+Pool de conexões psycopg2 e cliente supabase-py compartilhados pelos
+scripts Python legados, com health check e métricas de uso do pool.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+# Limites padrão do pool (sobrescritos por VCM_DB_POOL_MIN / VCM_DB_POOL_MAX)
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 10
+
+# Tempo máximo de espera por uma conexão livre, em segundos
+DEFAULT_ACQUIRE_TIMEOUT = 30.0
+
+_pool = None
+_supabase_clients: Dict[Tuple[str, str], Any] = {}
+_lock = threading.Lock()
+
+
+def get_database_url() -> str:
+    """Monta a URL de conexão direta com o Postgres do VCM"""
+    load_dotenv()
+    dsn = os.getenv('VCM_DATABASE_URL')
+    if dsn:
+        return dsn
+    host = os.getenv('VCM_SUPABASE_URL', '').replace('https://', '').replace('http://', '')
+    return f"postgresql://{os.getenv('VCM_SUPABASE_SERVICE_ROLE_KEY')}@{host}:5432/{os.getenv('VCM_SUPABASE_DB_NAME', 'postgres')}"
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões psycopg2.
+    Quando todas as conexões estão em uso, acquire() aguarda uma devolução
+    (até acquire_timeout) em vez de falhar imediatamente.
+    """
+
+    def __init__(self, dsn: str, minconn: int = DEFAULT_POOL_MIN, maxconn: int = DEFAULT_POOL_MAX,
+                 acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "acquisitions": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "waits": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "discarded": 0,
+            "errors": 0
+        }
+
+    def acquire(self):
+        """Obtém uma conexão do pool (bloqueia se o pool estiver cheio)"""
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self._metrics["waits"] += 1
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise TimeoutError(f"Nenhuma conexão livre no pool após {self.acquire_timeout}s")
+
+        try:
+            connection = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            with self._metrics_lock:
+                self._metrics["errors"] += 1
+            raise
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._metrics_lock:
+            self._metrics["acquisitions"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._metrics["in_use"])
+            self._metrics["total_wait_ms"] += wait_ms
+            self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], wait_ms)
+        return connection
+
+    def release(self, connection, discard: bool = False) -> None:
+        """
+        Devolve a conexão ao pool com o estado de sessão padrão (ver
+        reset_session); conexões quebradas ou que não puderam ser
+        restauradas são descartadas.
+        """
+        discard = discard or connection.closed != 0
+        if not discard:
+            try:
+                self.reset_session(connection)
+            except psycopg2.Error as e:
+                logging.warning("Conexão descartada: falha ao restaurar a sessão (%s)", e)
+                discard = True
+        try:
+            self._pool.putconn(connection, close=discard)
+        finally:
+            self._slots.release()
+            with self._metrics_lock:
+                self._metrics["in_use"] -= 1
+                if discard:
+                    self._metrics["discarded"] += 1
+
+    @staticmethod
+    def reset_session(connection) -> None:
+        """
+        Desfaz o que o usuário anterior mudou na sessão: transação aberta,
+        autocommit, isolamento/somente leitura e parâmetros definidos com SET
+        ou set_config (como vcm.dashboard_deferred). Uma ida ao banco.
+        """
+        if connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("RESET ALL")
+        connection.set_session(isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT', autocommit=False)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Conexão emprestada: commit ao sair, rollback em caso de erro"""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    @contextmanager
+    def cursor(self, dict_rows: bool = False) -> Iterator[Any]:
+        """Cursor em uma conexão emprestada do pool"""
+        with self.connection() as connection:
+            cursor = connection.cursor(cursor_factory=RealDictCursor if dict_rows else None)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def health_check(self) -> Dict[str, Any]:
+        """Executa SELECT 1 e mede a latência"""
+        start = time.perf_counter()
+        try:
+            with self.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Métricas de uso do pool"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["minconn"] = self.minconn
+        metrics["maxconn"] = self.maxconn
+        metrics["avg_wait_ms"] = round(metrics["total_wait_ms"] / metrics["acquisitions"], 3) if metrics["acquisitions"] else 0.0
+        return metrics
+
+    def close(self) -> None:
+        """Fecha todas as conexões do pool"""
+        self._pool.closeall()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool de conexões compartilhado pelo processo (criado no primeiro uso)"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_database_url(),
+                    minconn=int(os.getenv('VCM_DB_POOL_MIN', DEFAULT_POOL_MIN)),
+                    maxconn=int(os.getenv('VCM_DB_POOL_MAX', DEFAULT_POOL_MAX))
+                )
+                logging.info("Pool de conexões criado (%d-%d)", _pool.minconn, _pool.maxconn)
+    return _pool
+
+
+@contextmanager
+def connection() -> Iterator[Any]:
+    """Atalho para get_pool().connection()"""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def cursor(dict_rows: bool = False) -> Iterator[Any]:
+    """Atalho para get_pool().cursor()"""
+    with get_pool().cursor(dict_rows=dict_rows) as cur:
+        yield cur
+
+
+def get_supabase_client(url: Optional[str] = None, key: Optional[str] = None):
+    """Cliente supabase-py compartilhado por (url, chave), criado no primeiro uso"""
+    from supabase import create_client
+
+    load_dotenv()
+    url = url or os.getenv('VCM_SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+    key = key or os.getenv('VCM_SUPABASE_SERVICE_ROLE_KEY')
+    with _lock:
+        client = _supabase_clients.get((url, key))
+        if client is None:
+            client = create_client(url, key)
+            _supabase_clients[(url, key)] = client
+    return client
+
+
+def health_check() -> Dict[str, Any]:
+    """Verifica o Postgres e devolve as métricas do pool"""
+    return {"database": get_pool().health_check(), "database_pool": get_pool().metrics()}
+
+
+def close_all() -> None:
+    """Fecha o pool e descarta os clientes supabase-py compartilhados"""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        _supabase_clients.clear()
+
+
+if __name__ == "__main__":
+    import json
+
+    print("🔍 Verificando conexões...")
+    print(json.dumps(health_check(), indent=2, ensure_ascii=False))
@@ -3,9 +3,11 @@
 Debug - Testar com mesmas credenciais que frontend (ANON KEY)
 """
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from db_session import get_supabase_client
+
 # Carregar variáveis do .env
 load_dotenv()
 
@@ -21,7 +23,7 @@ if not SUPABASE_URL or not SUPABASE_ANON_KEY:
     exit(1)
 
 print("🔍 Conectando ao Supabase com ANON KEY (como frontend)...")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
 def test_with_anon_key():
     """Teste usando ANON KEY exatamente como frontend"""
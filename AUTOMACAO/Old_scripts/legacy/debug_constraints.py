@@ -3,9 +3,11 @@
 Debug - Verificar constraints e limitações no banco
 """
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from db_session import get_supabase_client
+
 # Carregar variáveis do .env
 load_dotenv()
 
@@ -18,7 +20,7 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     exit(1)
 
 print("🔍 Conectando ao Supabase...")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 try:
     # Tentar diretamente pela API
@@ -3,16 +3,18 @@
 Teste para capturar o erro exato do frontend com dados reais
 """
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from db_session import get_supabase_client
+
 load_dotenv()
 
 # Usar mesmas credenciais que frontend (ANON KEY)
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
 def test_realistic_data():
     """Testar com dados realistas que um usuário digitaria"""
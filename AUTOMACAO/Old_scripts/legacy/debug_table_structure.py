@@ -3,15 +3,17 @@
 Verificar a estrutura REAL da tabela empresas no Supabase
 """
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from db_session import get_supabase_client
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("VCM_SUPABASE_SERVICE_ROLE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 def check_real_table_structure():
     """Verificar estrutura real da tabela empresas"""
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Motor de Datas de Vencimento VCM
+Calcula os vencimentos de lotes inteiros de tarefas com numpy.datetime64 e
+calendários de dias úteis, respeitando day_of_week / week_of_month dos
+templates, feriados e fuso horário de cada empresa.
+"""
+
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Dias da semana aceitos nos templates (inglês e português)
+WEEKDAYS = {
+    "monday": 0, "segunda": 0, "segunda-feira": 0,
+    "tuesday": 1, "terca": 1, "terça": 1, "terça-feira": 1,
+    "wednesday": 2, "quarta": 2, "quarta-feira": 2,
+    "thursday": 3, "quinta": 3, "quinta-feira": 3,
+    "friday": 4, "sexta": 4, "sexta-feira": 4,
+    "saturday": 5, "sabado": 5, "sábado": 5,
+    "sunday": 6, "domingo": 6,
+}
+
+# Horário de vencimento por frequência
+DUE_HOURS = {"daily": 18, "weekly": 17, "monthly": 17}
+
+FREQUENCY_CODES = {"daily": 0, "weekly": 1, "monthly": 2}
+
+# Horário por código de frequência (o último vale para frequências desconhecidas, código -1)
+HOURS_BY_CODE = np.array([DUE_HOURS["daily"], DUE_HOURS["weekly"], DUE_HOURS["monthly"], 0], dtype='int64')
+
+# Dia padrão das tarefas semanais sem day_of_week (comportamento anterior: sexta)
+DEFAULT_WEEKDAY = 4
+
+
+def parse_weekday(value: Any) -> int:
+    """Converte day_of_week do template em 0-6 (segunda = 0); -1 se ausente"""
+    if value is None:
+        return -1
+    if isinstance(value, int):
+        return value % 7
+    return WEEKDAYS.get(str(value).strip().lower(), -1)
+
+
+def weekday_of(days: np.ndarray) -> np.ndarray:
+    """Dia da semana (segunda = 0) de um array datetime64[D]"""
+    # 1970-01-01 foi uma quinta-feira
+    return (days.astype('int64') + 3) % 7
+
+
+class BusinessCalendar:
+    """
+    Calendário de dias úteis de uma empresa: fuso horário, dias trabalhados
+    (weekmask começando na segunda) e feriados.
+    """
+
+    def __init__(self, timezone: Optional[str] = None, holidays: Sequence[str] = (), weekmask: str = "1111100"):
+        self.timezone_name = timezone
+        self.timezone = ZoneInfo(timezone) if timezone else None
+        self.holidays = tuple(sorted(str(h) for h in holidays))
+        self.weekmask = weekmask
+        self.busdaycal = np.busdaycalendar(weekmask=weekmask, holidays=list(self.holidays))
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> 'BusinessCalendar':
+        """Cria o calendário a partir de {"timezone", "holidays", "weekmask"}"""
+        config = config or {}
+        return cls(config.get('timezone'), config.get('holidays', ()), config.get('weekmask', "1111100"))
+
+    @property
+    def key(self) -> Tuple[Optional[str], str, Tuple[str, ...]]:
+        """Identidade do calendário, usada como chave de cache"""
+        return (self.timezone_name, self.weekmask, self.holidays)
+
+    def local_moment(self, moment: datetime) -> datetime:
+        """
+        Instante no fuso da empresa. Um datetime sem fuso é a hora local do
+        servidor (como datetime.now()); sem fuso no calendário, fica como está.
+        """
+        if self.timezone is None:
+            return moment
+        return moment.astimezone(self.timezone)
+
+    def local_date(self, moment: datetime) -> date:
+        """Data local da empresa para um instante"""
+        return self.local_moment(moment).date()
+
+    def business_days(self, start: date, end: date) -> np.ndarray:
+        """Dias úteis no intervalo fechado [start, end]"""
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        return days[np.is_busday(days, busdaycal=self.busdaycal)]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # np.busdaycalendar não é serializável; é recriado em __setstate__
+        return {"timezone": self.timezone_name, "holidays": self.holidays, "weekmask": self.weekmask}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["timezone"], state["holidays"], state["weekmask"])
+
+
+class DueDateEngine:
+    """
+    Calcula vencimentos em lote.
+
+    - daily: o próprio dia, ou o próximo dia útil
+    - weekly: o day_of_week da semana corrente (padrão: sexta), ou o dia útil seguinte
+    - monthly: fim da semana week_of_month do mês (padrão: último dia do mês),
+      recuado para o dia útil anterior; se já passou, vale o mês seguinte
+    """
+
+    def __init__(self, calendar: Optional[BusinessCalendar] = None):
+        self.calendar = calendar or BusinessCalendar()
+
+    def due_days(self, frequencies: Sequence[str], base_day: date,
+                 days_of_week: Optional[Sequence[Any]] = None,
+                 weeks_of_month: Optional[Sequence[Any]] = None) -> np.ndarray:
+        """Datas de vencimento (datetime64[D]) de um lote de tarefas"""
+        total = len(frequencies)
+        cal = self.calendar.busdaycal
+        codes = np.array([FREQUENCY_CODES.get(f, -1) for f in frequencies], dtype='int8')
+        dows = np.array([parse_weekday(d) for d in days_of_week] if days_of_week is not None else [-1] * total, dtype='int64')
+        woms = np.array([int(w) if w else 0 for w in weeks_of_month] if weeks_of_month is not None else [0] * total, dtype='int64')
+
+        base = np.datetime64(base_day, 'D')
+        due = np.full(total, base + 1, dtype='datetime64[D]')
+
+        daily = codes == 0
+        if daily.any():
+            due[daily] = np.busday_offset(base, 0, roll='forward', busdaycal=cal)
+
+        weekly = codes == 1
+        if weekly.any():
+            target = np.where(dows[weekly] >= 0, dows[weekly], DEFAULT_WEEKDAY)
+            days = base + (target - weekday_of(np.array([base]))) % 7
+            due[weekly] = np.busday_offset(days, 0, roll='forward', busdaycal=cal)
+
+        monthly = codes == 2
+        if monthly.any():
+            weeks = woms[monthly]
+            month = base.astype('datetime64[M]')
+            current = self._monthly_due(np.full(len(weeks), month), weeks)
+            following = self._monthly_due(np.full(len(weeks), month + 1), weeks)
+            due[monthly] = np.where(current < base, following, current)
+
+        return due
+
+    def _monthly_due(self, months: np.ndarray, weeks: np.ndarray) -> np.ndarray:
+        """Vencimento mensal para cada mês/semana do lote"""
+        cal = self.calendar.busdaycal
+        start = months.astype('datetime64[D]')
+        end = (months + 1).astype('datetime64[D]') - 1
+        target = np.where(weeks > 0, np.minimum(start + weeks * 7 - 1, end), end)
+        rolled = np.busday_offset(target, 0, roll='preceding', busdaycal=cal)
+        # Se não há dia útil antes do alvo dentro do mês, usa o primeiro dia útil do mês
+        return np.where(rolled < start, np.busday_offset(start, 0, roll='forward', busdaycal=cal), rolled)
+
+    def occurrences(self, frequency: str, start: date, end: date, day_of_week: Any = None,
+                    week_of_month: Any = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Expande a recorrência de um template no intervalo fechado [start, end].
+        Retorna (início da janela, vencimento) de cada ocorrência como datetime64[D]:
+
+        - daily: uma ocorrência por dia útil
+        - weekly: uma por semana, no day_of_week (ou dia útil seguinte); a janela começa na segunda
+        - monthly: uma por mês, com as regras de due_days; a janela começa no dia 1
+        """
+        cal = self.calendar.busdaycal
+        first = np.datetime64(start, 'D')
+        last = np.datetime64(end, 'D')
+        if last < first:
+            empty = np.array([], dtype='datetime64[D]')
+            return empty, empty
+
+        if frequency == 'daily':
+            days = self.calendar.business_days(start, end)
+            return days, days
+
+        if frequency == 'weekly':
+            weekday = parse_weekday(day_of_week)
+            weekday = DEFAULT_WEEKDAY if weekday < 0 else weekday
+            monday = first - int(weekday_of(np.array([first]))[0])
+            week_starts = np.arange(monday, last + 1, 7)
+            targets = week_starts + weekday
+            keep = (targets >= first) & (targets <= last)
+            due = np.busday_offset(targets[keep], 0, roll='forward', busdaycal=cal)
+            return np.maximum(week_starts[keep], first), due
+
+        if frequency == 'monthly':
+            months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+            weeks = np.full(len(months), int(week_of_month) if week_of_month else 0, dtype='int64')
+            due = self._monthly_due(months, weeks)
+            keep = (due >= first) & (due <= last)
+            return np.maximum(months[keep].astype('datetime64[D]'), first), due[keep]
+
+        # Frequência desconhecida: uma ocorrência, vencendo no dia seguinte ao início
+        return np.array([first]), np.array([first + 1])
+
+    def format_moments(self, days: np.ndarray, hours: np.ndarray) -> List[str]:
+        """Converte pares (dia, hora) em ISO 8601 no fuso do calendário (se houver)"""
+        # Formata cada par (dia, hora) distinto uma única vez
+        keys = days.astype('int64') * 24 + hours
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        formatted = np.empty(len(unique_keys), dtype=object)
+        for i, key in enumerate(unique_keys.tolist()):
+            day = date.fromordinal(date(1970, 1, 1).toordinal() + key // 24)
+            formatted[i] = datetime.combine(day, time(key % 24), tzinfo=self.calendar.timezone).isoformat()
+        return formatted[inverse.reshape(-1)].tolist()
+
+    def format_due_dates(self, days: np.ndarray, frequencies: Sequence[str]) -> List[str]:
+        """Converte as datas em ISO 8601 com o horário de vencimento (e fuso, se houver)"""
+        codes = np.array([FREQUENCY_CODES.get(f, -1) for f in frequencies], dtype='int8')
+        return self.format_moments(days, HOURS_BY_CODE[codes])
+
+    def compute(self, frequencies: Sequence[str], base_date: datetime,
+                days_of_week: Optional[Sequence[Any]] = None,
+                weeks_of_month: Optional[Sequence[Any]] = None) -> List[str]:
+        """Vencimentos em ISO 8601 para um lote de tarefas"""
+        if not frequencies:
+            return []
+        days = self.due_days(frequencies, self.calendar.local_date(base_date), days_of_week, weeks_of_month)
+        return self.format_due_dates(days, frequencies)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Arbitragem de Tarefas por Empresa no Banco
+Executa a arbitragem de empresas inteiras dentro do Postgres com a função
+set-based arbitrate_empresa_tasks (database-schema-arbitragem-empresa.sql):
+um único INSERT ... SELECT por calendário, sem trazer personas nem tarefas
+para o Python. Os IDs e vencimentos são os mesmos do TaskArbitrator.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import db_session
+
+SCHEMA_FILE = Path(__file__).parent / "database-schema-arbitragem-empresa.sql"
+
+ARBITRATE_SQL = """
+    SELECT empresa_id::text, personas, personas_without_template, tasks_inserted, tasks_updated
+    FROM arbitrate_empresa_tasks(%s::uuid[], %s, %s, %s, %s::date[])
+"""
+
+ALL_EMPRESAS_SQL = "SELECT DISTINCT empresa_id::text FROM personas WHERE empresa_id IS NOT NULL"
+
+
+def install_functions(connection, schema_file: Path = SCHEMA_FILE) -> None:
+    """Cria (ou atualiza) as funções de arbitragem por empresa no banco"""
+    with connection.cursor() as cursor:
+        cursor.execute(schema_file.read_text(encoding='utf-8'))
+    connection.commit()
+
+
+def load_calendars() -> Dict[str, Any]:
+    """Calendários por empresa do TaskArbitrator (AUTOMACAO/empresa_calendars.json)"""
+    from task_arbitrator import TaskArbitrator
+    return TaskArbitrator().calendars
+
+
+def arbitrate_empresas(connection, empresa_ids: Sequence[str], reference_date: Optional[datetime] = None,
+                       calendars: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Arbitra todas as personas das empresas informadas, em uma transação.
+
+    As empresas são agrupadas por calendário (fuso, weekmask, feriados) e cada
+    grupo é arbitrado com uma única chamada de arbitrate_empresa_tasks.
+    Retorna uma linha de estatísticas por empresa.
+    """
+    reference_date = reference_date or datetime.now()
+    calendars = calendars if calendars is not None else load_calendars()
+    default = calendars["default"]
+
+    groups: Dict[Any, List[str]] = {}
+    for empresa_id in empresa_ids:
+        calendar = calendars.get(empresa_id) or default
+        groups.setdefault(calendar.key, []).append(empresa_id)
+
+    results = []
+    try:
+        with connection.cursor() as cursor:
+            for (timezone, weekmask, holidays), group in groups.items():
+                calendar = calendars.get(group[0]) or default
+                # Como no TaskArbitrator, uma data sem fuso é a hora local do servidor
+                reference = calendar.local_moment(reference_date)
+                started = time.perf_counter()
+                cursor.execute(ARBITRATE_SQL, (list(group), reference, timezone, weekmask, list(holidays)))
+                rows = cursor.fetchall()
+                logging.info("%d empresas arbitradas no banco em %.2fs (calendário %s)",
+                             len(group), time.perf_counter() - started, timezone or "padrão")
+                for empresa_id, personas, without_template, inserted, updated in rows:
+                    results.append({
+                        "empresa_id": empresa_id,
+                        "personas": personas,
+                        "personas_without_template": without_template,
+                        "tasks_inserted": inserted,
+                        "tasks_updated": updated
+                    })
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return results
+
+
+def main():
+    """Arbitra empresas inteiras no banco"""
+    parser = argparse.ArgumentParser(description="Arbitragem set-based de empresas inteiras no banco")
+    parser.add_argument('empresa_ids', nargs='*', help="Empresas a arbitrar")
+    parser.add_argument('--all', action='store_true', help="Arbitra todas as empresas com personas")
+    parser.add_argument('--reference-date', type=datetime.fromisoformat, default=None, metavar='ISO',
+                        help="Instante da arbitragem (padrão: agora)")
+    parser.add_argument('--install', action='store_true', help="Cria/atualiza as funções SQL antes de arbitrar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not args.empresa_ids and not args.all and not args.install:
+        parser.error("informe empresas, --all ou --install")
+
+    print("🔌 Conectando ao banco de dados...")
+    try:
+        with db_session.connection() as connection:
+            if args.install:
+                install_functions(connection)
+                print("✅ Funções de arbitragem por empresa instaladas")
+            empresa_ids = args.empresa_ids
+            if args.all:
+                with connection.cursor() as cursor:
+                    cursor.execute(ALL_EMPRESAS_SQL)
+                    empresa_ids = [row[0] for row in cursor.fetchall()]
+            results = arbitrate_empresas(connection, empresa_ids, args.reference_date) if empresa_ids else []
+    except Exception as e:
+        print(f"❌ Erro na arbitragem: {str(e)}")
+        sys.exit(1)
+    finally:
+        db_session.close_all()
+
+    for result in results:
+        print(f"🏢 {result['empresa_id']}: {result['personas']} personas, "
+              f"{result['tasks_inserted']} tarefas novas, {result['tasks_updated']} atualizadas")
+        if result['personas_without_template']:
+            print(f"   ⚠️ {result['personas_without_template']} personas sem template para o cargo")
+
+
+if __name__ == "__main__":
+    main()
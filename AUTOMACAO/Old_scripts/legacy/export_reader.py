@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Leitor Indexado de Exportações da Arbitragem VCM
+Abre exportações do arbitrador (.json ou .ndjson) via mmap e mantém um índice
+lateral (arquivo .idx) com o intervalo de bytes de cada persona, permitindo
+acesso direto às tarefas de uma persona e iteração preguiçosa sem carregar o
+documento inteiro em memória.
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Versão do formato do índice lateral (mudar invalida os índices existentes)
+INDEX_FORMAT_VERSION = 1
+
+FREQUENCY_KEYS = ("daily_tasks", "weekly_tasks", "monthly_tasks")
+
+# Tokens estruturais do JSON: strings (com o ':' de chave, se houver) e delimitadores
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"(\s*:)?|[\[\]{}]')
+
+# Valor escalar logo após uma chave ("persona_id": "abc" / 123 / null)
+_SCALAR_RE = re.compile(rb'\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?|null)')
+
+# persona_id como primeira chave do objeto (formato gravado pelo arbitrador)
+_PERSONA_ID_RE = re.compile(rb'\s*\{\s*"persona_id"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+|null)')
+
+
+class ArbitrationExportReader:
+    """
+    Acesso aleatório e iteração preguiçosa sobre uma exportação do arbitrador.
+
+    O índice guarda, para cada persona (na ordem do arquivo), o persona_id e o
+    intervalo [início, fim) do seu objeto JSON. Ele é gravado ao lado da
+    exportação e reaproveitado enquanto o tamanho e a data de modificação do
+    arquivo não mudarem. Cada leitura decodifica apenas a fatia da persona.
+    Exportações comprimidas (.gz) não podem ser mapeadas em memória.
+    """
+
+    def __init__(self, path: Path, index_path: Optional[Path] = None, rebuild: bool = False,
+                 persist_index: bool = True):
+        self.path = Path(path)
+        if self.path.suffix == '.gz':
+            raise ValueError(f"Exportação comprimida não suporta mmap: {self.path}")
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + '.idx')
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap não aceita arquivos vazios
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        index = None if rebuild else self.read_index()
+        if index is None:
+            index = self.build_index()
+            if persist_index:
+                self.write_index(index)
+        self.empresa_id = index["empresa_id"]
+        self.summary_range: Optional[Tuple[int, int]] = tuple(index["summary"]) if index["summary"] else None
+        self.entries: List[Tuple[Any, int, int]] = [tuple(entry) for entry in index["entries"]]
+        self._positions: Dict[Any, int] = {}
+        for position, (persona_id, _, _) in enumerate(self.entries):
+            self._positions.setdefault(persona_id, position)
+
+    def __enter__(self) -> 'ArbitrationExportReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def source_stamp(self) -> Tuple[int, int]:
+        """Tamanho e mtime da exportação (identificam a versão indexada)"""
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def read_index(self) -> Optional[Dict[str, Any]]:
+        """Lê o índice lateral (None se ausente, corrompido ou desatualizado)"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("Índice ignorado (%s): %s", self.index_path, e)
+            return None
+        if index.get("format") != INDEX_FORMAT_VERSION or tuple(index.get("source", ())) != self.source_stamp():
+            return None
+        return index
+
+    def write_index(self, index: Dict[str, Any]) -> None:
+        """Grava o índice de forma atômica; falhas (diretório somente leitura) não impedem a leitura"""
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning("Não foi possível gravar o índice %s: %s", self.index_path, e)
+
+    def build_index(self) -> Dict[str, Any]:
+        """Varre a exportação uma vez e monta o índice de intervalos por persona"""
+        if '.ndjson' in self.path.suffixes:
+            empresa_id, summary, entries = self._scan_ndjson()
+        else:
+            empresa_id, summary, entries = self._scan_json()
+        logging.info("Índice de %s: %d personas", self.path.name, len(entries))
+        return {
+            "format": INDEX_FORMAT_VERSION,
+            "source": list(self.source_stamp()),
+            "empresa_id": empresa_id,
+            "summary": summary,
+            "entries": entries
+        }
+
+    def _scan_ndjson(self) -> Tuple[Optional[str], Optional[List[int]], List[List[Any]]]:
+        data = self._mmap
+        entries = []
+        empresa_id, summary = None, None
+        start, size = 0, len(data)
+        while start < size:
+            end = data.find(b'\n', start)
+            if end < 0:
+                end = size
+            line_end = end
+            while line_end > start and data[line_end - 1] in b'\r \t':
+                line_end -= 1
+            if line_end > start:
+                match = _PERSONA_ID_RE.match(data, start, line_end)
+                if match:
+                    entries.append([json.loads(match.group(1)), start, line_end])
+                else:
+                    record = json.loads(data[start:line_end])
+                    if record.get('record_type') == 'summary':
+                        empresa_id, summary = record.get('empresa_id'), [start, line_end]
+                    else:
+                        entries.append([record.get('persona_id'), start, line_end])
+            start = end + 1
+        return empresa_id, summary, entries
+
+    def _scan_json(self) -> Tuple[Optional[str], Optional[List[int]], List[List[Any]]]:
+        """
+        Localiza os elementos de personas_tasks pelos tokens estruturais.
+
+        O conteúdo das strings é pulado pela expressão regular (em C). Quando o
+        arquivo segue o layout de export_tasks_to_json (indent=2), o fim de cada
+        persona é a próxima linha "    }", já que quebras de linha dentro de
+        strings são sempre escapadas; os demais layouts são varridos token a token.
+        """
+        data = self._mmap
+        entries = []
+        empresa_id, summary = None, None
+        depth = 0
+        key = None            # última chave vista no nível 1
+        in_personas = False   # dentro do array personas_tasks
+        element_start = -1
+        position = 0
+        while True:
+            match = _TOKEN_RE.search(data, position)
+            if match is None:
+                break
+            position = match.end()
+            token = match.group(0)
+            first = token[0]
+            if first == 0x22:  # string
+                if depth == 1 and match.group(1):
+                    key = json.loads(token[:token.rindex(b'"') + 1])
+                    if key == 'empresa_id':
+                        value = _SCALAR_RE.match(data, position)
+                        empresa_id = json.loads(value.group(1)) if value else None
+                continue
+            if first in b'{[':
+                if depth == 2 and in_personas and first == 0x7B:
+                    element_start = match.start()
+                    if data[element_start - 5:element_start] == b'\n    ':
+                        end = data.find(b'\n    }', element_start)
+                        if end >= 0:
+                            end += 6
+                            persona = _PERSONA_ID_RE.match(data, element_start)
+                            entries.append([json.loads(persona.group(1)) if persona else None, element_start, end])
+                            element_start = -1
+                            position = end
+                            continue
+                elif depth == 1 and key == 'summary' and first == 0x7B:
+                    element_start = match.start()
+                elif depth == 1 and key == 'personas_tasks' and first == 0x5B:
+                    in_personas = True
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 2 and in_personas and element_start >= 0:
+                    persona = _PERSONA_ID_RE.match(data, element_start)
+                    entries.append([json.loads(persona.group(1)) if persona else None, element_start, position])
+                    element_start = -1
+                elif depth == 1 and in_personas:
+                    in_personas = False
+                elif depth == 1 and key == 'summary' and element_start >= 0:
+                    summary = [element_start, position]
+                    element_start = -1
+        return empresa_id, summary, entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, persona_id: Any) -> bool:
+        return persona_id in self._positions
+
+    def persona_ids(self) -> List[Any]:
+        """persona_ids na ordem do arquivo"""
+        return [entry[0] for entry in self.entries]
+
+    def raw(self, persona_id: Any) -> bytes:
+        """Bytes do objeto JSON da persona (KeyError se ausente)"""
+        _, start, end = self.entries[self._positions[persona_id]]
+        return self._mmap[start:end]
+
+    def get(self, persona_id: Any) -> Optional[Dict[str, Any]]:
+        """Resultado de uma persona, decodificando somente a sua fatia"""
+        if persona_id not in self._positions:
+            return None
+        return json.loads(self.raw(persona_id))
+
+    def tasks(self, persona_id: Any, frequency: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Tarefas de uma persona, de todas as frequências ou de uma (daily, weekly, monthly)"""
+        persona = self.get(persona_id) or {}
+        keys = FREQUENCY_KEYS if frequency is None else (f"{frequency}_tasks",)
+        return [task for key in keys for task in persona.get(key, ())]
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Sumário da execução (registro final do NDJSON ou chave summary do JSON)"""
+        if self.summary_range is None:
+            return None
+        start, end = self.summary_range
+        return json.loads(self._mmap[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Resultados por persona, decodificados um de cada vez"""
+        for _, start, end in self.entries:
+            yield json.loads(self._mmap[start:end])
+
+
+def main():
+    """Indexa uma exportação e mostra as tarefas de uma persona"""
+    parser = argparse.ArgumentParser(description="Leitura indexada (mmap) de exportações do arbitrador")
+    parser.add_argument('export_file', type=Path, help="Exportação do arbitrador (.json ou .ndjson)")
+    parser.add_argument('--persona', default=None, help="persona_id a consultar")
+    parser.add_argument('--rebuild', action='store_true', help="Reconstrói o índice lateral")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with ArbitrationExportReader(args.export_file, rebuild=args.rebuild) as reader:
+        print(f"✅ {len(reader)} personas indexadas (empresa {reader.empresa_id})")
+        print(f"💾 Índice: {reader.index_path}")
+        if args.persona is not None:
+            persona = reader.get(args.persona)
+            if persona is None:
+                print(f"❌ Persona não encontrada: {args.persona}")
+                return
+            for key in FREQUENCY_KEYS:
+                print(f"   📋 {key}: {len(persona.get(key, []))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+Consultor de Índices VCM
+Propõe índices compostos e parciais para persona_tasks e as tabelas do
+pipeline (rag_knowledge_base, n8n_workflows, objetivos, auditorias) a partir
+de uma carga de consultas: um arquivo capturado ou o pg_stat_statements.
+
+Cada consulta é explicada (EXPLAIN em JSON). Varreduras com filtro e
+ordenações sobre as tabelas alvo geram candidatos: colunas de igualdade
+(mais seletivas primeiro), depois a de intervalo ou as de ordenação; um
+predicado constante em coluna de baixa cardinalidade gera também a versão
+parcial. Os candidatos são validados com índices hipotéticos (HypoPG) ou,
+com --real-indexes, criados dentro de uma transação desfeita ao final. Só
+viram DDL os índices que o planejador usa e que reduzem o custo estimado da
+carga, escolhidos de forma gulosa (cada um medido junto dos já aceitos).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import db_session
+
+DEFAULT_TABLES = ("persona_tasks", "rag_knowledge_base", "n8n_workflows", "objetivos", "auditorias")
+
+# Ganho mínimo de um índice, como fração do custo das consultas da sua tabela
+DEFAULT_MIN_GAIN = 0.10
+
+# Colunas de chave por índice proposto
+MAX_KEY_COLUMNS = 3
+
+# Colunas com até este número de valores distintos podem virar predicado de índice parcial
+LOW_CARDINALITY = 20
+
+SCAN_NODES = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+# Nós que preservam a ordenação pedida acima deles
+PASSTHROUGH_NODES = ("Limit", "Result", "Gather Merge", "Unique")
+
+STAT_STATEMENTS_SQL = """
+    SELECT query, calls
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND query ~* %s
+      AND query ~* '^\\s*(select|with|update|delete)\\M'
+    ORDER BY total_exec_time DESC
+    LIMIT %s
+"""
+
+COLUMNS_SQL = """
+    SELECT c.relname, a.attname,
+           CASE WHEN s.n_distinct < 0 THEN -s.n_distinct * greatest(c.reltuples, 0) ELSE s.n_distinct END
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_stats s ON s.schemaname = n.nspname AND s.tablename = c.relname AND s.attname = a.attname
+    WHERE c.relname = ANY (%s) AND c.relkind IN ('r', 'p') AND pg_table_is_visible(c.oid)
+"""
+
+INDEXES_SQL = """
+    SELECT t.relname, i.relname,
+           ARRAY(SELECT coalesce(a.attname, '?')
+                 FROM unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+                 LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                 ORDER BY k.ord),
+           pg_get_expr(x.indpred, x.indrelid)
+    FROM pg_index x
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE t.relname = ANY (%s) AND pg_table_is_visible(t.oid)
+"""
+
+TERM_RE = re.compile(
+    r"^\(?(?:\w+\.)?(?P<column>\w+)\)?(?:::[\w ]+(?:\[\])?)?\s*"
+    r"(?P<operator><>|<=|>=|=|<|>|!?~~\*?|IS NOT NULL|IS NULL)\s*(?P<any>ANY\s*)?(?P<value>.*)$",
+    re.S
+)
+SORT_KEY_RE = re.compile(r"^(?:\w+\.)?(?P<column>\w+)(?P<direction> DESC)?(?: NULLS (?:FIRST|LAST))?$")
+CAST_RE = re.compile(r"::[\w ]+(?:\[\])?$")
+PARAMETER_RE = re.compile(r"\$\d+")
+CONSTANT_RE = re.compile(r"^(?:'(?:[^']|'')*'|-?\d+(?:\.\d+)?|true|false)$")
+
+
+class WorkloadQuery:
+    """Uma consulta da carga, com peso (chamadas) e custo estimado sem índices novos"""
+
+    __slots__ = ("sql", "calls", "baseline", "tables")
+
+    def __init__(self, sql: str, calls: int = 1):
+        self.sql = sql
+        self.calls = calls
+        self.baseline: Optional[float] = None
+        self.tables: Set[str] = set()
+
+
+class IndexCandidate:
+    """Índice proposto: tabela, colunas de chave (com direção) e predicado parcial opcional"""
+
+    __slots__ = ("table", "columns", "predicate")
+
+    def __init__(self, table: str, columns: Tuple[str, ...], predicate: Optional[str] = None):
+        self.table = table
+        self.columns = columns
+        self.predicate = predicate
+
+    @property
+    def key(self) -> Tuple[str, Tuple[str, ...], Optional[str]]:
+        return (self.table, self.columns, self.predicate)
+
+    @property
+    def name(self) -> str:
+        parts = [self.table] + [column.split()[0] for column in self.columns]
+        if self.predicate:
+            parts.append(re.sub(r'\W+', '_', self.predicate.lower()).strip('_'))
+        name = "idx_" + "_".join(parts)
+        if len(name) > 63:
+            digest = hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]
+            name = f"{name[:54]}_{digest}"
+        return name
+
+    @property
+    def definition(self) -> str:
+        definition = f"ON {self.table} ({', '.join(self.columns)})"
+        if self.predicate:
+            definition += f" WHERE {self.predicate}"
+        return definition
+
+    def ddl(self, concurrently: bool = True) -> str:
+        return f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {self.name} {self.definition};"
+
+
+def read_workload_file(path: Path) -> List[WorkloadQuery]:
+    """
+    Lê uma carga capturada: .jsonl/.ndjson com {"query", "calls"} por linha, ou
+    SQL com instruções terminadas em ';' (um comentário "-- calls: N" antes da
+    instrução define seu peso). Consultas repetidas têm os pesos somados.
+    """
+    entries: List[Tuple[str, int]] = []
+    text = path.read_text(encoding='utf-8')
+    if path.suffix in ('.jsonl', '.ndjson'):
+        for line in text.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                entries.append((record['query'], int(record.get('calls', 1))))
+    else:
+        calls, statement = 1, []
+        for line in text.splitlines():
+            stripped = line.strip()
+            match = re.match(r"--\s*calls:\s*(\d+)", stripped, re.I)
+            if match:
+                calls = int(match.group(1))
+                continue
+            if stripped.startswith('--') or not stripped:
+                continue
+            statement.append(line)
+            if stripped.endswith(';'):
+                entries.append(("\n".join(statement).rstrip().rstrip(';'), calls))
+                calls, statement = 1, []
+        if statement:
+            entries.append(("\n".join(statement), calls))
+
+    merged: Dict[str, WorkloadQuery] = {}
+    for sql, calls in entries:
+        normalized = " ".join(sql.split())
+        if normalized in merged:
+            merged[normalized].calls += calls
+        else:
+            merged[normalized] = WorkloadQuery(sql, calls)
+    return list(merged.values())
+
+
+def read_pg_stat_statements(connection, tables: Iterable[str], limit: int = 200) -> List[WorkloadQuery]:
+    """Consultas do pg_stat_statements que citam as tabelas alvo, das mais caras para as mais baratas"""
+    pattern = r"\m(" + "|".join(re.escape(table) for table in tables) + r")\M"
+    with connection.cursor() as cursor:
+        cursor.execute(STAT_STATEMENTS_SQL, (pattern, limit))
+        rows = cursor.fetchall()
+    connection.rollback()
+    return [WorkloadQuery(query, int(calls)) for query, calls in rows]
+
+
+def _balanced(text: str) -> bool:
+    depth, in_quote = 0, False
+    for char in text:
+        if char == "'":
+            in_quote = not in_quote
+        elif not in_quote:
+            depth += (char == '(') - (char == ')')
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def _strip_parens(text: str) -> str:
+    text = text.strip()
+    while text.startswith('(') and text.endswith(')') and _balanced(text[1:-1]):
+        text = text[1:-1].strip()
+    return text
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts, depth, in_quote, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        char = text[i]
+        if char == "'":
+            in_quote = not in_quote
+        elif not in_quote:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif depth == 0 and text.startswith(separator, i):
+                parts.append(text[start:i])
+                i += len(separator)
+                start = i
+                continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_condition(condition: str) -> List[Dict[str, Any]]:
+    """
+    Termos de uma condição do EXPLAIN (ligados por AND): coluna, classe do
+    operador (eq, range ou filter) e o valor (constant, parameter ou expression).
+    Termos com OR e formas não reconhecidas são ignorados.
+    """
+    terms = []
+    for term in _split_top_level(_strip_parens(condition), " AND "):
+        term = _strip_parens(term)
+        if len(_split_top_level(term, " OR ")) > 1:
+            continue
+        match = TERM_RE.match(term)
+        if not match:
+            continue
+        operator = match.group('operator')
+        value = _strip_parens(match.group('value') or '')
+        while CAST_RE.search(value):
+            value = _strip_parens(CAST_RE.sub('', value))
+        if operator in ('=', 'IS NULL'):
+            kind = 'eq'
+        elif operator in ('<', '>', '<=', '>='):
+            kind = 'range'
+        else:
+            kind = 'filter'
+        if operator.startswith('IS') or CONSTANT_RE.match(value):
+            value_kind = 'constant'
+        elif PARAMETER_RE.fullmatch(value):
+            value_kind = 'parameter'
+        else:
+            value_kind = 'expression'
+        terms.append({
+            "column": match.group('column'),
+            "operator": operator + (" ANY" if match.group('any') else ""),
+            "kind": kind,
+            "value": value,
+            "value_kind": value_kind
+        })
+    return terms
+
+
+def plan_accesses(plan: Dict[str, Any], tables: Iterable[str]) -> List[Dict[str, Any]]:
+    """Acessos às tabelas alvo em um plano: condições da varredura e a ordenação logo acima dela"""
+    tables = set(tables)
+    accesses = []
+
+    def visit(node: Dict[str, Any], sort_keys: Optional[List[str]]) -> None:
+        node_type = node.get("Node Type")
+        if node_type in ("Sort", "Incremental Sort"):
+            child_sort = node.get("Sort Key")
+        elif node_type in PASSTHROUGH_NODES:
+            child_sort = sort_keys
+        else:
+            child_sort = None
+        if node_type in SCAN_NODES and node.get("Relation Name") in tables:
+            conditions = [node[key] for key in ("Index Cond", "Recheck Cond", "Filter") if node.get(key)]
+            if node.get("Filter") or node_type == "Seq Scan" or sort_keys:
+                accesses.append({"table": node["Relation Name"], "conditions": conditions,
+                                 "sort_keys": sort_keys or []})
+        for child in node.get("Plans", ()):
+            visit(child, child_sort)
+
+    visit(plan["Plan"], None)
+    return accesses
+
+
+def index_names(plan: Dict[str, Any]) -> Set[str]:
+    """Índices usados em qualquer nó do plano"""
+    names = set()
+    stack = [plan["Plan"]]
+    while stack:
+        node = stack.pop()
+        if node.get("Index Name"):
+            names.add(node["Index Name"])
+        stack.extend(node.get("Plans", ()))
+    return names
+
+
+class IndexAdvisor:
+    """
+    Gera, valida e seleciona índices para uma carga de consultas.
+
+    hypothetical=True usa o HypoPG (hypopg_create_index); com False, cada
+    avaliação cria os índices de verdade dentro de uma transação desfeita,
+    o que bloqueia escritas nas tabelas enquanto dura (somente em banco local).
+    """
+
+    def __init__(self, connection, tables: Iterable[str] = DEFAULT_TABLES, hypothetical: bool = True,
+                 min_gain: float = DEFAULT_MIN_GAIN):
+        self.connection = connection
+        self.tables = tuple(tables)
+        self.hypothetical = hypothetical
+        self.min_gain = min_gain
+        self.columns: Dict[str, Dict[str, Optional[float]]] = {}
+        self.existing: Dict[str, List[Tuple[str, Tuple[str, ...], Optional[str]]]] = {}
+        self.generic_plans = connection.server_version >= 160000
+
+    @staticmethod
+    def hypopg_available(connection) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regproc('hypopg_create_index') IS NOT NULL")
+            available = cursor.fetchone()[0]
+        connection.rollback()
+        return available
+
+    def load_catalog(self) -> None:
+        """Colunas (com n_distinct estimado) e índices existentes das tabelas alvo"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(COLUMNS_SQL, (list(self.tables),))
+            for table, column, n_distinct in cursor.fetchall():
+                self.columns.setdefault(table, {})[column] = float(n_distinct) if n_distinct is not None else None
+            cursor.execute(INDEXES_SQL, (list(self.tables),))
+            for table, name, columns, predicate in cursor.fetchall():
+                self.existing.setdefault(table, []).append((name, tuple(columns), predicate))
+        self.connection.rollback()
+        missing = [table for table in self.tables if table not in self.columns]
+        if missing:
+            logging.warning("Tabelas não encontradas: %s", ", ".join(missing))
+
+    def explain(self, sql: str) -> Dict[str, Any]:
+        """Plano estimado (sem executar); consultas com $n usam plano genérico (Postgres 16+)"""
+        options = "FORMAT JSON"
+        if PARAMETER_RE.search(sql):
+            if not self.generic_plans:
+                raise ValueError("consulta com parâmetros exige Postgres 16+ (EXPLAIN GENERIC_PLAN)")
+            options += ", GENERIC_PLAN"
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({options}) {sql}")
+            plan = cursor.fetchone()[0]
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+    def measure_baseline(self, workload: List[WorkloadQuery]) -> List[WorkloadQuery]:
+        """Custo atual de cada consulta; descarta as que não podem ser explicadas ou não tocam as tabelas"""
+        measured = []
+        for query in workload:
+            try:
+                plan = self.explain(query.sql)
+            except Exception as e:
+                self.connection.rollback()
+                logging.warning("Consulta ignorada (%s): %s", str(e).strip().splitlines()[0], " ".join(query.sql.split())[:120])
+                continue
+            query.baseline = plan["Plan"]["Total Cost"]
+            query.tables = {access["table"] for access in plan_accesses(plan, self.tables)}
+            if query.tables:
+                measured.append(query)
+        self.connection.rollback()
+        return measured
+
+    def candidates_for(self, query: WorkloadQuery) -> List[IndexCandidate]:
+        """Candidatos a partir das varreduras e ordenações de uma consulta"""
+        candidates = []
+        for access in plan_accesses(self.explain(query.sql), self.tables):
+            table = access["table"]
+            columns = self.columns.get(table, {})
+            terms = [term for condition in access["conditions"] for term in parse_condition(condition)
+                     if term["column"] in columns]
+
+            equality = []
+            for term in terms:
+                if term["kind"] == 'eq' and term["column"] not in equality:
+                    equality.append(term["column"])
+            # Mais seletivas (mais valores distintos) primeiro
+            equality.sort(key=lambda column: -(columns.get(column) or 0))
+            ranges = [term["column"] for term in terms if term["kind"] == 'range' and term["column"] not in equality]
+
+            sort_columns = []
+            for sort_key in access["sort_keys"]:
+                match = SORT_KEY_RE.match(sort_key)
+                if not match or match.group('column') not in columns:
+                    sort_columns = []
+                    break
+                sort_columns.append(match.group('column') + (match.group('direction') or ''))
+
+            def key_columns(eq_columns: List[str]) -> Tuple[str, ...]:
+                if sort_columns and (not ranges or sort_columns[0].split()[0] == ranges[0]):
+                    tail = [column for column in sort_columns if column.split()[0] not in eq_columns]
+                else:
+                    tail = ranges[:1]
+                return tuple((eq_columns + tail)[:MAX_KEY_COLUMNS])
+
+            full = key_columns(equality)
+            if full:
+                candidates.append(IndexCandidate(table, full))
+
+            # Predicado constante em coluna de baixa cardinalidade: versão parcial
+            for term in terms:
+                distinct = columns.get(term["column"])
+                if (term["value_kind"] == 'constant' and term["operator"] in ('=', '<>', 'IS NULL', 'IS NOT NULL')
+                        and distinct is not None and 0 < distinct <= LOW_CARDINALITY):
+                    predicate = f"{term['column']} {term['operator']} {term['value']}".strip()
+                    partial = key_columns([column for column in equality if column != term["column"]])
+                    if partial:
+                        candidates.append(IndexCandidate(table, partial, predicate))
+                    break
+        return candidates
+
+    def is_covered(self, candidate: IndexCandidate) -> bool:
+        """Já existe índice com essas colunas como prefixo e o mesmo predicado"""
+        for _, columns, predicate in self.existing.get(candidate.table, ()):
+            if (columns[:len(candidate.columns)] == tuple(column.split()[0] for column in candidate.columns)
+                    and (predicate or None) == candidate.predicate):
+                return True
+        return False
+
+    def generate_candidates(self, workload: List[WorkloadQuery]) -> List[IndexCandidate]:
+        """Candidatos distintos de toda a carga, sem os já cobertos por índices existentes"""
+        unique: Dict[Tuple[Any, ...], IndexCandidate] = {}
+        for query in workload:
+            for candidate in self.candidates_for(query):
+                if candidate.key not in unique and not self.is_covered(candidate):
+                    unique[candidate.key] = candidate
+        self.connection.rollback()
+        return list(unique.values())
+
+    def evaluate(self, indexes: List[IndexCandidate], workload: List[WorkloadQuery]
+                 ) -> Tuple[Dict[int, float], Dict[Tuple[Any, ...], Set[int]]]:
+        """
+        Custo de cada consulta com os índices informados e, para cada índice,
+        as consultas cujo plano o usa. Só são explicadas as consultas das
+        tabelas afetadas; as demais mantêm o custo atual.
+        """
+        tables = {index.table for index in indexes}
+        costs = {i: query.baseline for i, query in enumerate(workload)}
+        used: Dict[Tuple[Any, ...], Set[int]] = {index.key: set() for index in indexes}
+        self.connection.rollback()
+        names = {}
+        try:
+            with self.connection.cursor() as cursor:
+                for number, index in enumerate(indexes):
+                    if self.hypothetical:
+                        cursor.execute("SELECT indexname FROM hypopg_create_index(%s)",
+                                       (f"CREATE INDEX {index.definition}",))
+                        names[cursor.fetchone()[0]] = index.key
+                    else:
+                        name = f"vcm_advisor_{number}"
+                        cursor.execute(f"CREATE INDEX {name} {index.definition}")
+                        names[name] = index.key
+            for i, query in enumerate(workload):
+                if query.tables & tables:
+                    plan = self.explain(query.sql)
+                    costs[i] = plan["Plan"]["Total Cost"]
+                    for name in index_names(plan) & names.keys():
+                        used[names[name]].add(i)
+        finally:
+            # Índices hipotéticos vivem na sessão, fora da transação
+            self.connection.rollback()
+            if self.hypothetical:
+                with self.connection.cursor() as cursor:
+                    cursor.execute("SELECT hypopg_reset()")
+                self.connection.rollback()
+        return costs, used
+
+    def advise(self, workload: List[WorkloadQuery]) -> Dict[str, Any]:
+        """Seleciona os índices, do maior ganho individual para o menor, mantendo só os que ainda ajudam"""
+        self.load_catalog()
+        workload = self.measure_baseline(workload)
+        candidates = self.generate_candidates(workload)
+        logging.info("%d consultas analisadas, %d candidatos", len(workload), len(candidates))
+
+        def weighted(costs: Dict[int, float], queries: Iterable[int]) -> float:
+            return sum(costs[i] * workload[i].calls for i in queries)
+
+        baseline = {i: query.baseline for i, query in enumerate(workload)}
+        table_queries = {table: [i for i, query in enumerate(workload) if table in query.tables]
+                         for table in self.tables}
+
+        individual = []
+        for candidate in candidates:
+            costs, used = self.evaluate([candidate], workload)
+            if used[candidate.key]:
+                individual.append((weighted(baseline, used[candidate.key]) - weighted(costs, used[candidate.key]),
+                                   candidate))
+        individual.sort(key=lambda item: -item[0])
+
+        accepted: List[IndexCandidate] = []
+        recommendations = []
+        current = dict(baseline)
+        for _, candidate in individual:
+            costs, used = self.evaluate(accepted + [candidate], workload)
+            queries = table_queries[candidate.table]
+            gain = weighted(current, queries) - weighted(costs, queries)
+            table_cost = weighted(baseline, queries)
+            if not used[candidate.key] or table_cost <= 0 or gain / table_cost < self.min_gain:
+                continue
+            accepted.append(candidate)
+            current = costs
+            recommendations.append({
+                "table": candidate.table,
+                "index": candidate.name,
+                "definition": candidate.definition,
+                "ddl": candidate.ddl(),
+                "queries": len(used[candidate.key]),
+                "cost_before": round(weighted(baseline, used[candidate.key]), 2),
+                "cost_after": round(weighted(costs, used[candidate.key]), 2),
+                "gain_pct": round(100 * gain / table_cost, 1)
+            })
+
+        total_before = weighted(baseline, baseline)
+        total_after = weighted(current, current)
+        return {
+            "queries": len(workload),
+            "candidates": len(candidates),
+            "validation": "hypopg" if self.hypothetical else "transaction",
+            "workload_cost_before": round(total_before, 2),
+            "workload_cost_after": round(total_after, 2),
+            "saving_pct": round(100 * (total_before - total_after) / total_before, 1) if total_before else 0.0,
+            "recommendations": recommendations
+        }
+
+
+def main():
+    """Analisa a carga e emite o DDL dos índices recomendados"""
+    parser = argparse.ArgumentParser(description="Recomendação de índices a partir de uma carga de consultas")
+    parser.add_argument('--workload', type=Path, default=None,
+                        help="Carga capturada (.sql com '-- calls: N' ou .jsonl com query/calls)")
+    parser.add_argument('--pg-stat-statements', action='store_true', help="Lê a carga do pg_stat_statements")
+    parser.add_argument('--limit', type=int, default=200, help="Consultas lidas do pg_stat_statements")
+    parser.add_argument('--tables', nargs='+', default=list(DEFAULT_TABLES), help="Tabelas analisadas")
+    parser.add_argument('--min-gain', type=float, default=DEFAULT_MIN_GAIN,
+                        help="Ganho mínimo de um índice (fração do custo das consultas da tabela)")
+    parser.add_argument('--real-indexes', action='store_true',
+                        help="Sem HypoPG: valida criando os índices em uma transação desfeita (bloqueia escritas)")
+    parser.add_argument('--output', type=Path, default=None, help="Arquivo .sql com o DDL recomendado")
+    parser.add_argument('--report', type=Path, default=None, help="Arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not args.workload and not args.pg_stat_statements:
+        parser.error("informe --workload ou --pg-stat-statements")
+
+    print("🔌 Conectando ao banco de dados...")
+    try:
+        with db_session.connection() as connection:
+            hypothetical = IndexAdvisor.hypopg_available(connection)
+            if not hypothetical and not args.real_indexes:
+                print("❌ HypoPG não instalado (CREATE EXTENSION hypopg); use --real-indexes em um banco local")
+                sys.exit(1)
+            workload = read_workload_file(args.workload) if args.workload else []
+            if args.pg_stat_statements:
+                workload += read_pg_stat_statements(connection, args.tables, args.limit)
+            advisor = IndexAdvisor(connection, args.tables, hypothetical=hypothetical, min_gain=args.min_gain)
+            report = advisor.advise(workload)
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(f"❌ Erro na análise: {str(e)}")
+        sys.exit(1)
+    finally:
+        db_session.close_all()
+
+    print(f"📊 {report['queries']} consultas, {report['candidates']} candidatos "
+          f"(validação: {report['validation']})")
+    print(f"   Custo estimado da carga: {report['workload_cost_before']:.0f} → {report['workload_cost_after']:.0f} "
+          f"(-{report['saving_pct']}%)")
+    for recommendation in report["recommendations"]:
+        print(f"✅ {recommendation['index']}: -{recommendation['gain_pct']}% na tabela {recommendation['table']} "
+              f"({recommendation['queries']} consultas, {recommendation['cost_before']:.0f} → "
+              f"{recommendation['cost_after']:.0f})")
+    if not report["recommendations"]:
+        print("ℹ️  Nenhum índice novo reduz o custo da carga")
+
+    ddl = "\n".join(recommendation["ddl"] for recommendation in report["recommendations"])
+    if args.output and ddl:
+        args.output.write_text(ddl + "\n", encoding='utf-8')
+        print(f"📄 DDL gravado em {args.output}")
+    elif ddl:
+        print("\n" + ddl)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+-- Carga de referência para index_advisor.py
+-- Padrões de consulta do VCM sobre persona_tasks e as tabelas do pipeline
+-- (criar_tabelas_pipeline.sql). "-- calls: N" define o peso da consulta seguinte.
+
+-- vcm_learning_system.js: carga pendente da persona a partir de hoje
+-- calls: 5000
+SELECT estimated_duration FROM persona_tasks
+WHERE persona_id = $1 AND status = 'pending' AND due_date >= CURRENT_DATE;
+
+-- get_persona_tasks: tarefas da persona por status, em ordem de vencimento
+-- calls: 2000
+SELECT id, task_id, title, priority, status, due_date FROM persona_tasks
+WHERE persona_id = $1 AND status = $2
+ORDER BY due_date;
+
+-- Tarefas da empresa, mais recentes primeiro
+-- calls: 500
+SELECT id, title, status, created_at FROM persona_tasks
+WHERE empresa_id = $1
+ORDER BY created_at DESC
+LIMIT 50;
+
+-- Base de conhecimento da persona por tipo de conteúdo
+-- calls: 1500
+SELECT id, title, content FROM rag_knowledge_base
+WHERE persona_id = $1 AND content_type = $2;
+
+-- Documentos recentes da empresa
+-- calls: 300
+SELECT id, title, content_type, created_at FROM rag_knowledge_base
+WHERE empresa_id = $1
+ORDER BY created_at DESC
+LIMIT 20;
+
+-- Workflows da empresa por tipo
+-- calls: 400
+SELECT id, workflow_name, workflow_type FROM n8n_workflows
+WHERE empresa_id = $1 AND workflow_type = $2
+ORDER BY created_at DESC;
+
+-- Objetivos ativos da persona por prazo
+-- calls: 800
+SELECT id, titulo, meta_valor, meta_unidade, prazo FROM objetivos
+WHERE persona_id = $1 AND status = 'ativo'
+ORDER BY prazo;
+
+-- Objetivos da empresa vencendo
+-- calls: 200
+SELECT id, persona_id, titulo, prazo FROM objetivos
+WHERE empresa_id = $1 AND status = 'ativo' AND prazo <= CURRENT_DATE + 30;
+
+-- Auditorias recentes da empresa
+-- calls: 300
+SELECT id, auditoria_tipo, titulo, score, created_at FROM auditorias
+WHERE empresa_id = $1
+ORDER BY created_at DESC
+LIMIT 20;
+
+-- Última auditoria concluída de um tipo
+-- calls: 600
+SELECT id, score, resultados FROM auditorias
+WHERE empresa_id = $1 AND auditoria_tipo = $2 AND status = 'concluida'
+ORDER BY created_at DESC
+LIMIT 1;
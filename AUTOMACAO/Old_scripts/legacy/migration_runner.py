@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Executor de Migrações VCM
+Aplica os arquivos NNNN_nome.sql de um diretório de migrações, em ordem de
+versão, por conexão direta com o Postgres (sem uma chamada RPC por instrução):
+  - migrações comuns pendentes e consecutivas são aplicadas em uma única
+    transação, junto com o registro em schema_migrations (tudo ou nada);
+  - migrações com CREATE/DROP INDEX CONCURRENTLY rodam fora de transação, com
+    os índices de tabelas diferentes construídos em paralelo (um build por
+    tabela por vez: builds concorrentes na mesma tabela se bloqueiam).
+Cada migração aplicada é registrada com o SHA-256 do conteúdo, então
+reexecuções são no-ops e uma migração alterada depois de aplicada interrompe
+a execução. Um advisory lock impede dois executores no mesmo banco.
+"""
+
+import argparse
+import hashlib
+import logging
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+
+import db_session
+
+# Migrações do pipeline de personas (criar_tabelas_pipeline.py)
+DEFAULT_MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "02_PROCESSAMENTO_PERSONAS" / "migrations"
+
+DEFAULT_WORKERS = 4
+
+COMMANDS = ("migrate", "status")
+
+LOCK_NAME = "vcm_schema_migrations"
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        duration_ms INTEGER,
+        applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    )
+"""
+
+RECORD_SQL = "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)"
+
+# Índice inválido deixado por um CREATE INDEX CONCURRENTLY interrompido
+INVALID_INDEX_SQL = "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)"
+
+INDEX_TABLE_SQL = "SELECT indrelid::regclass::text FROM pg_index WHERE indexrelid = to_regclass(%s)"
+
+FILE_RE = re.compile(r"^(?P<version>\d+)_(?P<name>\w+)\.sql$")
+COMMENT_RE = re.compile(r"--[^\n]*")
+CONCURRENT_RE = re.compile(
+    r"^(?P<action>CREATE|DROP)\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?"
+    r"(?P<index>[\w.\"]+)(?:\s+ON\s+(?:ONLY\s+)?(?P<table>[\w.\"]+))?",
+    re.I
+)
+
+
+class Migration:
+    """Um arquivo de migração; statements só é preenchido nas migrações CONCURRENTLY"""
+
+    __slots__ = ("version", "name", "path", "sql", "checksum", "statements")
+
+    def __init__(self, path: Path):
+        match = FILE_RE.match(path.name)
+        if not match:
+            raise ValueError(f"Nome de migração inválido (esperado NNNN_nome.sql): {path.name}")
+        self.version = match.group('version')
+        self.name = match.group('name')
+        self.path = path
+        self.sql = path.read_text(encoding='utf-8')
+        self.checksum = hashlib.sha256(self.sql.replace('\r\n', '\n').encode('utf-8')).hexdigest()
+        self.statements: List[str] = []
+
+        code = COMMENT_RE.sub('', self.sql)
+        if re.search(r"\bCONCURRENTLY\b", code, re.I):
+            statements = [statement.strip() for statement in code.split(';') if statement.strip()]
+            for statement in statements:
+                if not CONCURRENT_RE.match(statement):
+                    raise ValueError(f"{path.name}: migração com CONCURRENTLY só pode conter "
+                                     f"CREATE/DROP INDEX CONCURRENTLY (mova o restante para outra migração)")
+            self.statements = statements
+
+    @property
+    def concurrent(self) -> bool:
+        return bool(self.statements)
+
+
+def load_migrations(directory: Path) -> List[Migration]:
+    """Migrações do diretório em ordem de versão"""
+    migrations = sorted((Migration(path) for path in Path(directory).glob("*.sql")),
+                        key=lambda migration: int(migration.version))
+    versions = [migration.version for migration in migrations]
+    duplicated = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicated:
+        raise ValueError(f"Versões de migração repetidas: {', '.join(duplicated)}")
+    return migrations
+
+
+class MigrationRunner:
+    """Aplica as migrações pendentes de um diretório, registrando-as em schema_migrations"""
+
+    def __init__(self, directory: Path = DEFAULT_MIGRATIONS_DIR,
+                 connection_factory: Optional[Callable[[], Any]] = None, workers: int = DEFAULT_WORKERS):
+        self.directory = Path(directory)
+        self.connection_factory = connection_factory or (lambda: psycopg2.connect(db_session.get_database_url()))
+        self.workers = max(1, workers)
+
+    def applied(self, connection) -> Dict[str, Tuple[str, str]]:
+        """version -> (name, checksum) das migrações já registradas"""
+        with connection.cursor() as cursor:
+            cursor.execute(MIGRATIONS_TABLE_SQL)
+            cursor.execute("SELECT version, name, checksum FROM schema_migrations")
+            rows = cursor.fetchall()
+        connection.commit()
+        return {version: (name, checksum) for version, name, checksum in rows}
+
+    def status(self) -> List[Dict[str, str]]:
+        """Estado de cada migração do diretório: applied, pending ou changed"""
+        connection = self.connection_factory()
+        try:
+            applied = self.applied(connection)
+        finally:
+            connection.close()
+        report = []
+        for migration in load_migrations(self.directory):
+            recorded = applied.get(migration.version)
+            if recorded is None:
+                state = "pending"
+            else:
+                state = "applied" if recorded[1] == migration.checksum else "changed"
+            report.append({"version": migration.version, "name": migration.name, "state": state})
+        return report
+
+    def pending(self, applied: Dict[str, Tuple[str, str]]) -> List[Migration]:
+        """Migrações ainda não aplicadas; falha se alguma já aplicada foi alterada"""
+        pending = []
+        for migration in load_migrations(self.directory):
+            recorded = applied.get(migration.version)
+            if recorded is None:
+                pending.append(migration)
+            elif recorded[1] != migration.checksum:
+                raise ValueError(f"Migração {migration.version}_{migration.name} foi alterada depois de aplicada "
+                                 f"(checksum {recorded[1][:12]} → {migration.checksum[:12]}); crie uma nova migração")
+        return pending
+
+    def migrate(self) -> List[Dict[str, Any]]:
+        """Aplica as migrações pendentes; retorna versão, nome e duração de cada uma"""
+        connection = self.connection_factory()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (LOCK_NAME,))
+                if not cursor.fetchone()[0]:
+                    logging.info("Aguardando outro executor de migrações terminar...")
+                    cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (LOCK_NAME,))
+            connection.commit()
+            # Só lido depois do lock: outro executor pode ter acabado de aplicar migrações
+            pending = self.pending(self.applied(connection))
+
+            # Fases: migrações consecutivas do mesmo tipo são aplicadas juntas
+            phases: List[List[Migration]] = []
+            for migration in pending:
+                if phases and phases[-1][0].concurrent == migration.concurrent:
+                    phases[-1].append(migration)
+                else:
+                    phases.append([migration])
+
+            results = []
+            for phase in phases:
+                if phase[0].concurrent:
+                    results.extend(self._apply_concurrent(connection, phase))
+                else:
+                    results.extend(self._apply_transaction(connection, phase))
+            return results
+        finally:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (LOCK_NAME,))
+                connection.commit()
+            finally:
+                connection.close()
+
+    def _apply_transaction(self, connection, migrations: List[Migration]) -> List[Dict[str, Any]]:
+        """Aplica e registra as migrações em uma única transação"""
+        results = []
+        try:
+            with connection.cursor() as cursor:
+                for migration in migrations:
+                    started = time.perf_counter()
+                    cursor.execute(migration.sql)
+                    duration_ms = int((time.perf_counter() - started) * 1000)
+                    cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum, duration_ms))
+                    results.append({"version": migration.version, "name": migration.name,
+                                    "duration_ms": duration_ms})
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        logging.info("%d migrações aplicadas em uma transação", len(migrations))
+        return results
+
+    def _apply_concurrent(self, connection, migrations: List[Migration]) -> List[Dict[str, Any]]:
+        """Constrói os índices em paralelo por tabela e registra as migrações quando todos terminam"""
+        groups: Dict[str, List[str]] = {}
+        with connection.cursor() as cursor:
+            for migration in migrations:
+                for statement in migration.statements:
+                    match = CONCURRENT_RE.match(statement)
+                    table = match.group('table')
+                    if match.group('action').upper() == 'CREATE' and not table:
+                        raise ValueError(f"{migration.path.name}: CREATE INDEX CONCURRENTLY sem tabela")
+                    if not table:
+                        cursor.execute(INDEX_TABLE_SQL, (match.group('index'),))
+                        row = cursor.fetchone()
+                        table = row[0] if row else match.group('index')
+                    groups.setdefault(table.strip('"').split('.')[-1], []).append(statement)
+        connection.commit()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(groups))) as executor:
+            futures = [executor.submit(self._build_indexes, statements) for statements in groups.values()]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        logging.info("%d índices construídos em %d tabelas em %d ms",
+                     sum(len(statements) for statements in groups.values()), len(groups), duration_ms)
+
+        try:
+            with connection.cursor() as cursor:
+                for migration in migrations:
+                    cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum, duration_ms))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return [{"version": migration.version, "name": migration.name, "duration_ms": duration_ms}
+                for migration in migrations]
+
+    def _build_indexes(self, statements: List[str]) -> None:
+        """Executa em ordem os builds de uma tabela, em conexão própria e fora de transação"""
+        connection = self.connection_factory()
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    match = CONCURRENT_RE.match(statement)
+                    creating = match.group('action').upper() == 'CREATE'
+                    if creating:
+                        self._drop_invalid(cursor, match.group('index'))
+                    try:
+                        cursor.execute(statement)
+                    except Exception:
+                        if creating:
+                            self._drop_invalid(cursor, match.group('index'))
+                        raise
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _drop_invalid(cursor, index: str) -> None:
+        """Remove o índice inválido de um build interrompido (IF NOT EXISTS o manteria para sempre)"""
+        cursor.execute(INVALID_INDEX_SQL, (index,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            logging.warning("Removendo índice inválido %s de um build anterior", index)
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+
+def main():
+    """Aplica ou lista as migrações de um diretório"""
+    parser = argparse.ArgumentParser(description="Executor de migrações SQL com checksum e índices concorrentes")
+    parser.add_argument('command', nargs='?', choices=COMMANDS, default="migrate",
+                        help="migrate (padrão) ou status")
+    parser.add_argument('--dir', type=Path, default=DEFAULT_MIGRATIONS_DIR, help="Diretório das migrações")
+    parser.add_argument('--dsn', default=None, help="Postgres de destino (padrão: VCM_DATABASE_URL)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Tabelas com índices construídos em paralelo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    dsn = args.dsn or db_session.get_database_url()
+    runner = MigrationRunner(args.dir, lambda: psycopg2.connect(dsn), args.workers)
+    try:
+        if args.command == "status":
+            icons = {"applied": "✅", "pending": "⏳", "changed": "❌"}
+            for migration in runner.status():
+                print(f"{icons[migration['state']]} {migration['version']}_{migration['name']}: {migration['state']}")
+            return
+        results = runner.migrate()
+    except Exception as e:
+        print(f"❌ Erro nas migrações: {str(e)}")
+        sys.exit(1)
+
+    for result in results:
+        print(f"✅ {result['version']}_{result['name']} aplicada ({result['duration_ms']} ms)")
+    if not results:
+        print("✅ Nenhuma migração pendente")
+
+
+if __name__ == "__main__":
+    main()
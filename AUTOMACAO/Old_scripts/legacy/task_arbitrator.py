@@ -3,24 +3,89 @@
 Sistema de Arbitragem Inteligente de Tarefas VCM
 Este script arbitra tarefas para personas baseado em suas posições,
 competências e integrações com sub-sistemas.
+
+A importação é leve: o logging só é configurado por main() (configure_logging)
+e numpy, o motor de vencimentos e os módulos de exportação/planejamento são
+importados no primeiro uso.
 """
 
+import argparse
+import gzip
+import hashlib
 import json
+import os
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from collections import deque
+from datetime import date, datetime, timedelta
+from functools import cached_property
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, Optional, Iterable, Iterator, Tuple
 from pathlib import Path
 import logging
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('task_arbitration.log'),
-        logging.StreamHandler()
-    ]
-)
+from arbitration_tracing import (TRACE_FORMATS, configure_tracing, get_tracer, init_worker_logging,
+                                 init_worker_tracing, start_queue_logging, start_worker_log_listener,
+                                 start_worker_span_listener)
+from cargo_matcher import CargoMatcher
+from compact_tasks import FREQUENCIES, PersonaHeader, TaskBatch
+from task_identity import copy_with_ids, occurrence_stamp, persona_seed, persona_task_ids, stamp_entries, template_keys
+
+if TYPE_CHECKING:
+    from due_date_engine import BusinessCalendar
+    from template_registry import TemplateRegistry
+
+# Arquivo de log padrão da linha de comando (relativo ao diretório atual)
+DEFAULT_LOG_FILE = 'task_arbitration.log'
+
+# Spans por etapa da arbitragem (desligado até configure_tracing)
+_tracer = get_tracer()
+
+# Tamanho padrão dos lotes de personas enviados a cada processo no modo paralelo
+DEFAULT_CHUNK_SIZE = 200
+
+# Plano de uma posição sem templates: nenhuma tarefa e totais zerados
+EMPTY_POSITION_PLAN = (((), (), ()), {"daily_minutes": 0, "weekly_minutes": 0, "monthly_minutes": 0})
+
+# Formato do estado da arbitragem incremental (tarefas por identidade de template)
+INCREMENTAL_STATE_FORMAT = 2
+
+# Instância do arbitrador em cada processo do pool (definida por _init_worker)
+_WORKER_ARBITRATOR = None
+
+
+def configure_logging(log_file: Optional[str] = DEFAULT_LOG_FILE, level: int = logging.INFO) -> None:
+    """
+    Configura o logging da linha de comando (console e, se informado, arquivo).
+    Os handlers rodam em uma thread própria, atrás de uma fila.
+    """
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
+    start_queue_logging(handlers, level)
+
+
+def _init_worker(arbitrator: 'TaskArbitrator', log_queue=None, log_level: Optional[int] = None,
+                 span_queue=None, sample_rate: float = 0.0) -> None:
+    """Inicializa o processo do pool com uma cópia do arbitrador (e o logging e os spans ligados ao processo principal)"""
+    global _WORKER_ARBITRATOR
+    _WORKER_ARBITRATOR = arbitrator
+    if log_queue is not None:
+        init_worker_logging(log_queue, log_level)
+    if span_queue is not None:
+        init_worker_tracing(span_queue, sample_rate)
+
+
+def _arbitrate_chunk(personas: List[Dict[str, Any]], reference_date: datetime,
+                     horizon: Optional[Tuple[date, date]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Arbitra um lote de personas dentro de um processo do pool"""
+    summary = TaskArbitrator.new_summary()
+    results = []
+    for persona in personas:
+        persona_tasks = _WORKER_ARBITRATOR.arbitrate_persona(persona, reference_date, horizon)
+        TaskArbitrator.accumulate_summary(summary, persona_tasks)
+        results.append(persona_tasks)
+    return results, summary
+
 
 class TaskArbitrator:
     """
@@ -28,14 +93,71 @@ class TaskArbitrator:
     baseado em suas funções, competências e integrações com sub-sistemas.
     """
     
-    def __init__(self):
+    def __init__(self, task_templates: Optional[Dict[str, Any]] = None):
         self.base_path = Path(__file__).parent
-        self.personas_competencias = self.load_personas_config()
-        self.subsistemas = self.load_subsistemas_config()
-        self.task_templates = self.load_task_templates()
+        if task_templates is not None:
+            self.task_templates = task_templates
+        self._run_prototypes_cache: Dict[Tuple[datetime, Any], Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]], Dict[str, Tuple[Any, ...]], str]] = {}
+        self._horizon_cache: Dict[Tuple[date, date, Any], Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]], Dict[Tuple[str, str], int]]] = {}
+        # Última execução consultada: (reference_date, calendário, execução de get_run)
+        self._last_run: Optional[Tuple[datetime, Any, Tuple[Any, ...]]] = None
         
         logging.info("TaskArbitrator iniciado com sucesso")
     
+    # Tabelas do arbitrador, montadas no primeiro acesso
+    
+    @cached_property
+    def personas_competencias(self) -> Dict[str, Any]:
+        return self.load_personas_config()
+    
+    @cached_property
+    def subsistemas(self) -> Dict[str, Any]:
+        return self.load_subsistemas_config()
+    
+    @cached_property
+    def task_templates(self) -> Dict[str, Any]:
+        return self.load_task_templates()
+    
+    @cached_property
+    def subsystem_integrations(self) -> Dict[str, Dict[str, List[str]]]:
+        return self.load_subsystem_integrations()
+    
+    @cached_property
+    def calendars(self) -> Dict[str, 'BusinessCalendar']:
+        return self.load_empresa_calendars()
+    
+    @cached_property
+    def cargo_matcher(self) -> CargoMatcher:
+        return CargoMatcher(self.task_templates)
+    
+    @cached_property
+    def template_index(self) -> Dict[Tuple[str, str], Tuple[Tuple[str, str, MappingProxyType], ...]]:
+        return self.compile_task_templates(self.task_templates)
+    
+    @cached_property
+    def template_minutes(self) -> Dict[Tuple[str, str], int]:
+        return {
+            key: sum(prototype.get('estimated_duration', 0) for _, _, prototype in prototypes)
+            for key, prototypes in self.template_index.items()
+        }
+    
+    @cached_property
+    def templates_version(self) -> str:
+        return self.compute_templates_version()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Remove o índice compilado (não serializável) ao enviar para outros processos"""
+        state = self.__dict__.copy()
+        state.pop('template_index', None)
+        state['_run_prototypes_cache'] = {}
+        state['_horizon_cache'] = {}
+        state['_last_run'] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """O índice de templates é recompilado no primeiro uso"""
+        self.__dict__.update(state)
+    
     def load_personas_config(self) -> Dict[str, Any]:
         """Carrega configurações das personas"""
         try:
@@ -50,6 +172,28 @@ class TaskArbitrator:
             logging.error(f"Erro ao carregar personas_config.json: {e}")
             return self.get_default_personas_config()
     
+    def load_empresa_calendars(self) -> Dict[str, 'BusinessCalendar']:
+        """
+        Carrega os calendários de dias úteis por empresa (fuso, feriados, weekmask)
+        de AUTOMACAO/empresa_calendars.json; a chave "default" vale para as demais.
+        """
+        from due_date_engine import BusinessCalendar
+        
+        calendars = {"default": BusinessCalendar()}
+        try:
+            config_path = self.base_path / "AUTOMACAO" / "empresa_calendars.json"
+            if config_path.exists():
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    for empresa_id, config in json.load(f).items():
+                        calendars[empresa_id] = BusinessCalendar.from_config(config)
+        except Exception as e:
+            logging.error(f"Erro ao carregar empresa_calendars.json: {e}")
+        return calendars
+    
+    def calendar_for(self, empresa_id: Optional[str]) -> 'BusinessCalendar':
+        """Calendário da empresa (ou o padrão)"""
+        return self.calendars.get(empresa_id) or self.calendars["default"]
+    
     def load_subsistemas_config(self) -> Dict[str, Any]:
         """Carrega configurações dos sub-sistemas"""
         return {
@@ -67,6 +211,25 @@ class TaskArbitrator:
             "BI": ["bi_dashboards", "bi_data_models", "bi_reports"]
         }
     
+    @classmethod
+    def from_registry(cls, registry: Optional['TemplateRegistry'] = None, offline: bool = False) -> 'TaskArbitrator':
+        """
+        Cria o arbitrador com os templates da tabela task_templates (via cache local).
+        Se nem o banco nem o cache estiverem disponíveis, usa os templates embutidos.
+        """
+        from template_registry import TemplateRegistry
+        
+        registry = registry or TemplateRegistry()
+        try:
+            task_templates = registry.load(offline=offline)
+        except Exception as e:
+            logging.error(f"Erro ao carregar templates do registro: {e}")
+            task_templates = None
+        if not task_templates:
+            logging.warning("Nenhum template no registro; usando os templates embutidos")
+            task_templates = None
+        return cls(task_templates=task_templates)
+    
     def load_task_templates(self) -> Dict[str, Any]:
         """Carrega templates de tarefas por posição"""
         return {
@@ -295,6 +458,190 @@ class TaskArbitrator:
             }
         }
     
+    @staticmethod
+    def compile_task_templates(task_templates: Dict[str, Any]) -> Dict[Tuple[str, str], Tuple[Tuple[str, str, MappingProxyType], ...]]:
+        """
+        Compila os templates em protótipos imutáveis indexados por (cargo, frequência).
+        
+        Cada protótipo já contém todos os campos da tarefa na ordem final; na
+        arbitragem basta copiá-lo e carimbar id, datas e metadados. Cada entrada
+        é (prefixo do id, identidade do template, protótipo).
+        """
+        index = {}
+        for position, frequencies in task_templates.items():
+            id_prefix_position = position.lower().replace(' ', '_')
+            for frequency, templates in frequencies.items():
+                id_prefix = f"{frequency}_{id_prefix_position}_"
+                prototypes = []
+                for template, template_key in zip(templates, template_keys(position, frequency, templates)):
+                    prototype = {
+                        "id": None,
+                        "title": template.get('title'),
+                        "description": template.get('description'),
+                        "task_type": frequency,
+                        "priority": template.get('priority', 'MEDIUM'),
+                        "status": "pending",
+                        "estimated_duration": template.get('estimated_duration', 60),
+                        "required_subsystems": template.get('required_subsystems', []),
+                        "inputs_from": template.get('inputs_from', []),
+                        "outputs_to": template.get('outputs_to', []),
+                        "dependencies": template.get('dependencies', []),
+                        "due_date": None,
+                        "created_at": None,
+                        "metadata": MappingProxyType({
+                            "arbitrated_by": "TaskArbitrator",
+                            "template_based": True,
+                            "frequency": frequency,
+                            "position": position
+                        })
+                    }
+                    
+                    # Adicionar campos específicos da frequência
+                    if frequency == 'weekly':
+                        prototype['day_of_week'] = template.get('day_of_week')
+                    elif frequency == 'monthly':
+                        prototype['week_of_month'] = template.get('week_of_month')
+                    
+                    prototypes.append((id_prefix, template_key, MappingProxyType(prototype)))
+                index[(position, frequency)] = tuple(prototypes)
+        return index
+    
+    def get_run_prototypes(self, reference_date: datetime, calendar: Optional['BusinessCalendar'] = None) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+        """
+        Retorna os protótipos já carimbados (vencimento, created_at) para a
+        data de referência e o calendário da empresa. Os vencimentos de todos os
+        protótipos são calculados em um único lote, uma vez por execução.
+        
+        O campo id dos protótipos carimbados guarda o carimbo da ocorrência
+        (task_identity.occurrence_stamp); o ID final depende da persona e é
+        gerado ao copiar a tarefa (persona_task_ids ou copy_with_ids).
+        """
+        return self.get_run(reference_date, calendar or self.calendars["default"])[0]
+    
+    def get_run(self, reference_date: datetime, calendar: 'BusinessCalendar'
+                ) -> Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]], Dict[str, Tuple[Any, ...]], str]:
+        """
+        Execução de (reference_date, calendário): protótipos carimbados, plano
+        por posição e created_at (reference_date no fuso do calendário, como os
+        vencimentos) em ISO 8601. O plano de uma posição traz
+        as entradas de task_identity.stamp_entries (diárias, semanais, mensais)
+        e o total_estimated_time, prontos para cada persona do cargo.
+        
+        A última execução consultada é reaproveitada sem montar a chave do
+        cache, pois as personas de uma execução compartilham os objetos
+        reference_date e calendário.
+        """
+        last = self._last_run
+        if last is not None and last[0] is reference_date and last[1] is calendar:
+            return last[2]
+        
+        cache_key = (reference_date, calendar.key)
+        run = self._run_prototypes_cache.get(cache_key)
+        if run is None:
+            from due_date_engine import DueDateEngine
+            
+            if len(self._run_prototypes_cache) >= 64:
+                self._run_prototypes_cache.clear()
+            created_at = calendar.local_moment(reference_date).isoformat()
+            
+            entries = [
+                (key, id_prefix, template_key, prototype)
+                for key, prototypes in self.template_index.items()
+                for id_prefix, template_key, prototype in prototypes
+            ]
+            with _tracer.span("due_dates", prototypes=len(entries)):
+                due_dates = DueDateEngine(calendar).compute(
+                    [prototype['task_type'] for _, _, _, prototype in entries],
+                    reference_date,
+                    days_of_week=[prototype.get('day_of_week') for _, _, _, prototype in entries],
+                    weeks_of_month=[prototype.get('week_of_month') for _, _, _, prototype in entries]
+                )
+            
+            stamped = {key: [] for key in self.template_index}
+            for (key, id_prefix, template_key, prototype), due_date in zip(entries, due_dates):
+                task = dict(prototype)
+                task['id'] = occurrence_stamp(id_prefix, due_date[:10].replace('-', ''), template_key)
+                task['due_date'] = due_date
+                task['created_at'] = created_at
+                task['metadata'] = dict(prototype['metadata'])
+                stamped[key].append(task)
+            plans = {
+                position: (
+                    tuple(stamp_entries(stamped.get((position, frequency), ())) for frequency in ('daily', 'weekly', 'monthly')),
+                    {f"{frequency}_minutes": self.template_minutes.get((position, frequency), 0)
+                     for frequency in ('daily', 'weekly', 'monthly')}
+                )
+                for position in {position for position, _ in stamped}
+            }
+            run = (stamped, plans, created_at)
+            self._run_prototypes_cache[cache_key] = run
+        self._last_run = (reference_date, calendar, run)
+        return run
+    
+    def get_horizon_prototypes(self, start_date: date, end_date: date, calendar: Optional['BusinessCalendar'] = None
+                               ) -> Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]], Dict[Tuple[str, str], int]]:
+        """
+        Expande a recorrência de todos os protótipos no intervalo [start_date, end_date].
+        
+        Cada template é expandido uma única vez por calendário (dias úteis,
+        semanas e meses do intervalo); as tarefas de cada (cargo, frequência)
+        vêm ordenadas por vencimento. Retorna (tarefas, minutos totais) por chave.
+        """
+        import numpy as np
+        from due_date_engine import DueDateEngine
+        
+        calendar = calendar or self.calendars["default"]
+        cache_key = (start_date, end_date, calendar.key)
+        cached = self._horizon_cache.get(cache_key)
+        if cached is None:
+            if len(self._horizon_cache) >= 16:
+                self._horizon_cache.clear()
+            with _tracer.span("due_dates", horizon_days=(end_date - start_date).days + 1):
+                engine = DueDateEngine(calendar)
+                occurrence_hours = np.zeros(1, dtype='int64')
+            
+                stamped = {}
+                minutes = {}
+                for key, prototypes in self.template_index.items():
+                    frequency = key[1]
+                    entries = []
+                    for number, (id_prefix, template_key, prototype) in enumerate(prototypes, 1):
+                        window_starts, due_days = engine.occurrences(
+                            frequency, start_date, end_date,
+                            prototype.get('day_of_week'), prototype.get('week_of_month')
+                        )
+                        if not len(due_days):
+                            continue
+                        due_dates = engine.format_due_dates(due_days, [frequency] * len(due_days))
+                        created_ats = engine.format_moments(window_starts, occurrence_hours)
+                        day_strs = np.datetime_as_string(due_days).tolist()
+                        for day_str, due_date, created_at in zip(day_strs, due_dates, created_ats):
+                            entries.append((day_str, number, id_prefix, template_key, prototype, due_date, created_at))
+                
+                    entries.sort(key=lambda entry: (entry[0], entry[1]))
+                    tasks = []
+                    for day_str, _, id_prefix, template_key, prototype, due_date, created_at in entries:
+                        task = dict(prototype)
+                        task['id'] = occurrence_stamp(id_prefix, day_str.replace('-', ''), template_key)
+                        task['due_date'] = due_date
+                        task['created_at'] = created_at
+                        task['metadata'] = dict(prototype['metadata'])
+                        tasks.append(task)
+                    stamped[key] = tasks
+                    minutes[key] = sum(task['estimated_duration'] for task in tasks)
+            
+            cached = (stamped, minutes)
+            self._horizon_cache[cache_key] = cached
+        return cached
+    
+    def compute_templates_version(self) -> str:
+        """Hash do conteúdo dos templates e integrações (muda quando eles mudam)"""
+        content = json.dumps(
+            {"templates": self.task_templates, "integrations": self.subsystem_integrations},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    
     def get_default_personas_config(self) -> Dict[str, Any]:
         """Retorna configuração padrão das personas"""
         return {
@@ -307,121 +654,197 @@ class TaskArbitrator:
             ]
         }
     
-    def arbitrate_tasks_for_persona(self, persona_data: Dict[str, Any]) -> Dict[str, Any]:
+    def arbitrate_tasks_for_persona(self, persona_data: Dict[str, Any], reference_date: Optional[datetime] = None) -> Dict[str, Any]:
         """
         Arbitra tarefas para uma persona específica baseado em:
         1. Posição na empresa
         2. Competências técnicas e comportamentais  
         3. Integração com sub-sistemas
+
+        reference_date fixa o instante da arbitragem (padrão: agora), permitindo
+        que várias personas de uma mesma execução compartilhem datas e IDs.
         """
         try:
-            persona_id = persona_data.get('id', str(uuid.uuid4()))
+            if reference_date is None:
+                reference_date = datetime.now()
+            if 'id' not in persona_data:
+                # O ID gerado também identifica as tarefas da persona
+                persona_data = dict(persona_data, id=str(uuid.uuid4()))
+            persona_id = persona_data['id']
             persona_name = persona_data.get('nome', 'Unknown')
             position = persona_data.get('cargo', 'Unknown')
-            
-            logging.info(f"Arbitrando tarefas para {persona_name} ({position})")
-            
-            # Gerar tarefas por frequência
-            daily_tasks = self.generate_tasks_by_frequency(persona_data, 'daily')
-            weekly_tasks = self.generate_tasks_by_frequency(persona_data, 'weekly') 
-            monthly_tasks = self.generate_tasks_by_frequency(persona_data, 'monthly')
-            
-            result = {
-                "persona_id": persona_id,
-                "persona_name": persona_name,
-                "position": position,
-                "arbitration_timestamp": datetime.now().isoformat(),
-                "daily_tasks": daily_tasks,
-                "weekly_tasks": weekly_tasks,
-                "monthly_tasks": monthly_tasks,
-                "subsystem_integrations": self.map_subsystem_integrations(persona_data),
-                "total_estimated_time": {
-                    "daily_minutes": sum(task.get('estimated_duration', 0) for task in daily_tasks),
-                    "weekly_minutes": sum(task.get('estimated_duration', 0) for task in weekly_tasks),
-                    "monthly_minutes": sum(task.get('estimated_duration', 0) for task in monthly_tasks)
-                }
-            }
-            
-            logging.info(f"Tarefas arbitradas com sucesso para {persona_name}: {len(daily_tasks)} diárias, {len(weekly_tasks)} semanais, {len(monthly_tasks)} mensais")
-            
-            return result
-            
         except Exception as e:
             logging.error(f"Erro ao arbitrar tarefas para persona: {e}")
             return {"error": str(e)}
+        
+        with _tracer.span("arbitrate_persona", persona_id=persona_id, position=position) as span:
+            try:
+                span.stage("template_lookup")
+                template_position, confidence = self.resolve_position(position)
+                
+                # Gerar tarefas por frequência: execução, calendário e semente dos IDs resolvidos uma vez por persona
+                span.stage("task_generation")
+                _, plans, arbitration_timestamp = self.get_run(reference_date, self.calendar_for(persona_data.get('empresa_id')))
+                (daily, weekly, monthly), minutes = plans.get(template_position, EMPTY_POSITION_PLAN)
+                seed = persona_seed(persona_id)
+                daily_tasks = copy_with_ids(seed, daily)
+                weekly_tasks = copy_with_ids(seed, weekly)
+                monthly_tasks = copy_with_ids(seed, monthly)
+                
+                span.stage("integration_mapping")
+                subsystem_integrations = self.integrations_for(template_position)
+                span.stage(None)
+                
+                result = {
+                    "persona_id": persona_id,
+                    "persona_name": persona_name,
+                    "position": position,
+                    "arbitration_timestamp": arbitration_timestamp,
+                    "daily_tasks": daily_tasks,
+                    "weekly_tasks": weekly_tasks,
+                    "monthly_tasks": monthly_tasks,
+                    "subsystem_integrations": subsystem_integrations,
+                    "total_estimated_time": dict(minutes)
+                }
+                if confidence is not None:
+                    result["template_match"] = {"template_position": template_position, "confidence": confidence}
+                
+                span.set_attribute("template_position", template_position)
+                span.set_attribute("task_count", len(daily_tasks) + len(weekly_tasks) + len(monthly_tasks))
+                return result
+                
+            except Exception as e:
+                span.record_error(e)
+                logging.error(f"Erro ao arbitrar tarefas para persona: {e}")
+                return {"error": str(e)}
+    
+    def arbitrate_horizon_for_persona(self, persona_data: Dict[str, Any], start_date: date, end_date: date,
+                                      reference_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Gera todas as ocorrências diárias, semanais e mensais de uma persona
+        entre start_date e end_date (inclusive), em uma única passada.
+        
+        As tarefas são copiadas da expansão pré-calculada do calendário da
+        empresa, sem chamar generate_tasks_by_frequency dia a dia.
+        """
+        try:
+            if reference_date is None:
+                reference_date = datetime.now()
+            persona_id = persona_data['id'] if 'id' in persona_data else str(uuid.uuid4())
+            persona_name = persona_data.get('nome', 'Unknown')
+            position = persona_data.get('cargo', 'Unknown')
+        except Exception as e:
+            logging.error(f"Erro ao arbitrar horizonte para persona: {e}")
+            return {"error": str(e)}
+        
+        with _tracer.span("arbitrate_persona", persona_id=persona_id, position=position,
+                          horizon=f"{start_date.isoformat()}/{end_date.isoformat()}") as span:
+            try:
+                span.stage("template_lookup")
+                template_position, confidence = self.resolve_position(position)
+                
+                span.stage("task_generation")
+                calendar = self.calendar_for(persona_data.get('empresa_id'))
+                stamped, minutes = self.get_horizon_prototypes(start_date, end_date, calendar)
+                task_id = persona_task_ids(persona_id)
+                tasks_by_frequency = {
+                    frequency: self.copy_prototypes(stamped.get((template_position, frequency), ()), task_id)
+                    for frequency in ('daily', 'weekly', 'monthly')
+                }
+                
+                span.stage("integration_mapping")
+                subsystem_integrations = self.integrations_for(template_position)
+                span.stage(None)
+                
+                result = {
+                    "persona_id": persona_id,
+                    "persona_name": persona_name,
+                    "position": position,
+                    "arbitration_timestamp": calendar.local_moment(reference_date).isoformat(),
+                    "horizon_start": start_date.isoformat(),
+                    "horizon_end": end_date.isoformat(),
+                    "daily_tasks": tasks_by_frequency['daily'],
+                    "weekly_tasks": tasks_by_frequency['weekly'],
+                    "monthly_tasks": tasks_by_frequency['monthly'],
+                    "subsystem_integrations": subsystem_integrations,
+                    "total_estimated_time": {
+                        "daily_minutes": minutes.get((template_position, 'daily'), 0),
+                        "weekly_minutes": minutes.get((template_position, 'weekly'), 0),
+                        "monthly_minutes": minutes.get((template_position, 'monthly'), 0)
+                    }
+                }
+                if confidence is not None:
+                    result["template_match"] = {"template_position": template_position, "confidence": confidence}
+                
+                span.set_attribute("template_position", template_position)
+                span.set_attribute("task_count", sum(len(tasks) for tasks in tasks_by_frequency.values()))
+                return result
+                
+            except Exception as e:
+                span.record_error(e)
+                logging.error(f"Erro ao arbitrar horizonte para persona: {e}")
+                return {"error": str(e)}
+    
+    def arbitrate_persona(self, persona_data: Dict[str, Any], reference_date: datetime,
+                          horizon: Optional[Tuple[date, date]] = None) -> Dict[str, Any]:
+        """Arbitra uma persona para a data de referência ou, se informado, para o horizonte (início, fim)"""
+        if horizon is None:
+            return self.arbitrate_tasks_for_persona(persona_data, reference_date)
+        return self.arbitrate_horizon_for_persona(persona_data, horizon[0], horizon[1], reference_date)
     
-    def generate_tasks_by_frequency(self, persona_data: Dict[str, Any], frequency: str) -> List[Dict[str, Any]]:
+    def resolve_position(self, cargo: str) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Posição de template para o cargo da persona.
+        Retorna (cargo, None) quando o cargo é uma posição de template; caso
+        contrário, a melhor correspondência aproximada e sua confiança
+        (posição None quando nenhuma atinge a confiança mínima).
+        """
+        if cargo in self.task_templates:
+            return cargo, None
+        return self.cargo_matcher.match(cargo)
+    
+    def generate_tasks_by_frequency(self, persona_data: Dict[str, Any], frequency: str, reference_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """Gera tarefas baseadas na frequência (daily, weekly, monthly)"""
-        position = persona_data.get('cargo', 'Unknown')
-        tasks = []
+        position = self.resolve_position(persona_data.get('cargo', 'Unknown'))[0]
         
-        # Buscar templates da posição
-        position_templates = self.task_templates.get(position, {})
-        frequency_templates = position_templates.get(frequency, [])
-        
-        current_date = datetime.now()
-        
-        for template in frequency_templates:
-            task = {
-                "id": f"{frequency}_{position.lower().replace(' ', '_')}_{current_date.strftime('%Y%m%d')}_{len(tasks) + 1}",
-                "title": template.get('title'),
-                "description": template.get('description'),
-                "task_type": frequency,
-                "priority": template.get('priority', 'MEDIUM'),
-                "status": "pending",
-                "estimated_duration": template.get('estimated_duration', 60),
-                "required_subsystems": template.get('required_subsystems', []),
-                "inputs_from": template.get('inputs_from', []),
-                "outputs_to": template.get('outputs_to', []),
-                "dependencies": template.get('dependencies', []),
-                "due_date": self.calculate_due_date(frequency, current_date),
-                "created_at": current_date.isoformat(),
-                "metadata": {
-                    "arbitrated_by": "TaskArbitrator",
-                    "template_based": True,
-                    "frequency": frequency,
-                    "position": position
-                }
-            }
-            
-            # Adicionar campos específicos da frequência
-            if frequency == 'weekly':
-                task['day_of_week'] = template.get('day_of_week')
-            elif frequency == 'monthly':
-                task['week_of_month'] = template.get('week_of_month')
-            
-            tasks.append(task)
+        # Buscar protótipos compilados da posição
+        key = (position, frequency)
+        if key not in self.template_index:
+            return []
         
+        calendar = self.calendar_for(persona_data.get('empresa_id'))
+        return self.copy_prototypes(self.get_run_prototypes(reference_date or datetime.now(), calendar)[key],
+                                    persona_task_ids(persona_data.get('id')))
+    
+    @staticmethod
+    def copy_prototypes(prototypes: Iterable[Dict[str, Any]], task_id: Callable[[str], str]) -> List[Dict[str, Any]]:
+        """Copia os protótipos carimbados como tarefas da persona (task_id: carimbo -> ID)"""
+        tasks = []
+        for prototype in prototypes:
+            task = prototype.copy()
+            task['id'] = task_id(prototype['id'])
+            task['metadata'] = task['metadata'].copy()
+            tasks.append(task)
         return tasks
     
-    def calculate_due_date(self, frequency: str, base_date: datetime) -> str:
-        """Calcula data de vencimento baseada na frequência"""
-        if frequency == 'daily':
-            # Tarefas diárias vencem no mesmo dia às 18:00
-            due_date = base_date.replace(hour=18, minute=0, second=0, microsecond=0)
-        elif frequency == 'weekly':
-            # Tarefas semanais vencem no final da semana
-            days_until_friday = (4 - base_date.weekday()) % 7
-            due_date = base_date + timedelta(days=days_until_friday)
-            due_date = due_date.replace(hour=17, minute=0, second=0, microsecond=0)
-        elif frequency == 'monthly':
-            # Tarefas mensais vencem no final do mês
-            if base_date.month == 12:
-                due_date = base_date.replace(year=base_date.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                due_date = base_date.replace(month=base_date.month + 1, day=1) - timedelta(days=1)
-            due_date = due_date.replace(hour=17, minute=0, second=0, microsecond=0)
-        else:
-            due_date = base_date + timedelta(days=1)
+    def calculate_due_date(self, frequency: str, base_date: datetime, template: Optional[Dict[str, Any]] = None,
+                           calendar: Optional['BusinessCalendar'] = None) -> str:
+        """
+        Calcula a data de vencimento de uma única tarefa.
+        Para lotes, use DueDateEngine.compute (mesmas regras, vetorizado).
+        """
+        from due_date_engine import DueDateEngine
         
-        return due_date.isoformat()
+        template = template or {}
+        return DueDateEngine(calendar or self.calendars["default"]).compute(
+            [frequency], base_date,
+            days_of_week=[template.get('day_of_week')],
+            weeks_of_month=[template.get('week_of_month')]
+        )[0]
     
-    def map_subsystem_integrations(self, persona_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Mapeia integrações necessárias com sub-sistemas"""
-        position = persona_data.get('cargo', 'Unknown')
-        
-        # Mapeamento de integrações por posição
-        integrations_map = {
+    def load_subsystem_integrations(self) -> Dict[str, Dict[str, List[str]]]:
+        """Carrega o mapeamento de integrações com sub-sistemas por posição"""
+        return {
             "CEO": {
                 "primary": ["Analytics", "BI", "Financial"],
                 "secondary": ["HR", "CRM", "Marketing"],
@@ -458,47 +881,196 @@ class TaskArbitrator:
                 "critical_workflows": ["Pipeline management", "Sales coaching", "Revenue optimization"]
             }
         }
+    
+    def map_subsystem_integrations(self, persona_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Mapeia integrações necessárias com sub-sistemas"""
+        return self.integrations_for(self.resolve_position(persona_data.get('cargo', 'Unknown'))[0])
+    
+    def integrations_for(self, position: Optional[str]) -> Dict[str, Any]:
+        """Integrações com sub-sistemas da posição de template"""
+        integrations = self.subsystem_integrations.get(position)
+        if integrations is not None:
+            return dict(integrations)
         
-        return integrations_map.get(position, {
+        return {
             "primary": [],
             "secondary": [],
             "data_sources": [],
             "data_outputs": [],
             "critical_workflows": []
-        })
+        }
     
-    def arbitrate_all_personas(self, empresa_personas: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Arbitra tarefas para todas as personas de uma empresa"""
+    @staticmethod
+    def new_summary() -> Dict[str, int]:
+        """Cria os contadores zerados do sumário de arbitragem"""
+        return {
+            "total_daily_tasks": 0,
+            "total_weekly_tasks": 0,
+            "total_monthly_tasks": 0,
+            "total_estimated_daily_minutes": 0
+        }
+    
+    @staticmethod
+    def accumulate_summary(summary: Dict[str, int], persona_tasks: Dict[str, Any]) -> None:
+        """Soma o resultado de uma persona aos contadores do sumário"""
+        if 'daily_tasks' in persona_tasks:
+            summary["total_daily_tasks"] += len(persona_tasks["daily_tasks"])
+            summary["total_estimated_daily_minutes"] += persona_tasks.get("total_estimated_time", {}).get("daily_minutes", 0)
+        
+        if 'weekly_tasks' in persona_tasks:
+            summary["total_weekly_tasks"] += len(persona_tasks["weekly_tasks"])
+        
+        if 'monthly_tasks' in persona_tasks:
+            summary["total_monthly_tasks"] += len(persona_tasks["monthly_tasks"])
+    
+    @staticmethod
+    def merge_summary(summary: Dict[str, int], shard_summary: Dict[str, int]) -> None:
+        """Incorpora o sumário de um lote (shard) ao sumário geral"""
+        for key, value in shard_summary.items():
+            summary[key] = summary.get(key, 0) + value
+    
+    def iter_persona_results(self, empresa_personas: List[Dict[str, Any]], reference_date: datetime,
+                             parallel: bool = False, max_workers: Optional[int] = None,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             horizon: Optional[Tuple[date, date]] = None) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, int]]]:
+        """
+        Gera (resultados, sumário) por lote de personas, na ordem de entrada.
+        
+        No modo paralelo os lotes são distribuídos entre processos, mantendo no
+        máximo dois lotes por processo em andamento para limitar a memória.
+        Com horizon = (início, fim) cada persona recebe todas as ocorrências do intervalo.
+        """
+        chunk_size = max(1, chunk_size)
+        chunks = (empresa_personas[i:i + chunk_size] for i in range(0, len(empresa_personas), chunk_size))
+        
+        if not parallel or len(empresa_personas) <= chunk_size:
+            for chunk in chunks:
+                summary = self.new_summary()
+                results = []
+                for persona in chunk:
+                    persona_tasks = self.arbitrate_persona(persona, reference_date, horizon)
+                    self.accumulate_summary(summary, persona_tasks)
+                    results.append(persona_tasks)
+                yield results, summary
+            return
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        log_queue, log_listener = start_worker_log_listener()
+        span_queue, span_listener = start_worker_span_listener()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(self, log_queue, logging.getLogger().level,
+                                               span_queue, _tracer.sample_rate)) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(_arbitrate_chunk, chunk, reference_date, horizon))
+                    if len(pending) >= max_workers * 2:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+        finally:
+            # Os processos já terminaram: o stop esvazia cada fila antes de retornar
+            if log_listener is not None:
+                log_listener.stop()
+            if span_listener is not None:
+                span_listener.stop()
+    
+    def arbitrate_all_personas(self, empresa_personas: List[Dict[str, Any]], parallel: bool = False,
+                               max_workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               reference_date: Optional[datetime] = None,
+                               horizon: Optional[Tuple[date, date]] = None) -> Dict[str, Any]:
+        """
+        Arbitra tarefas para todas as personas de uma empresa
+        
+        Com parallel=True as personas são divididas em lotes de chunk_size e
+        processadas em um pool de processos; os sumários de cada lote são
+        combinados na ordem original, produzindo o mesmo resultado do modo serial.
+        Com horizon = (início, fim) são geradas todas as ocorrências do intervalo.
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        
         results = {
             "empresa_id": empresa_personas[0].get('empresa_id') if empresa_personas else None,
-            "arbitration_timestamp": datetime.now().isoformat(),
+            "arbitration_timestamp": reference_date.isoformat(),
             "total_personas": len(empresa_personas),
             "personas_tasks": [],
-            "summary": {
-                "total_daily_tasks": 0,
-                "total_weekly_tasks": 0,
-                "total_monthly_tasks": 0,
-                "total_estimated_daily_minutes": 0
-            }
+            "summary": self.new_summary()
         }
+        if horizon is not None:
+            results["horizon_start"] = horizon[0].isoformat()
+            results["horizon_end"] = horizon[1].isoformat()
         
-        for persona in empresa_personas:
-            persona_tasks = self.arbitrate_tasks_for_persona(persona)
-            results["personas_tasks"].append(persona_tasks)
-            
-            # Atualizar sumário
-            if 'daily_tasks' in persona_tasks:
-                results["summary"]["total_daily_tasks"] += len(persona_tasks["daily_tasks"])
-                results["summary"]["total_estimated_daily_minutes"] += persona_tasks.get("total_estimated_time", {}).get("daily_minutes", 0)
-            
-            if 'weekly_tasks' in persona_tasks:
-                results["summary"]["total_weekly_tasks"] += len(persona_tasks["weekly_tasks"])
-            
-            if 'monthly_tasks' in persona_tasks:
-                results["summary"]["total_monthly_tasks"] += len(persona_tasks["monthly_tasks"])
+        for shard_results, shard_summary in self.iter_persona_results(
+                empresa_personas, reference_date, parallel, max_workers, chunk_size, horizon):
+            results["personas_tasks"].extend(shard_results)
+            self.merge_summary(results["summary"], shard_summary)
         
         return results
     
+    def arbitrate_compact(self, empresa_personas: List[Dict[str, Any]], reference_date: Optional[datetime] = None,
+                          horizon: Optional[Tuple[date, date]] = None) -> TaskBatch:
+        """
+        Arbitra as personas no modelo compacto (TaskBatch).
+        
+        As tarefas não são copiadas: cada uma vira quatro índices sobre os
+        protótipos carimbados da execução, e o ID de cada tarefa é derivado
+        da persona na leitura. batch.iter_persona_dicts() produz
+        o mesmo resultado de arbitrate_persona para cada persona.
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        timestamps: Dict[Any, str] = {}
+        horizon_labels = (horizon[0].isoformat(), horizon[1].isoformat()) if horizon is not None else None
+        empty_integrations = {"primary": [], "secondary": [], "data_sources": [], "data_outputs": [], "critical_workflows": []}
+        totals_cache: Dict[Tuple[Optional[str], str], Dict[str, int]] = {}
+        
+        batch = TaskBatch(id_factory=persona_task_ids)
+        for persona_data in empresa_personas:
+            try:
+                position = persona_data.get('cargo', 'Unknown')
+                template_position, confidence = self.resolve_position(position)
+                calendar = self.calendar_for(persona_data.get('empresa_id'))
+                if horizon is None:
+                    stamped, minutes = self.get_run_prototypes(reference_date, calendar), self.template_minutes
+                else:
+                    stamped, minutes = self.get_horizon_prototypes(horizon[0], horizon[1], calendar)
+                
+                # Os totais são iguais para todas as personas do mesmo cargo e calendário
+                totals_key = (template_position, calendar.key)
+                totals = totals_cache.get(totals_key)
+                if totals is None:
+                    totals = {f"{frequency}_minutes": minutes.get((template_position, frequency), 0)
+                              for frequency in FREQUENCIES}
+                    totals_cache[totals_key] = totals
+                timestamp = timestamps.get(calendar.key)
+                if timestamp is None:
+                    timestamp = timestamps[calendar.key] = calendar.local_moment(reference_date).isoformat()
+                
+                header = PersonaHeader(
+                    persona_id=persona_data['id'] if 'id' in persona_data else str(uuid.uuid4()),
+                    persona_name=persona_data.get('nome', 'Unknown'),
+                    position=position,
+                    arbitration_timestamp=timestamp,
+                    horizon=horizon_labels,
+                    subsystem_integrations=self.subsystem_integrations.get(template_position, empty_integrations),
+                    total_estimated_time=totals,
+                    template_match=None if confidence is None else {"template_position": template_position,
+                                                                    "confidence": confidence}
+                )
+                batch.add_persona(header, {frequency: stamped.get((template_position, frequency), ())
+                                           for frequency in FREQUENCIES})
+            except Exception as e:
+                logging.error(f"Erro ao arbitrar tarefas para persona: {e}")
+                batch.add_error(PersonaHeader(error=str(e)))
+        
+        batch.seal()
+        logging.info("Arbitragem compacta: %d personas, %d tarefas, %d protótipos",
+                     len(batch.personas), len(batch), len(batch.prototypes))
+        return batch
+    
     def export_tasks_to_json(self, tasks_data: Dict[str, Any], output_path: Optional[Path] = None) -> Path:
         """Exporta as tarefas arbitradas para um arquivo JSON"""
         if output_path is None:
@@ -515,9 +1087,332 @@ class TaskArbitrator:
             logging.error(f"Erro ao exportar tarefas: {e}")
             raise
 
-def main():
+    def write_ndjson_export(self, persona_results: Iterable[Dict[str, Any]], output_path: Path,
+                            compress: bool = False, empresa_id: Optional[str] = None,
+                            reference_date: Optional[datetime] = None,
+                            horizon: Optional[Tuple[date, date]] = None) -> Dict[str, Any]:
+        """
+        Grava resultados de personas em NDJSON à medida que são produzidos.
+        
+        Cada linha contém o resultado de uma persona; a última linha é o sumário
+        da execução (record_type = "summary"). Retorna esse registro de sumário.
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        
+        summary = self.new_summary()
+        total_personas = 0
+        opener = gzip.open if compress else open
+        
+        with opener(output_path, 'wt', encoding='utf-8') as f:
+            for persona_tasks in persona_results:
+                f.write(json.dumps(persona_tasks, ensure_ascii=False))
+                f.write('\n')
+                self.accumulate_summary(summary, persona_tasks)
+                total_personas += 1
+            
+            summary_record = {
+                "record_type": "summary",
+                "empresa_id": empresa_id,
+                "arbitration_timestamp": reference_date.isoformat(),
+                "total_personas": total_personas,
+                "summary": summary
+            }
+            if horizon is not None:
+                summary_record["horizon_start"] = horizon[0].isoformat()
+                summary_record["horizon_end"] = horizon[1].isoformat()
+            f.write(json.dumps(summary_record, ensure_ascii=False))
+            f.write('\n')
+        
+        return summary_record
+    
+    def export_tasks_to_ndjson(self, empresa_personas: List[Dict[str, Any]], output_path: Optional[Path] = None,
+                               compress: bool = False, parallel: bool = False, max_workers: Optional[int] = None,
+                               chunk_size: int = DEFAULT_CHUNK_SIZE, reference_date: Optional[datetime] = None,
+                               horizon: Optional[Tuple[date, date]] = None) -> Path:
+        """
+        Arbitra e exporta as personas em streaming (uma persona por linha)
+        
+        Os resultados vão para o disco lote a lote, sem montar o documento
+        completo em memória; um arquivo interrompido mantém as personas já gravadas.
+        Com horizon = (início, fim) cada linha traz todas as ocorrências do intervalo.
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        if output_path is None:
+            suffix = '.ndjson.gz' if compress else '.ndjson'
+            output_path = self.base_path / f"arbitrated_tasks_{reference_date.strftime('%Y%m%d_%H%M%S')}{suffix}"
+        
+        def persona_results() -> Iterator[Dict[str, Any]]:
+            for shard_results, _ in self.iter_persona_results(
+                    empresa_personas, reference_date, parallel, max_workers, chunk_size, horizon):
+                yield from shard_results
+        
+        try:
+            self.write_ndjson_export(
+                persona_results(),
+                output_path,
+                compress=compress,
+                empresa_id=empresa_personas[0].get('empresa_id') if empresa_personas else None,
+                reference_date=reference_date,
+                horizon=horizon
+            )
+            
+            logging.info(f"Tarefas exportadas para: {output_path}")
+            return output_path
+            
+        except Exception as e:
+            logging.error(f"Erro ao exportar tarefas: {e}")
+            raise
+
+    def export_tasks_to_columnar(self, empresa_personas: List[Dict[str, Any]], output_dir: Optional[Path] = None,
+                                 file_format: str = "parquet", parallel: bool = False,
+                                 max_workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                 reference_date: Optional[datetime] = None,
+                                 horizon: Optional[Tuple[date, date]] = None) -> Path:
+        """
+        Arbitra e exporta as tarefas em Parquet/Arrow particionado por empresa e frequência
+        
+        Como no NDJSON, os lotes de personas são convertidos em colunas à
+        medida que chegam, sem montar o documento completo em memória.
+        """
+        from columnar_export import write_columnar_export
+        
+        if reference_date is None:
+            reference_date = datetime.now()
+        if output_dir is None:
+            output_dir = self.base_path / "arbitrated_tasks_dataset"
+        
+        def persona_results() -> Iterator[Dict[str, Any]]:
+            for shard_results, _ in self.iter_persona_results(
+                    empresa_personas, reference_date, parallel, max_workers, chunk_size, horizon):
+                yield from shard_results
+        
+        try:
+            write_columnar_export(
+                persona_results(),
+                output_dir,
+                empresa_id=empresa_personas[0].get('empresa_id') if empresa_personas else None,
+                file_format=file_format
+            )
+            logging.info(f"Tarefas exportadas para: {output_dir}")
+            return output_dir
+            
+        except Exception as e:
+            logging.error(f"Erro ao exportar tarefas: {e}")
+            raise
+
+    def persona_input_hash(self, persona_data: Dict[str, Any], horizon: Optional[Tuple[date, date]] = None) -> str:
+        """
+        Hash das entradas que determinam as tarefas de uma persona: cargo,
+        versão dos templates, calendário e a janela de ocorrências da execução
+        (uma por template, ou a duração do horizonte). A data da execução não
+        entra: rolar os vencimentos para o dia seguinte não muda a persona.
+        """
+        window = "run" if horizon is None else f"{(horizon[1] - horizon[0]).days + 1}d"
+        content = "\x1f".join((
+            str(persona_data.get('cargo', 'Unknown')),
+            self.templates_version,
+            repr(self.calendar_for(persona_data.get('empresa_id')).key),
+            window
+        ))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def incremental_task_keys(persona_tasks: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        (identidade do template, tarefa) de cada tarefa de uma persona. A chave
+        não depende da data: ocorrências repetidas do mesmo template (horizonte)
+        recebem um sufixo sequencial, na ordem de vencimento.
+        """
+        for frequency in ('daily', 'weekly', 'monthly'):
+            tasks = persona_tasks.get(f"{frequency}_tasks", ())
+            positions = [task.get('metadata', {}).get('position', '') for task in tasks]
+            by_position: Dict[str, List[Dict[str, Any]]] = {}
+            for position, task in zip(positions, tasks):
+                by_position.setdefault(position, []).append(task)
+            for position, position_tasks in by_position.items():
+                yield from zip(template_keys(position, frequency, position_tasks), position_tasks)
+    
+    @staticmethod
+    def task_fingerprint(task: Dict[str, Any]) -> str:
+        """Hash do conteúdo de uma tarefa, sem os campos da ocorrência (id, vencimento, criação)"""
+        content = {key: value for key, value in task.items() if key not in ('id', 'due_date', 'created_at')}
+        return hashlib.blake2b(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8'), digest_size=8).hexdigest()
+    
+    @staticmethod
+    def load_incremental_state(state_path: Path) -> Dict[str, Any]:
+        """Lê o estado da última arbitragem incremental (vazio se não existir)"""
+        if state_path.exists():
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"personas": {}}
+    
+    @staticmethod
+    def save_incremental_state(state: Dict[str, Any], state_path: Path) -> None:
+        """Grava o estado de forma atômica (arquivo temporário + rename)"""
+        tmp_path = state_path.with_name(state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+    
+    def arbitrate_incremental(self, empresa_personas: List[Dict[str, Any]], state_path: Path,
+                              parallel: bool = False, max_workers: Optional[int] = None,
+                              chunk_size: int = DEFAULT_CHUNK_SIZE,
+                              reference_date: Optional[datetime] = None,
+                              horizon: Optional[Tuple[date, date]] = None) -> Dict[str, Any]:
+        """
+        Arbitra somente as personas cujas entradas mudaram desde a última execução
+        
+        Cada persona guarda no estado o hash de persona_input_hash e, por
+        identidade de template (incremental_task_keys), o último id e a
+        impressão digital da tarefa. Personas com hash igual são ignoradas,
+        então a execução diária custa o número de personas alteradas, não o
+        total. Para as demais é emitido apenas o delta de tarefas (adicionadas,
+        removidas e alteradas); a mesma tarefa em outra data não é alteração.
+        Personas que saíram da lista têm todas as suas tarefas removidas.
+        Personas sem id não têm como ser reencontradas no estado e ficam de
+        fora (contadas em skipped_personas).
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        
+        state = self.load_incremental_state(state_path)
+        # Estados anteriores ao formato por identidade de template são descartados
+        previous = state.get("personas", {}) if state.get("format") == INCREMENTAL_STATE_FORMAT else {}
+        current = {}
+        
+        changed_personas = []
+        skipped = 0
+        for persona in empresa_personas:
+            if persona.get('id') in (None, ''):
+                skipped += 1
+                continue
+            # As chaves do estado em JSON são texto
+            persona_id = str(persona['id'])
+            input_hash = self.persona_input_hash(persona, horizon)
+            previous_entry = previous.get(persona_id)
+            if previous_entry and previous_entry.get("input_hash") == input_hash:
+                current[persona_id] = previous_entry
+            else:
+                changed_personas.append(persona)
+        if skipped:
+            logging.warning("Arbitragem incremental: %d personas sem id ignoradas", skipped)
+        
+        delta = {
+            "empresa_id": empresa_personas[0].get('empresa_id') if empresa_personas else None,
+            "arbitration_timestamp": reference_date.isoformat(),
+            "templates_version": self.templates_version,
+            "total_personas": len(empresa_personas),
+            "changed_personas": len(changed_personas),
+            "unchanged_personas": len(empresa_personas) - len(changed_personas) - skipped,
+            "skipped_personas": skipped,
+            "removed_personas": [],
+            "personas_delta": [],
+            "summary": {"added_tasks": 0, "removed_tasks": 0, "changed_tasks": 0}
+        }
+        
+        changed_iter = iter(changed_personas)
+        for shard_results, _ in self.iter_persona_results(
+                changed_personas, reference_date, parallel, max_workers, chunk_size, horizon):
+            for persona_tasks in shard_results:
+                persona = next(changed_iter)
+                persona_id = str(persona['id'])
+                if 'error' in persona_tasks:
+                    # Mantém o estado anterior para tentar novamente na próxima execução
+                    if persona_id in previous:
+                        current[persona_id] = dict(previous[persona_id], input_hash=None)
+                    continue
+                old_tasks = previous.get(persona_id, {}).get("tasks", {})
+                new_tasks = {}
+                added, changed = [], []
+                for key, task in self.incremental_task_keys(persona_tasks):
+                    fingerprint = self.task_fingerprint(task)
+                    new_tasks[key] = [task['id'], fingerprint]
+                    old = old_tasks.get(key)
+                    if old is None:
+                        added.append(task)
+                    elif old[1] != fingerprint:
+                        changed.append(task)
+                removed = [old[0] for key, old in old_tasks.items() if key not in new_tasks]
+                
+                current[persona_id] = {
+                    "input_hash": self.persona_input_hash(persona, horizon),
+                    "tasks": new_tasks
+                }
+                if added or removed or changed:
+                    delta["personas_delta"].append({
+                        "persona_id": persona_id,
+                        "persona_name": persona_tasks["persona_name"],
+                        "position": persona_tasks["position"],
+                        "added_tasks": added,
+                        "removed_task_ids": removed,
+                        "changed_tasks": changed
+                    })
+                    delta["summary"]["added_tasks"] += len(added)
+                    delta["summary"]["removed_tasks"] += len(removed)
+                    delta["summary"]["changed_tasks"] += len(changed)
+        
+        for persona_id, entry in previous.items():
+            if persona_id not in current:
+                removed = [task_id for task_id, _ in entry.get("tasks", {}).values()]
+                delta["removed_personas"].append({"persona_id": persona_id, "removed_task_ids": removed})
+                delta["summary"]["removed_tasks"] += len(removed)
+        
+        self.save_incremental_state(
+            {"format": INCREMENTAL_STATE_FORMAT, "templates_version": self.templates_version,
+             "updated_at": reference_date.isoformat(), "personas": current},
+            state_path
+        )
+        
+        logging.info("Arbitragem incremental: %d de %d personas alteradas",
+                     delta["changed_personas"], delta["total_personas"])
+        return delta
+    
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Argumentos de linha de comando do arbitrador"""
+    parser = argparse.ArgumentParser(description="Arbitragem de tarefas VCM")
+    parser.add_argument('--parallel', action='store_true', help="Processa as personas em um pool de processos")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos da máquina)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Personas por lote no modo paralelo")
+    parser.add_argument('--ndjson', action='store_true', help="Exporta em streaming, uma persona por linha (NDJSON)")
+    parser.add_argument('--gzip', action='store_true', help="Comprime a exportação NDJSON com gzip")
+    parser.add_argument('--output', type=Path, default=None, help="Caminho do arquivo exportado")
+    parser.add_argument('--incremental', type=Path, default=None, metavar='STATE_FILE',
+                        help="Arbitra só as personas alteradas desde a execução registrada em STATE_FILE")
+    parser.add_argument('--horizon-days', type=int, default=None, metavar='N',
+                        help="Gera todas as ocorrências dos próximos N dias (a partir de --start)")
+    parser.add_argument('--start', type=date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+                        help="Primeiro dia do horizonte (padrão: hoje)")
+    parser.add_argument('--capacity', type=int, default=None, metavar='MINUTES',
+                        help="Planeja as tarefas respeitando MINUTES de jornada por persona e dia útil")
+    parser.add_argument('--templates-db', action='store_true',
+                        help="Usa os templates da tabela task_templates (com cache local)")
+    parser.add_argument('--offline-templates', action='store_true',
+                        help="Com --templates-db, usa somente o cache local de templates")
+    parser.add_argument('--dependencies', action='store_true',
+                        help="Inclui o plano de execução (ordem topológica e caminho crítico)")
+    parser.add_argument('--columnar', choices=('parquet', 'arrow'), default=None,
+                        help="Exporta em dataset colunar particionado (--output é o diretório)")
+    parser.add_argument('--compact', action='store_true',
+                        help="Com --ndjson, mantém os resultados no modelo compacto (menos memória por tarefa)")
+    parser.add_argument('--trace', type=Path, default=None, metavar='FILE',
+                        help="Grava spans por etapa da arbitragem em FILE (padrão: VCM_TRACE_FILE)")
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS, default=None,
+                        help="Formato dos spans: jsonl ou otlp (OTLP/JSON do OpenTelemetry Collector)")
+    parser.add_argument('--trace-sample', type=float, default=None, metavar='RATE',
+                        help="Fração das personas rastreadas, de 0 a 1 (padrão: 1)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """Função principal para testar o arbitrador"""
-    arbitrator = TaskArbitrator()
+    args = parse_args(argv)
+    configure_logging()
+    configure_tracing(str(args.trace) if args.trace else None, args.trace_format, args.trace_sample)
+    if args.templates_db:
+        arbitrator = TaskArbitrator.from_registry(offline=args.offline_templates)
+    else:
+        arbitrator = TaskArbitrator()
     
     # Exemplo de personas para teste
     test_personas = [
@@ -527,11 +1422,112 @@ def main():
         {"id": "cfo_001", "nome": "Ana CFO", "cargo": "CFO", "empresa_id": "empresa_001"}
     ]
     
+    horizon = None
+    if args.horizon_days:
+        start_date = args.start or date.today()
+        horizon = (start_date, start_date + timedelta(days=args.horizon_days - 1))
+    
+    if args.incremental:
+        # Arbitragem incremental: somente o delta desde a última execução
+        delta = arbitrator.arbitrate_incremental(
+            test_personas,
+            args.incremental,
+            parallel=args.parallel,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+            horizon=horizon
+        )
+        output_file = arbitrator.export_tasks_to_json(delta, args.output)
+        print(f"✅ Arbitragem incremental concluída!")
+        print(f"🔄 Personas alteradas: {delta['changed_personas']} de {delta['total_personas']}")
+        if delta['skipped_personas']:
+            print(f"⚠️ Personas sem id ignoradas: {delta['skipped_personas']}")
+        print(f"➕ Tarefas adicionadas: {delta['summary']['added_tasks']}")
+        print(f"➖ Tarefas removidas: {delta['summary']['removed_tasks']}")
+        print(f"✏️  Tarefas alteradas: {delta['summary']['changed_tasks']}")
+        print(f"📄 Arquivo exportado: {output_file}")
+        return
+    
+    if args.columnar:
+        # Dataset colunar para consultas analíticas (empresa_id=.../frequency=...)
+        output_dir = arbitrator.export_tasks_to_columnar(
+            test_personas,
+            output_dir=args.output,
+            file_format=args.columnar,
+            parallel=args.parallel,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+            horizon=horizon
+        )
+        print(f"✅ Arbitragem concluída!")
+        print(f"📊 Total de personas: {len(test_personas)}")
+        print(f"📁 Dataset exportado: {output_dir}")
+        return
+    
+    if args.ndjson and args.compact:
+        # Resultados em lote colunar, convertidos ao formato JSON somente na gravação
+        reference_date = datetime.now()
+        batch = arbitrator.arbitrate_compact(test_personas, reference_date=reference_date, horizon=horizon)
+        output_file = args.output or arbitrator.base_path / (
+            f"arbitrated_tasks_{reference_date.strftime('%Y%m%d_%H%M%S')}" + ('.ndjson.gz' if args.gzip else '.ndjson'))
+        arbitrator.write_ndjson_export(
+            batch.iter_persona_dicts(),
+            output_file,
+            compress=args.gzip,
+            empresa_id=test_personas[0].get('empresa_id'),
+            reference_date=reference_date,
+            horizon=horizon
+        )
+        print(f"✅ Arbitragem concluída!")
+        print(f"📊 Total de personas: {len(test_personas)}")
+        print(f"🗜️  Modelo compacto: {len(batch)} tarefas, {len(batch.prototypes)} protótipos")
+        print(f"📄 Arquivo exportado: {output_file}")
+        return
+    
+    if args.ndjson:
+        # Exportação em streaming: as personas são gravadas conforme arbitradas
+        output_file = arbitrator.export_tasks_to_ndjson(
+            test_personas,
+            output_path=args.output,
+            compress=args.gzip,
+            parallel=args.parallel,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+            horizon=horizon
+        )
+        print(f"✅ Arbitragem concluída!")
+        print(f"📊 Total de personas: {len(test_personas)}")
+        print(f"📄 Arquivo exportado: {output_file}")
+        return
+    
     # Arbitrar tarefas para todas as personas
-    all_tasks = arbitrator.arbitrate_all_personas(test_personas)
+    all_tasks = arbitrator.arbitrate_all_personas(
+        test_personas,
+        parallel=args.parallel,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+        horizon=horizon
+    )
+    
+    if args.capacity:
+        from capacity_planner import CapacityPlanner
+        
+        # Encaixar as tarefas na jornada de cada persona (redirecionando para colegas do mesmo cargo)
+        planner = CapacityPlanner(
+            capacity_minutes=args.capacity,
+            calendar=arbitrator.calendar_for(all_tasks['empresa_id']),
+            capacities={p['id']: p['capacity_minutes'] for p in test_personas if 'capacity_minutes' in p}
+        )
+        all_tasks['capacity_plan'] = planner.plan(all_tasks['personas_tasks'])
+    
+    if args.dependencies:
+        from task_dependency_graph import analyze_dependencies
+        
+        # Resolver inputs_from/outputs_to em um grafo e calcular o caminho crítico
+        all_tasks['execution_plan'] = analyze_dependencies(all_tasks['personas_tasks'])
     
     # Exportar resultados
-    output_file = arbitrator.export_tasks_to_json(all_tasks)
+    output_file = arbitrator.export_tasks_to_json(all_tasks, args.output)
     
     print(f"✅ Arbitragem concluída!")
     print(f"📊 Total de personas: {all_tasks['total_personas']}")
@@ -539,6 +1535,12 @@ def main():
     print(f"📊 Tarefas semanais: {all_tasks['summary']['total_weekly_tasks']}")
     print(f"📈 Tarefas mensais: {all_tasks['summary']['total_monthly_tasks']}")
     print(f"⏱️  Tempo diário estimado: {all_tasks['summary']['total_estimated_daily_minutes']} minutos")
+    if 'capacity_plan' in all_tasks:
+        print(f"🔀 Tarefas redirecionadas: {all_tasks['capacity_plan']['rerouted_tasks']}")
+        print(f"⚠️  Tarefas com estouro de capacidade: {all_tasks['capacity_plan']['overflow_tasks']}")
+    if 'execution_plan' in all_tasks:
+        print(f"🔗 Dependências entre tarefas: {all_tasks['execution_plan']['stats']['edges']} arestas")
+        print(f"🔁 Tarefas em ciclo: {all_tasks['execution_plan']['cycles']['task_count']}")
     print(f"📄 Arquivo exportado: {output_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Manutenção do Dashboard de Tarefas VCM
+Instala e opera o dashboard incremental (database-schema-dashboard-tarefas.sql):
+aplica a fila do modo adiado (refresh), confere o cache contra persona_tasks
+(verify), recria o cache do zero (rebuild) e mede a latência de leitura do
+dashboard contra a ordenação direta sobre persona_tasks (latency).
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import db_session
+
+SCHEMA_FILE = Path(__file__).parent / "database-schema-dashboard-tarefas.sql"
+
+COMMANDS = ("install", "refresh", "verify", "rebuild", "latency")
+
+VERIFY_COLUMNS = ("tasks", "cached", "missing", "extra", "stale", "pending")
+
+# Leitura do dashboard antes do cache: ordenação de persona_tasks inteira a cada consulta
+DIRECT_READ_SQL = """
+    SELECT * FROM persona_tasks_dashboard_source
+    ORDER BY priority_rank, due_date
+    LIMIT %s
+"""
+
+CACHED_READ_SQL = "SELECT * FROM persona_tasks_dashboard LIMIT %s"
+
+
+def install(connection, schema_file: Path = SCHEMA_FILE) -> None:
+    """Cria o cache, os triggers e a nova view (e popula o cache)"""
+    with connection.cursor() as cursor:
+        cursor.execute(schema_file.read_text(encoding='utf-8'))
+    connection.commit()
+
+
+def _call(connection, sql: str) -> Any:
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        value = cursor.fetchone()[0]
+    connection.commit()
+    return value
+
+
+def refresh(connection) -> int:
+    """Aplica os ids enfileirados no modo adiado; retorna quantas tarefas foram reaplicadas"""
+    return _call(connection, "SELECT refresh_persona_tasks_dashboard()")
+
+
+def rebuild(connection) -> int:
+    """Recria o cache a partir de persona_tasks; retorna o total de tarefas"""
+    return _call(connection, "SELECT rebuild_persona_tasks_dashboard()")
+
+
+def verify(connection) -> Dict[str, int]:
+    """Contagens do cache e divergências contra persona_tasks"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM verify_persona_tasks_dashboard()")
+        report = dict(zip(VERIFY_COLUMNS, cursor.fetchone()))
+    connection.rollback()
+    report["divergent"] = report["missing"] + report["extra"] + report["stale"]
+    return report
+
+
+def read_latency(connection, limit: int = 50, repeat: int = 20) -> Dict[str, float]:
+    """Melhor tempo (ms) de uma página do dashboard: cache indexado x ordenação direta"""
+    timings = {}
+    with connection.cursor() as cursor:
+        for name, sql in (("cached", CACHED_READ_SQL), ("direct", DIRECT_READ_SQL)):
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, (limit,))
+                cursor.fetchall()
+                best = min(best, time.perf_counter() - started)
+            timings[name] = round(best * 1000, 3)
+    connection.rollback()
+    return timings
+
+
+def main():
+    """Opera o dashboard incremental de tarefas"""
+    parser = argparse.ArgumentParser(description="Manutenção do dashboard incremental de persona_tasks")
+    parser.add_argument('command', choices=COMMANDS,
+                        help="install, refresh (aplica a fila), verify, rebuild ou latency")
+    parser.add_argument('--limit', type=int, default=50, help="Linhas por página no comando latency")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetições no comando latency")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    print("🔌 Conectando ao banco de dados...")
+    try:
+        with db_session.connection() as connection:
+            if args.command == "install":
+                install(connection)
+                print(f"✅ Dashboard incremental instalado ({verify(connection)['cached']} tarefas no cache)")
+            elif args.command == "refresh":
+                print(f"🔄 {refresh(connection)} tarefas reaplicadas no dashboard")
+            elif args.command == "rebuild":
+                print(f"🧱 Cache do dashboard recriado com {rebuild(connection)} tarefas")
+            elif args.command == "verify":
+                report = verify(connection)
+                print(f"📊 persona_tasks: {report['tasks']} | cache: {report['cached']}")
+                print(f"   ➖ Ausentes: {report['missing']}  ➕ Sobrando: {report['extra']}  "
+                      f"✏️  Desatualizadas: {report['stale']}  ⏳ Na fila: {report['pending']}")
+                if report['divergent']:
+                    hint = "execute refresh" if report['pending'] else "execute rebuild"
+                    print(f"❌ Dashboard divergente ({hint})")
+                    sys.exit(1)
+                print("✅ Dashboard consistente com persona_tasks")
+            else:
+                timings = read_latency(connection, args.limit, args.repeat)
+                print(f"⏱️  Página de {args.limit} tarefas (melhor de {args.repeat})")
+                print(f"   Cache indexado:   {timings['cached']:10.3f} ms")
+                print(f"   Ordenação direta: {timings['direct']:10.3f} ms")
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(f"❌ Erro no dashboard: {str(e)}")
+        sys.exit(1)
+    finally:
+        db_session.close_all()
+
+
+if __name__ == "__main__":
+    main()
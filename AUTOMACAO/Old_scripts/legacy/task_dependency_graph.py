@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Grafo de Dependências de Tarefas VCM
+Resolve inputs_from / outputs_to / dependencies das tarefas arbitradas em um
+grafo dirigido entre todas as personas da empresa, com ordenação topológica,
+horários mais cedo de início e caminho crítico por dia.
+"""
+
+import argparse
+import json
+import logging
+import time
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from cargo_matcher import normalize_label
+
+FREQUENCY_KEYS = ("daily_tasks", "weekly_tasks", "monthly_tasks")
+
+
+class TaskDependencyGraph:
+    """
+    Grafo de tarefas em arrays de adjacência (CSR).
+
+    As passagens entre cargos usam nós de ligação (hubs), um por
+    (cargo de origem, cargo de destino, dia): as tarefas produtoras apontam
+    para o hub e o hub aponta para as consumidoras. Assim o número de arestas
+    cresce com o número de tarefas, e não com produtores × consumidores.
+
+    Um hub existe quando algum dos lados declara a passagem: a consumidora
+    cita o cargo de origem em inputs_from ou a produtora cita o cargo de
+    destino em outputs_to. O lado que não declara entra com todas as suas
+    tarefas do dia. Itens de dependencies que coincidem com o título de outra
+    tarefa do mesmo dia viram arestas diretas; o restante é dependência externa.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]], persona_ids: List[Any], days: List[str],
+                 durations: array, node_count: int, offsets: array, targets: array,
+                 hubs: List[Tuple[str, str, str]], stats: Dict[str, int]):
+        self.tasks = tasks
+        self.persona_ids = persona_ids
+        self.days = days
+        self.durations = durations
+        self.node_count = node_count
+        self.offsets = offsets
+        self.targets = targets
+        self.hubs = hubs
+        self.stats = stats
+
+    @classmethod
+    def build(cls, persona_results: List[Dict[str, Any]]) -> 'TaskDependencyGraph':
+        """Monta o grafo a partir dos resultados do arbitrador"""
+        label_cache: Dict[str, str] = {}
+
+        def label(value: Any) -> str:
+            key = str(value)
+            normalized = label_cache.get(key)
+            if normalized is None:
+                normalized = normalize_label(key)
+                label_cache[key] = normalized
+            return normalized
+
+        tasks: List[Dict[str, Any]] = []
+        persona_ids: List[Any] = []
+        positions: List[str] = []
+        days: List[str] = []
+        for persona in persona_results:
+            if 'error' in persona:
+                continue
+            # Cargos aproximados entram no papel da posição de template escolhida
+            template_position = (persona.get('template_match') or {}).get('template_position')
+            position = label(template_position or persona.get('position', ''))
+            for key in FREQUENCY_KEYS:
+                for task in persona.get(key, ()):
+                    tasks.append(task)
+                    persona_ids.append(persona.get('persona_id'))
+                    positions.append(position)
+                    days.append((task.get('due_date') or '')[:10])
+
+        task_count = len(tasks)
+        roles = set(positions)
+        stats = {"tasks": task_count, "hubs": 0, "edges": 0, "title_edges": 0,
+                 "external_inputs": 0, "external_dependencies": 0}
+
+        # Tarefas por (cargo, dia) e por (título, dia)
+        by_role_day: Dict[Tuple[str, str], List[int]] = {}
+        by_title_day: Dict[Tuple[str, str], List[int]] = {}
+        for node, (position, day) in enumerate(zip(positions, days)):
+            by_role_day.setdefault((position, day), []).append(node)
+            by_title_day.setdefault((label(tasks[node].get('title', '')), day), []).append(node)
+
+        # Declarações de passagem: (origem, destino, dia) -> (produtoras declaradas, consumidoras declaradas)
+        handoffs: Dict[Tuple[str, str, str], Tuple[List[int], List[int]]] = {}
+        sources = array('i')
+        destinations = array('i')
+        for node, task in enumerate(tasks):
+            position = positions[node]
+            day = days[node]
+            for item in task.get('outputs_to') or ():
+                target = label(item)
+                if target in roles and target != position:
+                    handoffs.setdefault((position, target, day), ([], []))[0].append(node)
+            for item in task.get('inputs_from') or ():
+                source = label(item)
+                if source == position:
+                    continue
+                if source in roles:
+                    handoffs.setdefault((source, position, day), ([], []))[1].append(node)
+                else:
+                    stats["external_inputs"] += 1
+            for item in task.get('dependencies') or ():
+                producers = by_title_day.get((label(item), day))
+                if producers:
+                    for producer in producers:
+                        if producer != node:
+                            sources.append(producer)
+                            destinations.append(node)
+                            stats["title_edges"] += 1
+                else:
+                    stats["external_dependencies"] += 1
+
+        hubs = []
+        for (source, target, day), (producers, consumers) in handoffs.items():
+            hub = task_count + len(hubs)
+            hubs.append((source, target, day))
+            for producer in producers or by_role_day.get((source, day), ()):
+                sources.append(producer)
+                destinations.append(hub)
+            for consumer in consumers or by_role_day.get((target, day), ()):
+                sources.append(hub)
+                destinations.append(consumer)
+
+        node_count = task_count + len(hubs)
+        stats["hubs"] = len(hubs)
+        stats["edges"] = len(sources)
+
+        # CSR: offsets[v]..offsets[v+1] delimitam os sucessores de v em targets
+        offsets = array('i', bytes(4 * (node_count + 1)))
+        for source in sources:
+            offsets[source + 1] += 1
+        for v in range(node_count):
+            offsets[v + 1] += offsets[v]
+        fill = array('i', offsets[:-1])
+        targets = array('i', bytes(4 * len(sources)))
+        for source, destination in zip(sources, destinations):
+            targets[fill[source]] = destination
+            fill[source] += 1
+
+        durations = array('i', (int(task.get('estimated_duration') or 0) for task in tasks))
+        durations.extend([0] * len(hubs))
+        return cls(tasks, persona_ids, days, durations, node_count, offsets, targets, hubs, stats)
+
+    def schedule(self) -> Dict[str, Any]:
+        """
+        Ordenação topológica (Kahn), início mais cedo, folga e caminho crítico.
+
+        Como as passagens ligam apenas tarefas do mesmo dia, os tempos são
+        minutos a partir do início do dia de cada tarefa.
+        """
+        start_time = time.perf_counter()
+        n = self.node_count
+        offsets, targets, durations = self.offsets, self.targets, self.durations
+        task_count = len(self.tasks)
+
+        indegree = array('i', bytes(4 * n))
+        for destination in targets:
+            indegree[destination] += 1
+
+        earliest = array('i', bytes(4 * n))
+        critical_pred = array('i', [-1]) * n
+        order = array('i')
+        queue = deque(v for v in range(n) if indegree[v] == 0)
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            finish = earliest[v] + durations[v]
+            for i in range(offsets[v], offsets[v + 1]):
+                w = targets[i]
+                if finish > earliest[w] or critical_pred[w] < 0:
+                    earliest[w] = finish
+                    critical_pred[w] = v
+                indegree[w] -= 1
+                if indegree[w] == 0:
+                    queue.append(w)
+
+        # Passagem reversa: término mais tarde (limitado pelo fim do dia de cada componente)
+        day_of_node = self.days + [hub[2] for hub in self.hubs]
+        day_makespan: Dict[str, int] = {}
+        for v in order:
+            finish = earliest[v] + durations[v]
+            if finish > day_makespan.get(day_of_node[v], -1):
+                day_makespan[day_of_node[v]] = finish
+        latest_finish = array('i', (day_makespan.get(day_of_node[v], 0) for v in range(n)))
+        for v in reversed(order):
+            for i in range(offsets[v], offsets[v + 1]):
+                start = latest_finish[targets[i]] - durations[targets[i]]
+                if start < latest_finish[v]:
+                    latest_finish[v] = start
+
+        in_cycle = [v for v in range(task_count) if indegree[v] > 0]
+
+        execution_order = []
+        for v in order:
+            if v >= task_count:
+                continue
+            slack = latest_finish[v] - durations[v] - earliest[v]
+            execution_order.append({
+                "task_id": self.tasks[v].get('id'),
+                "persona_id": self.persona_ids[v],
+                "day": self.days[v],
+                "earliest_start_minutes": earliest[v],
+                "earliest_finish_minutes": earliest[v] + durations[v],
+                "slack_minutes": slack,
+                "critical": slack == 0
+            })
+        execution_order.sort(key=lambda entry: (entry["day"], entry["earliest_start_minutes"]))
+
+        # Caminho crítico de cada dia: a tarefa que termina por último e seus predecessores críticos
+        last_by_day: Dict[str, int] = {}
+        for v in order:
+            if v < task_count:
+                current = last_by_day.get(self.days[v])
+                if current is None or earliest[v] + durations[v] > earliest[current] + durations[current]:
+                    last_by_day[self.days[v]] = v
+        critical_paths = {}
+        for day, v in sorted(last_by_day.items()):
+            path = []
+            while v >= 0:
+                if v < task_count:
+                    path.append(self.tasks[v].get('id'))
+                v = critical_pred[v]
+            path.reverse()
+            critical_paths[day] = {"makespan_minutes": day_makespan.get(day, 0), "task_ids": path}
+
+        report = {
+            "stats": dict(self.stats, nodes=n),
+            "execution_order": execution_order,
+            "critical_paths": critical_paths,
+            "cycles": {
+                "task_count": len(in_cycle),
+                "task_ids": [self.tasks[v].get('id') for v in in_cycle]
+            },
+            "solve_seconds": round(time.perf_counter() - start_time, 4)
+        }
+        if in_cycle:
+            logging.warning("Dependências circulares envolvendo %d tarefas", len(in_cycle))
+        return report
+
+
+def analyze_dependencies(persona_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o grafo e calcula o plano de execução em uma chamada"""
+    start_time = time.perf_counter()
+    graph = TaskDependencyGraph.build(persona_results)
+    build_seconds = time.perf_counter() - start_time
+    report = graph.schedule()
+    report["build_seconds"] = round(build_seconds, 4)
+    logging.info("Grafo de dependências: %d tarefas, %d hubs, %d arestas (%.3fs + %.3fs)",
+                 graph.stats["tasks"], graph.stats["hubs"], graph.stats["edges"],
+                 build_seconds, report["solve_seconds"])
+    return report
+
+
+def main():
+    """Gera o plano de execução de uma exportação do arbitrador"""
+    from task_loader import read_arbitration_export
+
+    parser = argparse.ArgumentParser(description="Grafo de dependências e caminho crítico das tarefas arbitradas")
+    parser.add_argument('export_file', type=Path, help="Exportação do arbitrador (.json, .ndjson ou .ndjson.gz)")
+    parser.add_argument('--output', type=Path, default=None, help="Arquivo JSON com o plano de execução")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    empresa_id, persona_results = read_arbitration_export(args.export_file)
+    report = analyze_dependencies(list(persona_results))
+    report["empresa_id"] = empresa_id
+
+    output_path = args.output or args.export_file.with_name(args.export_file.name.split('.')[0] + '_execution_plan.json')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Plano de execução gerado")
+    print(f"📋 Tarefas: {report['stats']['tasks']}")
+    print(f"🔗 Arestas: {report['stats']['edges']} ({report['stats']['hubs']} passagens entre cargos)")
+    print(f"🔁 Tarefas em ciclo: {report['cycles']['task_count']}")
+    print(f"📄 Arquivo exportado: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
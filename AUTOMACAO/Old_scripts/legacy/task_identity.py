@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Identidade Estável de Tarefas VCM
+IDs de tarefa derivados do conteúdo: hash de persona_id, identidade do
+template e data da ocorrência. O mesmo template na mesma data para a mesma
+persona gera sempre o mesmo ID, independentemente da ordem dos templates ou
+de quantas personas compartilham o cargo.
+
+Formato: {frequência}_{cargo}_{AAAAMMDD}_{hash de 16 hex}
+
+O hash é SHA-256 (truncado) para que a arbitragem no banco
+(arbitrate_empresa_tasks) gere exatamente os mesmos IDs.
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Dígitos hexadecimais mantidos do SHA-256
+ID_HEX_DIGITS = 16
+
+# Campos do template que definem sua identidade (além de cargo e frequência)
+TEMPLATE_IDENTITY_FIELDS = ("title", "description", "day_of_week", "week_of_month")
+
+_SEPARATOR = "\x1f"
+
+
+def template_keys(position: str, frequency: str, templates: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Identidade de cada template de um (cargo, frequência), como hash hexadecimal.
+
+    Templates idênticos em todos os campos de identidade recebem um sufixo
+    sequencial entre si; como são indistinguíveis, a ordem entre eles não
+    altera nenhuma tarefa.
+    """
+    keys = []
+    seen: Dict[str, int] = {}
+    for template in templates:
+        key = _SEPARATOR.join([position, frequency] + [str(template.get(field) or '') for field in TEMPLATE_IDENTITY_FIELDS])
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        if count:
+            key = f"{key}{_SEPARATOR}{count}"
+        keys.append(hashlib.sha256(key.encode('utf-8')).hexdigest()[:ID_HEX_DIGITS])
+    return keys
+
+
+def occurrence_stamp(id_prefix: str, day: str, template_key: str) -> str:
+    """
+    Carimbo de uma ocorrência (template + dia AAAAMMDD), compartilhado por todas
+    as personas do cargo: "{id_prefix}{dia}_" seguido da identidade do template.
+    """
+    return f"{id_prefix}{day}_{_SEPARATOR}{template_key}"
+
+
+def split_stamp(stamp: str) -> Tuple[str, bytes]:
+    """Prefixo do ID (até o dia) e bytes do carimbo de ocorrência"""
+    return stamp[:stamp.index(_SEPARATOR)], stamp.encode('utf-8')
+
+
+def stamp_entries(stamped: Iterable[Dict[str, Any]]) -> Tuple[Tuple[Dict[str, Any], str, bytes], ...]:
+    """Tarefas carimbadas como (tarefa, prefixo do ID, bytes do carimbo), para copy_with_ids"""
+    return tuple((task,) + split_stamp(task['id']) for task in stamped)
+
+
+def persona_seed(persona_id: Any) -> Any:
+    """Estado do hash com o persona_id; é copiado a cada tarefa da persona"""
+    return hashlib.sha256(f"{persona_id}{_SEPARATOR}".encode('utf-8'))
+
+
+def persona_task_ids(persona_id: Any) -> Callable[[str], str]:
+    """
+    Função carimbo de ocorrência -> ID da tarefa para uma persona. O estado do
+    hash com o persona_id é calculado uma vez e copiado a cada tarefa.
+    """
+    seed = persona_seed(persona_id)
+
+    def task_id(stamp: str) -> str:
+        prefix, data = split_stamp(stamp)
+        digest = seed.copy()
+        digest.update(data)
+        return prefix + digest.hexdigest()[:ID_HEX_DIGITS]
+
+    return task_id
+
+
+def copy_with_ids(seed: Any, entries: Iterable[Tuple[Dict[str, Any], str, bytes]]) -> List[Dict[str, Any]]:
+    """
+    Cópias das tarefas carimbadas (stamp_entries) com o ID da persona e
+    metadata próprio. Caminho quente da arbitragem: o carimbo já vem
+    decomposto e o hash é feito no laço, sem uma chamada por tarefa.
+    """
+    tasks = []
+    for stamped, prefix, data in entries:
+        task = stamped.copy()
+        digest = seed.copy()
+        digest.update(data)
+        task['id'] = prefix + digest.hexdigest()[:ID_HEX_DIGITS]
+        task['metadata'] = stamped['metadata'].copy()
+        tasks.append(task)
+    return tasks
+
+
+def stable_task_id(persona_id: Any, stamp: str) -> str:
+    """ID da tarefa de uma persona para o carimbo de ocorrência"""
+    return persona_task_ids(persona_id)(stamp)
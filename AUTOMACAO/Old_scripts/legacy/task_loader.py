@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Carregador em Lote de Tarefas VCM
+Grava a saída do TaskArbitrator na tabela persona_tasks usando COPY FROM STDIN
+em uma tabela de staging, com upsert por task_id e transações em lotes.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import db_session
+from export_reader import ArbitrationExportReader
+from task_timestamps import utc_iso
+
+# Tamanho padrão de cada lote (uma transação por lote)
+DEFAULT_BATCH_SIZE = 10000
+
+STAGING_TABLE = "persona_tasks_staging"
+
+# Colunas de persona_tasks preenchidas a partir da arbitragem
+TASK_COLUMNS = (
+    "empresa_id",
+    "persona_id",
+    "assigned_to",
+    "task_id",
+    "title",
+    "description",
+    "task_type",
+    "priority",
+    "status",
+    "estimated_duration",
+    "due_date",
+    "required_subsystems",
+    "inputs_from",
+    "outputs_to",
+    "dependencies",
+    "frequency",
+    "recurrence_rule",
+    "metadata",
+    "created_at",
+)
+
+# Colunas atualizadas quando a tarefa já existe (status e created_at são preservados)
+UPDATE_COLUMNS = tuple(c for c in TASK_COLUMNS if c not in ("task_id", "status", "created_at"))
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        seq BIGSERIAL,
+        empresa_id UUID,
+        persona_id UUID,
+        assigned_to UUID,
+        task_id VARCHAR(255) NOT NULL,
+        title VARCHAR(500),
+        description TEXT,
+        task_type VARCHAR(50),
+        priority VARCHAR(50),
+        status VARCHAR(50),
+        estimated_duration INTEGER,
+        due_date TIMESTAMP WITH TIME ZONE,
+        required_subsystems JSONB,
+        inputs_from JSONB,
+        outputs_to JSONB,
+        dependencies JSONB,
+        frequency VARCHAR(50),
+        recurrence_rule JSONB,
+        metadata JSONB,
+        created_at TIMESTAMP WITH TIME ZONE
+    ) ON COMMIT DELETE ROWS
+"""
+
+COPY_SQL = f"COPY {STAGING_TABLE} ({', '.join(TASK_COLUMNS)}) FROM STDIN"
+
+# DISTINCT ON garante um único registro por task_id dentro do lote (o último vence);
+# a empresa é completada a partir de personas quando a exportação não a informa.
+UPSERT_SQL = f"""
+    WITH upserted AS (
+        INSERT INTO persona_tasks ({', '.join(TASK_COLUMNS)})
+        SELECT DISTINCT ON (s.task_id)
+            COALESCE(s.empresa_id, p.empresa_id),
+            {', '.join('s.' + c for c in TASK_COLUMNS[1:])}
+        FROM {STAGING_TABLE} s
+        LEFT JOIN personas p ON p.id = s.persona_id
+        ORDER BY s.task_id, s.seq DESC
+        ON CONFLICT (task_id) DO UPDATE SET
+            {', '.join(f'{c} = EXCLUDED.{c}' for c in UPDATE_COLUMNS)},
+            updated_at = now()
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted),
+        count(*) FILTER (WHERE NOT inserted)
+    FROM upserted
+"""
+
+FREQUENCY_KEYS = ("daily_tasks", "weekly_tasks", "monthly_tasks")
+
+
+def read_arbitration_export(path: Path) -> Tuple[Optional[str], Iterator[Dict[str, Any]]]:
+    """
+    Lê uma exportação do arbitrador (.json, .ndjson ou .ndjson.gz).
+    Retorna (empresa_id, iterador de resultados por persona).
+
+    Arquivos sem compressão são lidos via mmap com índice lateral
+    (export_reader), uma persona por vez, sem carregar o documento inteiro.
+    """
+    path = Path(path)
+    if path.suffix != '.gz':
+        reader = ArbitrationExportReader(path)
+
+        def iter_personas() -> Iterator[Dict[str, Any]]:
+            with reader:
+                yield from reader
+
+        return reader.empresa_id, iter_personas()
+
+    def iter_lines() -> Iterator[Dict[str, Any]]:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get('record_type') == 'summary':
+                    continue
+                yield record
+
+    return None, iter_lines()
+
+
+def iter_task_rows(persona_results: Iterable[Dict[str, Any]], empresa_id: Optional[str] = None) -> Iterator[Tuple[Any, ...]]:
+    """
+    Converte resultados por persona em linhas na ordem de TASK_COLUMNS.
+    Os horários vão como instantes UTC (task_timestamps.utc_iso), então o
+    TimeZone da sessão não muda o que é gravado.
+    """
+    for persona_tasks in persona_results:
+        if 'error' in persona_tasks:
+            continue
+        persona_id = persona_tasks.get('persona_id')
+        for key in FREQUENCY_KEYS:
+            for task in persona_tasks.get(key, []):
+                recurrence_rule = {}
+                if task.get('day_of_week') is not None:
+                    recurrence_rule['day_of_week'] = task['day_of_week']
+                if task.get('week_of_month') is not None:
+                    recurrence_rule['week_of_month'] = task['week_of_month']
+
+                yield (
+                    empresa_id,
+                    persona_id,
+                    task.get('assigned_to'),
+                    task['id'],
+                    task.get('title'),
+                    task.get('description'),
+                    task.get('task_type'),
+                    task.get('priority', 'MEDIUM'),
+                    task.get('status', 'pending'),
+                    task.get('estimated_duration'),
+                    utc_iso(task.get('due_date')),
+                    task.get('required_subsystems', []),
+                    task.get('inputs_from', []),
+                    task.get('outputs_to', []),
+                    task.get('dependencies', []),
+                    task.get('task_type'),
+                    recurrence_rule,
+                    task.get('metadata', {}),
+                    utc_iso(task.get('created_at')),
+                )
+
+
+def copy_value(value: Any) -> str:
+    """Formata um valor para o formato texto do COPY"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+
+class PersonaTaskLoader:
+    """
+    Carrega tarefas arbitradas em persona_tasks em lotes.
+    Cada lote é copiado para a staging e aplicado com um único INSERT ... ON CONFLICT.
+
+    Com defer_dashboard, os triggers do dashboard incremental só enfileiram
+    as tarefas alteradas durante a carga, e a fila é aplicada uma única vez no
+    final (database-schema-dashboard-tarefas.sql).
+    """
+
+    def __init__(self, connection, batch_size: int = DEFAULT_BATCH_SIZE, defer_dashboard: bool = False):
+        self.connection = connection
+        self.batch_size = max(1, batch_size)
+        self.defer_dashboard = defer_dashboard
+        self._staging_ready = False
+
+    def ensure_staging(self, cursor) -> None:
+        """Cria a tabela temporária de staging (uma vez por sessão)"""
+        if not self._staging_ready:
+            cursor.execute(CREATE_STAGING_SQL)
+
+    def load_batch(self, rows: List[Tuple[Any, ...]]) -> Tuple[int, int]:
+        """Copia e aplica um lote em uma transação. Retorna (inseridas, atualizadas)"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        try:
+            with self.connection.cursor() as cursor:
+                self.ensure_staging(cursor)
+                cursor.copy_expert(COPY_SQL, buffer)
+                cursor.execute(UPSERT_SQL)
+                inserted, updated = cursor.fetchone()
+            self.connection.commit()
+            self._staging_ready = True
+            return inserted, updated
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def load(self, persona_results: Iterable[Dict[str, Any]], empresa_id: Optional[str] = None) -> Dict[str, int]:
+        """Carrega todos os resultados, um lote por transação"""
+        stats = {"rows": 0, "inserted": 0, "updated": 0, "batches": 0}
+        batch = []
+
+        def flush():
+            inserted, updated = self.load_batch(batch)
+            stats["rows"] += len(batch)
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            stats["batches"] += 1
+            logging.info("Lote %d carregado: %d linhas (%d novas, %d atualizadas)",
+                         stats["batches"], len(batch), inserted, updated)
+            batch.clear()
+
+        if self.defer_dashboard:
+            self.set_dashboard_deferred(True)
+        completed = False
+        try:
+            for row in iter_task_rows(persona_results, empresa_id):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    flush()
+            if batch:
+                flush()
+            completed = True
+        finally:
+            if self.defer_dashboard:
+                self.set_dashboard_deferred(False)
+                # Também em caso de falha: os lotes já confirmados deixaram tarefas na fila do dashboard
+                try:
+                    stats["dashboard_refreshed"] = self.refresh_dashboard()
+                except Exception as e:
+                    self.connection.rollback()
+                    if completed:
+                        raise
+                    logging.error("Dashboard não atualizado após a falha da carga: %s", e)
+        return stats
+
+    def set_dashboard_deferred(self, deferred: bool) -> None:
+        """Liga/desliga o modo adiado do dashboard nesta sessão"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('vcm.dashboard_deferred', %s, false)", ('on' if deferred else 'off',))
+        self.connection.commit()
+
+    def refresh_dashboard(self) -> int:
+        """Aplica a fila do dashboard acumulada pela carga"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT refresh_persona_tasks_dashboard()")
+            refreshed = cursor.fetchone()[0]
+        self.connection.commit()
+        logging.info("Dashboard atualizado: %d tarefas reaplicadas", refreshed)
+        return refreshed
+
+
+def main():
+    """Carrega uma exportação do arbitrador em persona_tasks"""
+    parser = argparse.ArgumentParser(description="Carga em lote de tarefas arbitradas em persona_tasks")
+    parser.add_argument('export_file', type=Path, help="Exportação do arbitrador (.json, .ndjson ou .ndjson.gz)")
+    parser.add_argument('--empresa-id', default=None, help="Empresa das tarefas (padrão: da exportação ou da persona)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Linhas por transação")
+    parser.add_argument('--defer-dashboard', action='store_true',
+                        help="Atualiza o dashboard incremental uma única vez, ao final da carga")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    export_empresa_id, persona_results = read_arbitration_export(args.export_file)
+
+    print("🔌 Conectando ao banco de dados...")
+    try:
+        with db_session.connection() as connection:
+            loader = PersonaTaskLoader(connection, batch_size=args.batch_size, defer_dashboard=args.defer_dashboard)
+            stats = loader.load(persona_results, args.empresa_id or export_empresa_id)
+    except Exception as e:
+        print(f"❌ Erro na carga: {str(e)}")
+        sys.exit(1)
+    finally:
+        db_session.close_all()
+
+    print(f"✅ {stats['rows']} tarefas carregadas em {stats['batches']} lotes")
+    print(f"   📥 Novas: {stats['inserted']}")
+    print(f"   🔄 Atualizadas: {stats['updated']}")
+    if 'dashboard_refreshed' in stats:
+        print(f"   📊 Dashboard: {stats['dashboard_refreshed']} tarefas reaplicadas")
+
+
+if __name__ == "__main__":
+    main()
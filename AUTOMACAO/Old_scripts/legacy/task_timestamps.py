@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Instantes das Tarefas VCM
+Convenção única para os horários gravados pelo arbitrador (due_date,
+created_at, arbitration_timestamp): um ISO 8601 com offset é um instante; sem
+offset é a hora local do servidor que arbitrou (datetime.now(), calendário
+sem fuso), como em BusinessCalendar.local_moment. A carga no banco, a
+comparação com o banco e a exportação colunar convertem os dois casos para
+UTC com esta mesma regra, sem depender do TimeZone da sessão.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+# Horários já convertidos (os mesmos valores se repetem entre personas)
+_UTC_ISO: Dict[str, str] = {}
+
+
+def utc_iso(value: Any) -> Any:
+    """
+    Horário ISO 8601 como instante UTC ("...+00:00"). Valores sem offset são
+    lidos na hora local do servidor; None e textos que não são datas ficam
+    como estão.
+    """
+    if not isinstance(value, str):
+        return value
+    converted = _UTC_ISO.get(value)
+    if converted is None:
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        converted = moment.astimezone(timezone.utc).isoformat()
+        if len(_UTC_ISO) >= 65536:
+            _UTC_ISO.clear()
+        _UTC_ISO[value] = converted
+    return converted
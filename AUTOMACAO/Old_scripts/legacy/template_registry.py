@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Registro de Templates de Tarefas VCM
+Carrega os templates ativos da tabela task_templates em uma única consulta e
+mantém um cache local em pickle, versionado pelo formato da consulta e
+atualizado de forma incremental pela marca d'água de updated_at.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Versão do formato do arquivo de cache (mudar invalida os caches existentes)
+CACHE_FORMAT_VERSION = 2
+
+# Por quanto tempo o cache é usado sem consultar o banco, em segundos
+DEFAULT_TTL_SECONDS = 300
+
+# Janela relida antes da marca d'água: updated_at é o horário do início da
+# transação, então uma linha confirmada depois da última leitura pode ter
+# updated_at igual ou anterior à marca d'água gravada no cache
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+TEMPLATE_COLUMNS = ("id", "position_type", "task_type", "name", "template_data", "is_active", "updated_at")
+
+SELECT_SQL = f"""
+    SELECT {', '.join(TEMPLATE_COLUMNS)}
+    FROM task_templates
+    WHERE (empresa_id IS NULL OR empresa_id = %(empresa_id)s)
+"""
+
+# Estado atual das linhas ativas: usado para detectar exclusões sem recarregar tudo
+WATERMARK_SQL = """
+    SELECT max(updated_at), count(*) FILTER (WHERE is_active)
+    FROM task_templates
+    WHERE (empresa_id IS NULL OR empresa_id = %(empresa_id)s)
+"""
+
+
+class TemplateRegistry:
+    """
+    Templates de tarefas por cargo e frequência, lidos de task_templates.
+
+    O cache guarda as linhas já convertidas (sem JSON a interpretar) e a
+    marca d'água de updated_at. Dentro do TTL o cache é usado sem tocar no
+    banco; depois disso, são buscadas as linhas com updated_at a partir da
+    marca d'água menos WATERMARK_OVERLAP (escritas concorrentes confirmadas
+    depois da leitura anterior) e só as que diferem do cache contam como
+    alteradas. Se o número de linhas ativas não bater (exclusões), o registro
+    é recarregado por completo.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, empresa_id: Optional[str] = None,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 connection_factory: Optional[Callable[[], Any]] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(__file__).parent / ".cache"
+        self.empresa_id = empresa_id
+        self.ttl_seconds = ttl_seconds
+        self.connection_factory = connection_factory
+
+    @property
+    def cache_key(self) -> str:
+        """Hash do formato do cache, da consulta e do escopo (empresa)"""
+        content = "\x1f".join((str(CACHE_FORMAT_VERSION), SELECT_SQL, str(self.empresa_id)))
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def cache_path(self) -> Path:
+        return self.cache_dir / f"task_templates_{self.cache_key}.pickle"
+
+    def _connection(self):
+        if self.connection_factory is not None:
+            return self.connection_factory()
+        import db_session
+        return db_session.connection()
+
+    def read_cache(self) -> Optional[Dict[str, Any]]:
+        """Lê o cache local (None se ausente, corrompido ou de outra versão)"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("Cache de templates ignorado (%s): %s", self.cache_path, e)
+            return None
+        if cache.get("format") != CACHE_FORMAT_VERSION or cache.get("cache_key") != self.cache_key:
+            return None
+        return cache
+
+    def write_cache(self, cache: Dict[str, Any]) -> None:
+        """Grava o cache de forma atômica (arquivo temporário + rename)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def parse_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+        """Converte uma linha de task_templates no formato interno do cache"""
+        template_id, position, frequency, name, template_data, is_active, updated_at = row
+        if isinstance(template_data, str):
+            template_data = json.loads(template_data)
+        tasks = []
+        for task in (template_data or {}).get('tasks', []):
+            task = dict(task)
+            # persona_tasks só aceita prioridades em maiúsculas
+            if isinstance(task.get('priority'), str):
+                task['priority'] = task['priority'].upper()
+            tasks.append(task)
+        return {
+            "id": str(template_id),
+            "position": position,
+            "frequency": frequency,
+            "name": name or "",
+            "tasks": tasks,
+            "is_active": bool(is_active),
+            "updated_at": updated_at
+        }
+
+    @staticmethod
+    def build_templates(rows: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Agrupa as linhas ativas em {cargo: {frequência: [templates]}} (ordem estável por nome e id)"""
+        templates: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for row in sorted(rows.values(), key=lambda r: (r["position"] or "", r["frequency"] or "", r["name"], r["id"])):
+            if not row["is_active"] or row["frequency"] not in FREQUENCIES or not row["position"]:
+                continue
+            templates.setdefault(row["position"], {}).setdefault(row["frequency"], []).extend(row["tasks"])
+        return templates
+
+    def fetch(self, since: Any = None) -> Tuple[Dict[str, Dict[str, Any]], Any, int]:
+        """
+        Busca as linhas com updated_at a partir de `since` menos WATERMARK_OVERLAP
+        (todas, se None) e o estado atual. A janela se sobrepõe à leitura
+        anterior; as linhas repetidas são deduplicadas por id em refresh().
+        Retorna (linhas por id, marca d'água, total de linhas ativas).
+        """
+        params = {"empresa_id": self.empresa_id,
+                  "since": since - WATERMARK_OVERLAP if since is not None else None}
+        sql = SELECT_SQL if since is None else SELECT_SQL + " AND updated_at >= %(since)s"
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(WATERMARK_SQL, params)
+                watermark, active_count = cursor.fetchone()
+                cursor.execute(sql, params)
+                rows = {}
+                for row in cursor.fetchall():
+                    parsed = self.parse_row(row)
+                    rows[parsed["id"]] = parsed
+        return rows, watermark, active_count
+
+    def refresh(self, cache: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Atualiza o cache com o banco: incremental pela marca d'água, completo se necessário"""
+        if cache is not None:
+            fetched, watermark, active_count = self.fetch(cache["watermark"])
+            # Linhas inativas fora do cache não mudam nada (o cache só guarda as ativas)
+            changed = {template_id: row for template_id, row in fetched.items()
+                       if cache["rows"].get(template_id) != row
+                       and (row["is_active"] or template_id in cache["rows"])}
+            rows = dict(cache["rows"])
+            rows.update(changed)
+            rows = {template_id: row for template_id, row in rows.items() if row["is_active"]}
+            if len(rows) == active_count:
+                if changed:
+                    logging.info("Templates atualizados: %d linhas alteradas", len(changed))
+                return self.new_cache(rows, watermark, templates=None if changed else cache["templates"])
+            logging.info("Templates removidos no banco; recarregando o registro completo")
+
+        rows, watermark, _ = self.fetch()
+        rows = {template_id: row for template_id, row in rows.items() if row["is_active"]}
+        logging.info("Templates carregados do banco: %d linhas", len(rows))
+        return self.new_cache(rows, watermark)
+
+    def new_cache(self, rows: Dict[str, Dict[str, Any]], watermark: Any,
+                  templates: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Monta o conteúdo do arquivo de cache"""
+        return {
+            "format": CACHE_FORMAT_VERSION,
+            "cache_key": self.cache_key,
+            "watermark": watermark,
+            "checked_at": time.time(),
+            "rows": rows,
+            "templates": templates if templates is not None else self.build_templates(rows)
+        }
+
+    def load(self, refresh: bool = False, offline: bool = False) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        Templates por cargo e frequência.
+
+        offline=True usa somente o cache; refresh=True consulta o banco mesmo
+        dentro do TTL. Se o banco estiver indisponível, um cache antigo é usado.
+        """
+        cache = self.read_cache()
+        if offline:
+            if cache is None:
+                raise FileNotFoundError(f"Cache de templates não encontrado: {self.cache_path}")
+            return cache["templates"]
+
+        if cache is not None and not refresh and time.time() - cache["checked_at"] < self.ttl_seconds:
+            return cache["templates"]
+
+        try:
+            cache = self.refresh(cache)
+        except Exception as e:
+            if cache is None:
+                raise
+            logging.warning("Banco indisponível, usando cache de templates de %s: %s",
+                            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cache["checked_at"])), e)
+            return cache["templates"]
+
+        self.write_cache(cache)
+        return cache["templates"]
+
+
+def main():
+    """Atualiza o cache local de templates e mostra o resumo"""
+    parser = argparse.ArgumentParser(description="Registro de templates de tarefas (task_templates)")
+    parser.add_argument('--empresa-id', default=None, help="Inclui também os templates específicos da empresa")
+    parser.add_argument('--cache-dir', type=Path, default=None, help="Diretório do cache local")
+    parser.add_argument('--offline', action='store_true', help="Usa somente o cache local")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    registry = TemplateRegistry(cache_dir=args.cache_dir, empresa_id=args.empresa_id)
+    templates = registry.load(refresh=not args.offline, offline=args.offline)
+
+    print(f"✅ {len(templates)} cargos com templates")
+    for position, frequencies in sorted(templates.items()):
+        counts = ", ".join(f"{len(frequencies.get(f, []))} {f}" for f in FREQUENCIES)
+        print(f"   📋 {position}: {counts}")
+    print(f"💾 Cache: {registry.cache_path}")
+
+
+if __name__ == "__main__":
+    main()
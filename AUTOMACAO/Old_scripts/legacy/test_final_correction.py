@@ -3,15 +3,17 @@
 Teste final - Simular exatamente o que o frontend corrigido fará
 """
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from db_session import get_supabase_client
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
 def test_corrected_frontend_flow():
     """Simular o fluxo corrigido do frontend"""
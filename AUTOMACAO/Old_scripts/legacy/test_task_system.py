@@ -10,9 +10,10 @@ from pathlib import Path
 import json
 import uuid
 from datetime import datetime, timedelta
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+import db_session
+
 # Carregar variáveis de ambiente
 from dotenv import load_dotenv
 load_dotenv()
@@ -26,11 +27,9 @@ class TaskSystemTester:
     def connect_database(self):
         """Conectar ao banco de dados Supabase"""
         try:
-            # Usar as credenciais do VCM Central
-            conn_string = f"postgresql://{os.getenv('VCM_SUPABASE_SERVICE_ROLE_KEY')}@{os.getenv('VCM_SUPABASE_URL').replace('https://', '').replace('http://', '')}:5432/{os.getenv('VCM_SUPABASE_DB_NAME', 'postgres')}"
-            
+            # Usar as credenciais do VCM Central via pool compartilhado
             print("🔌 Conectando ao banco de dados...")
-            self.connection = psycopg2.connect(conn_string)
+            self.connection = db_session.get_pool().acquire()
             self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
             print("✅ Conexão estabelecida com sucesso!")
             return True
@@ -264,7 +263,7 @@ class TaskSystemTester:
             if self.cursor:
                 self.cursor.close()
             if self.connection:
-                self.connection.close()
+                db_session.get_pool().release(self.connection)
                 
 def main():
     """Função principal"""